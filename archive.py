@@ -0,0 +1,131 @@
+import asyncio
+import datetime
+import logging
+import os
+import time
+from typing import List, Optional, Tuple
+
+from config import Config
+from database import get_db_connection
+from ical_feed import calendar_feed
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Таблицы, которые переезжают в архив вместе с закрытым тестом
+ARCHIVED_TABLES = ('tests', 'test_results')
+
+
+def table_columns(cursor, schema: str, table: str) -> List[Tuple[str, str]]:
+    cursor.execute(f"PRAGMA {schema}.table_info({table})")
+    return [(row[1], row[2]) for row in cursor.fetchall()]
+
+
+def sync_archive_schema(cursor):
+    """Создает таблицы архива по образцу основных и добавляет столбцы, появившиеся позже"""
+    for table in ARCHIVED_TABLES:
+        columns = table_columns(cursor, 'main', table)
+        archived = {name for name, _ in table_columns(cursor, 'archive', table)}
+        if not archived:
+            definition = ", ".join(
+                f"{name} {type_} PRIMARY KEY" if name == columns[0][0] else f"{name} {type_}"
+                for name, type_ in columns
+            )
+            cursor.execute(f"CREATE TABLE archive.{table} ({definition})")
+            continue
+        for name, type_ in columns:
+            if name not in archived:
+                cursor.execute(f"ALTER TABLE archive.{table} ADD COLUMN {name} {type_}")
+    cursor.execute("CREATE INDEX IF NOT EXISTS archive.idx_test_results_user ON test_results (user_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS archive.idx_test_results_test ON test_results (test_id)")
+
+
+def archive_closed_tests(archive_path: str, older_than_days: float) -> Tuple[int, int]:
+    """Переносит тесты, закрытые раньше older_than_days дней назад, и их результаты в архив"""
+    cutoff = (datetime.datetime.now() - datetime.timedelta(days=older_than_days)).strftime("%Y-%m-%d %H:%M:%S")
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("ATTACH DATABASE ? AS archive", (archive_path,))
+        sync_archive_schema(cursor)
+        conn.commit()
+
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("DROP TABLE IF EXISTS temp.archived_tests")
+        cursor.execute(
+            "CREATE TEMP TABLE archived_tests AS SELECT test_id FROM main.tests WHERE end_time < ?",
+            (cutoff,)
+        )
+        counts = []
+        for table in ARCHIVED_TABLES:
+            columns = ", ".join(name for name, _ in table_columns(cursor, 'main', table))
+            cursor.execute(f"""
+                INSERT OR REPLACE INTO archive.{table} ({columns})
+                SELECT {columns} FROM main.{table}
+                WHERE test_id IN (SELECT test_id FROM temp.archived_tests)
+            """)
+            counts.append(cursor.rowcount)
+        # Сначала результаты, потом сами тесты: на tests ссылается внешний ключ
+        for table in reversed(ARCHIVED_TABLES):
+            cursor.execute(f"DELETE FROM main.{table} WHERE test_id IN (SELECT test_id FROM temp.archived_tests)")
+        cursor.execute("DROP TABLE temp.archived_tests")
+        conn.commit()
+        cursor.execute("DETACH DATABASE archive")
+        return counts[0], counts[1]
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def attach_archive(conn) -> bool:
+    """Подключает архив к соединению; False, если архива еще нет"""
+    if not os.path.exists(Config.ARCHIVE_PATH):
+        return False
+    conn.execute("ATTACH DATABASE ? AS archive", (Config.ARCHIVE_PATH,))
+    return True
+
+
+class ArchiveJob:
+    """Периодически переносит старые тесты в архивную БД"""
+
+    def __init__(self, path: str = 'student_assistant_archive.db', after_days: float = 180,
+                 interval: float = 24 * 3600):
+        self.path = path
+        self.after_days = after_days
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self) -> Tuple[int, int]:
+        started = time.monotonic()
+        tests, results = await asyncio.to_thread(archive_closed_tests, self.path, self.after_days)
+        metrics.observe('archive.duration', time.monotonic() - started)
+        metrics.inc('archive.tests', tests)
+        metrics.inc('archive.results', results)
+        if tests:
+            logger.info(f"Archived {tests} tests and {results} results in {time.monotonic() - started:.1f}s")
+            # Архивные тесты пропадают из календаря
+            calendar_feed.invalidate()
+        return tests, results
+
+    def start(self):
+        if self.interval > 0:
+            self._task = asyncio.create_task(self._run_periodically())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run_periodically(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Archiving failed: {e}", exc_info=True)
+            await asyncio.sleep(self.interval)
+
+
+archive_job = ArchiveJob(Config.ARCHIVE_PATH, Config.ARCHIVE_AFTER_DAYS, Config.ARCHIVE_INTERVAL)
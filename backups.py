@@ -0,0 +1,205 @@
+import argparse
+import glob
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from typing import List, Optional
+
+from config import Config
+from database import DB_PATH, backup_to
+import metrics
+
+logger = logging.getLogger(__name__)
+
+BACKUP_PREFIX = 'student_assistant-'
+BACKUP_SUFFIX = '.db.gz'
+
+
+def list_backups(directory: str) -> List[str]:
+    """Возвращает файлы бэкапов от старых к новым"""
+    return sorted(glob.glob(os.path.join(directory, BACKUP_PREFIX + '*' + BACKUP_SUFFIX)))
+
+
+def check_integrity(path: str) -> str:
+    """Возвращает 'ok' или описание повреждений из PRAGMA integrity_check"""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("PRAGMA integrity_check").fetchall()
+        conn.execute("SELECT COUNT(*) FROM tests").fetchone()
+    except sqlite3.DatabaseError as e:
+        return str(e)
+    finally:
+        conn.close()
+    return "\n".join(row[0] for row in rows)
+
+
+class BackupManager:
+    """Периодические онлайн-бэкапы БД в фоновом потоке со сжатием и ротацией"""
+
+    def __init__(self, directory: str = 'backups', interval: float = 6 * 3600, keep: int = 14,
+                 pages: int = 256, sleep: float = 0.05):
+        # Ротация идет сразу после бэкапа: при keep=0 удалялся бы только что снятый файл
+        if keep < 1:
+            raise ValueError(f"keep must be at least 1, got {keep}")
+        self.directory = directory
+        self.interval = interval
+        self.keep = keep
+        self.pages = pages
+        self.sleep = sleep
+        self.running = False
+        self.last_backup_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        metrics.register_gauge('backup.running', lambda: int(self.running))
+        metrics.register_gauge('backup.last_age_seconds',
+                               lambda: time.time() - self.last_backup_at if self.last_backup_at else -1)
+
+    def run_once(self) -> str:
+        """Снимает бэкап: копирует БД порциями по pages страниц с паузами, затем сжимает"""
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            name = BACKUP_PREFIX + time.strftime('%Y%m%d-%H%M%S') + BACKUP_SUFFIX
+            path = os.path.join(self.directory, name)
+            raw_path = path[:-len('.gz')]
+            started = time.monotonic()
+            self.running = True
+            try:
+                # Паузы между шагами отдают блокировку обработчикам
+                backup_to(raw_path, pages=self.pages, sleep=self.sleep)
+                with open(raw_path, 'rb') as src, gzip.open(path + '.part', 'wb', compresslevel=6) as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+                os.replace(path + '.part', path)
+            finally:
+                self.running = False
+                if os.path.exists(raw_path):
+                    os.remove(raw_path)
+            duration = time.monotonic() - started
+            self.last_backup_at = time.time()
+            metrics.observe('backup.duration', duration)
+            metrics.inc('backup.count')
+            logger.info(f"Backup {name} written in {duration:.1f}s ({os.path.getsize(path)} bytes)")
+            self.rotate()
+            return path
+
+    def rotate(self):
+        backups = list_backups(self.directory)
+        for path in backups[:max(len(backups) - self.keep, 0)]:
+            os.remove(path)
+            logger.info(f"Old backup {os.path.basename(path)} removed")
+
+    def _run(self):
+        existing = list_backups(self.directory)
+        if existing:
+            self.last_backup_at = os.path.getmtime(existing[-1])
+        while not self._stop.is_set():
+            age = time.time() - self.last_backup_at if self.last_backup_at else self.interval
+            if age >= self.interval:
+                try:
+                    self.run_once()
+                except Exception as e:
+                    metrics.inc('backup.failed')
+                    logger.error(f"Backup failed: {e}", exc_info=True)
+                    age = 0
+                else:
+                    continue
+            self._stop.wait(self.interval - age)
+
+    def start(self):
+        if self.interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='db-backup', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            # Бэкап, который уже идет, доделается: иначе останется только .part
+            self._thread.join()
+            self._thread = None
+
+
+def restore(backup_path: str, target: str, force: bool = False) -> int:
+    """Восстанавливает БД из бэкапа после проверки целостности; бот должен быть остановлен"""
+    if os.path.exists(target + '-wal') and os.path.getsize(target + '-wal') and not force:
+        print(f"{target}-wal не пуст: остановите бота перед восстановлением (или --force)")
+        return 1
+
+    restored_path = target + '.restore'
+    with gzip.open(backup_path, 'rb') as src, open(restored_path, 'wb') as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+
+    result = check_integrity(restored_path)
+    if result != 'ok':
+        os.remove(restored_path)
+        print(f"Бэкап поврежден, восстановление отменено:\n{result}")
+        return 1
+
+    if os.path.exists(target):
+        previous = target + time.strftime('.before-restore-%Y%m%d-%H%M%S')
+        os.replace(target, previous)
+        print(f"Текущая БД сохранена как {previous}")
+    for suffix in ('-wal', '-shm'):
+        if os.path.exists(target + suffix):
+            os.remove(target + suffix)
+    os.replace(restored_path, target)
+    print(f"БД восстановлена из {backup_path}")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Бэкапы и восстановление student_assistant.db")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('backup', help="снять бэкап сейчас")
+    commands.add_parser('list', help="показать бэкапы")
+    verify = commands.add_parser('verify', help="проверить целостность бэкапа")
+    verify.add_argument('backup')
+    restore_parser = commands.add_parser('restore', help="восстановить БД из бэкапа")
+    restore_parser.add_argument('backup', help="файл бэкапа или 'latest'")
+    restore_parser.add_argument('--target', default=DB_PATH)
+    restore_parser.add_argument('--force', action='store_true')
+    args = parser.parse_args(argv)
+
+    if args.command == 'backup':
+        print(backup_manager.run_once())
+        return 0
+    if args.command == 'list':
+        for path in list_backups(backup_manager.directory):
+            print(f"{path}\t{os.path.getsize(path)} bytes")
+        return 0
+
+    path = args.backup
+    if path == 'latest':
+        backups = list_backups(backup_manager.directory)
+        if not backups:
+            print("Бэкапов нет")
+            return 1
+        path = backups[-1]
+
+    if args.command == 'verify':
+        fd_path = path + '.verify'
+        try:
+            with gzip.open(path, 'rb') as src, open(fd_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            result = check_integrity(fd_path)
+        finally:
+            if os.path.exists(fd_path):
+                os.remove(fd_path)
+        print(result)
+        return 0 if result == 'ok' else 1
+    return restore(path, args.target, args.force)
+
+
+backup_manager = BackupManager(
+    Config.BACKUP_DIR, Config.BACKUP_INTERVAL, Config.BACKUP_KEEP, Config.BACKUP_PAGES, Config.BACKUP_SLEEP
+)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""Задержки цикла событий при синхронном логировании и через очередь.
+
+Запуск из корня проекта:  python benchmarks/bench_logging.py
+Поток вывода имитирует медленный пайп: каждая запись занимает WRITE_DELAY секунд.
+"""
+import asyncio
+import io
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('BOT_TOKEN', '0:bench')
+os.environ.setdefault('ADMIN_IDS', '0')
+
+import metrics  # noqa: E402
+from logging_setup import JsonFormatter, queue_handler, stop_logging  # noqa: E402
+
+RECORDS = 300
+WRITE_DELAY = 0.002
+
+
+class SlowStream(io.StringIO):
+    def write(self, text):
+        time.sleep(WRITE_DELAY)
+        return super().write(text)
+
+
+async def workload(logger: logging.Logger):
+    monitor = asyncio.create_task(metrics.monitor_loop_lag(0.005))
+    for i in range(RECORDS):
+        logger.info(f"Update {i} handled")
+        await asyncio.sleep(0)
+    await asyncio.sleep(0.05)
+    monitor.cancel()
+
+
+def run(label: str, handler: logging.Handler):
+    logger = logging.getLogger(f"bench.{label}")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    metrics._latencies.pop('loop.lag', None)
+    started = time.perf_counter()
+    asyncio.run(workload(logger))
+    elapsed = time.perf_counter() - started
+    summary = metrics.latency_summary('loop.lag')
+    print(f"{label:<10} прогон {elapsed:.2f} с, задержка p99 {summary['p99_ms']:.1f} мс, "
+          f"max {summary['max_ms']:.1f} мс")
+
+
+def main():
+    direct = logging.StreamHandler(SlowStream())
+    direct.setFormatter(JsonFormatter())
+    run("напрямую", direct)
+
+    queued = logging.StreamHandler(SlowStream())
+    queued.setFormatter(JsonFormatter())
+    run("очередь", queue_handler(queued))
+    stop_logging()
+
+
+if __name__ == '__main__':
+    main()
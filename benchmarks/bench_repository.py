@@ -0,0 +1,126 @@
+"""Сравнение запросов через repository с прежним кодом на кортежах.
+
+Запуск из корня проекта:  python benchmarks/bench_repository.py
+Создает временную БД с синтетическими данными и печатает время на запрос
+и объем памяти, выделенной под результат.
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('BOT_TOKEN', '0:bench')
+os.environ.setdefault('ADMIN_IDS', '0')
+
+import database  # noqa: E402
+import repository  # noqa: E402
+
+ROUNDS = 2000
+LECTURES = 200
+CONTENT_PER_LECTURE = 20
+
+
+def prepare(path: str):
+    os.chdir(path)
+    database.init_db()
+    conn = sqlite3.connect(database.DB_PATH)
+    conn.executemany(
+        "INSERT INTO lecture_materials (title, description, created_by) VALUES (?, ?, 1)",
+        [(f"Лекция {i}", "Описание " * 10) for i in range(LECTURES)]
+    )
+    conn.executemany(
+        "INSERT INTO lecture_content (material_id, message, order_num) VALUES (?, ?, ?)",
+        [(m, f"Абзац {n} " * 20, n) for m in range(1, LECTURES + 1) for n in range(CONTENT_PER_LECTURE)]
+    )
+    conn.executemany(
+        "INSERT INTO users (user_id, username, full_name, role) VALUES (?, ?, ?, 'student')",
+        [(i, f"user{i}", f"Студент {i}") for i in range(1, 1001)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def tuples_lecture(material_id: int):
+    conn = database.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT title, description FROM lecture_materials WHERE material_id = ?", (material_id,))
+    material = cursor.fetchone()
+    cursor.execute(
+        "SELECT message, file_id, file_type FROM lecture_content WHERE material_id = ? ORDER BY order_num",
+        (material_id,)
+    )
+    contents = cursor.fetchall()
+    conn.close()
+    return material[0], [content[0] for content in contents]
+
+
+def repository_lecture(material_id: int):
+    material = repository.lectures.get(material_id)
+    return material.title, [content.message for content in repository.lectures.contents(material_id)]
+
+
+def tuples_role(user_id: int):
+    conn = database.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
+    user = cursor.fetchone()
+    conn.close()
+    return user[3]
+
+
+def repository_role(user_id: int):
+    return repository.users.get_role(user_id)
+
+
+def tuples_lecture_list():
+    conn = database.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT material_id, title, description FROM lecture_materials")
+    lectures = cursor.fetchall()
+    conn.close()
+    return lectures
+
+
+def repository_lecture_list():
+    return repository.lectures.list()
+
+
+def measure(func, arg_count: int):
+    args = [(i % arg_count + 1,) if arg_count else () for i in range(ROUNDS)]
+    func(*args[0])
+    started = time.perf_counter()
+    for a in args:
+        func(*a)
+    latency = (time.perf_counter() - started) / ROUNDS * 1e6
+
+    tracemalloc.start()
+    result = func(*args[0])
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return latency, size, peak
+
+
+CASES = [
+    ("лекция с содержимым", tuples_lecture, repository_lecture, LECTURES),
+    ("роль пользователя", tuples_role, repository_role, 1000),
+    ("список лекций", tuples_lecture_list, repository_lecture_list, 0),
+]
+
+
+def main():
+    with tempfile.TemporaryDirectory() as path:
+        prepare(path)
+        print(f"{'запрос':<22}{'вариант':<12}{'мкс/запрос':>12}{'память, Б':>12}{'пик, Б':>12}")
+        for name, old, new, arg_count in CASES:
+            for label, func in (("кортежи", old), ("repository", new)):
+                latency, size, peak = measure(func, arg_count)
+                print(f"{name:<22}{label:<12}{latency:>12.1f}{size:>12}{peak:>12}")
+        repository.close_connection()
+
+
+if __name__ == '__main__':
+    main()
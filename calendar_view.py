@@ -0,0 +1,93 @@
+import datetime
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from aiogram.types import InlineKeyboardMarkup
+
+import repository
+from keyboards import get_month_keyboard
+
+MONTH_NAMES = [
+    "Январь", "Февраль", "Март", "Апрель", "Май", "Июнь",
+    "Июль", "Август", "Сентябрь", "Октябрь", "Ноябрь", "Декабрь"
+]
+
+# Лимит Telegram на длину сообщения
+MESSAGE_LIMIT = 4096
+
+# Сколько месяцев держать в кэше и на сколько лет от текущего можно листать календарь
+CACHE_SIZE = 24
+YEAR_RANGE = 5
+
+# (год, месяц) -> (текст, клавиатура, события по дням), давно не открытые месяцы вытесняются
+_cache: "OrderedDict[Tuple[int, int], Tuple[str, InlineKeyboardMarkup, Dict[int, List[repository.Event]]]]" = OrderedDict()
+
+
+def month_bounds(year: int, month: int) -> Tuple[datetime.date, datetime.date]:
+    start = datetime.date(year, month, 1)
+    end = datetime.date(year + month // 12, month % 12 + 1, 1)
+    return start, end
+
+
+def shift_month(year: int, month: int, delta: int) -> Tuple[int, int]:
+    index = year * 12 + month - 1 + delta
+    return index // 12, index % 12 + 1
+
+
+def parse_month(year: str, month: str) -> Optional[Tuple[int, int]]:
+    """Проверяет год и месяц из callback_data: их можно подделать"""
+    try:
+        year, month = int(year), int(month)
+    except ValueError:
+        return None
+    current_year = datetime.date.today().year
+    if not 1 <= month <= 12 or abs(year - current_year) > YEAR_RANGE:
+        return None
+    return year, month
+
+
+def get_month_events(year: int, month: int) -> List[repository.Event]:
+    """Выбирает события месяца по индексу на event_date"""
+    start, end = month_bounds(year, month)
+    return repository.events.between(start.isoformat(), end.isoformat())
+
+
+def render_month(year: int, month: int):
+    """Возвращает текст, клавиатуру и события по дням для месяца, используя кэш"""
+    cached = _cache.get((year, month))
+    if cached:
+        _cache.move_to_end((year, month))
+        return cached
+
+    events_by_day: Dict[int, List[repository.Event]] = {}
+    for event in get_month_events(year, month):
+        day = datetime.date.fromisoformat(str(event.event_date)[:10]).day
+        events_by_day.setdefault(day, []).append(event)
+
+    text = f"📅 {MONTH_NAMES[month - 1]} {year}\n\n"
+    if not events_by_day:
+        text += "В этом месяце событий нет."
+    lines = [
+        f"📌 {day:02d}.{month:02d} — {event.title}\n"
+        for day, events in sorted(events_by_day.items())
+        for event in events
+    ]
+    for line in lines:
+        if len(text) + len(line) > MESSAGE_LIMIT - 100:
+            text += "…\nНажмите на день, чтобы увидеть все его события."
+            break
+        text += line
+
+    prev_month = shift_month(year, month, -1)
+    next_month = shift_month(year, month, 1)
+    keyboard = get_month_keyboard(year, month, set(events_by_day), prev_month, next_month)
+
+    _cache[(year, month)] = text, keyboard, events_by_day
+    if len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return _cache[(year, month)]
+
+
+def invalidate_month(date: datetime.date):
+    """Сбрасывает закэшированный месяц после добавления события"""
+    _cache.pop((date.year, date.month), None)
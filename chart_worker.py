@@ -0,0 +1,38 @@
+import io
+from typing import List
+
+# Код дочерних процессов отрисовки графиков. Модуль намеренно ничего не импортирует из бота:
+# процесс пула запускается методом spawn и загружает только то, что нужно для рисования.
+
+
+def render_png(title: str, percents: List[float], per_question: List[float]) -> bytes:
+    """Рисует гистограмму баллов и долю верных ответов по вопросам; выполняется в дочернем процессе"""
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib import pyplot as plt
+
+    fig, (scores, questions) = plt.subplots(1, 2, figsize=(11, 4.5), dpi=100)
+    try:
+        fig.suptitle(title)
+
+        scores.hist(percents, bins=range(0, 101, 10), color='#4a90d9', edgecolor='white')
+        scores.set_title(f"Распределение баллов (n={len(percents)})")
+        scores.set_xlabel("Процент верных ответов")
+        scores.set_ylabel("Студентов")
+        scores.set_xlim(0, 100)
+
+        numbers = range(1, len(per_question) + 1)
+        colors = ['#d9534f' if value < 50 else '#5cb85c' for value in per_question]
+        questions.bar(numbers, per_question, color=colors)
+        questions.set_title("Верные ответы по вопросам")
+        questions.set_xlabel("Вопрос")
+        questions.set_ylabel("% верных")
+        questions.set_ylim(0, 100)
+        questions.set_xticks(list(numbers))
+
+        fig.tight_layout()
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png')
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
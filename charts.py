@@ -0,0 +1,59 @@
+import asyncio
+import importlib.util
+import json
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+from chart_worker import render_png
+from config import Config
+from questions import compile_questions, normalize_answers
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# matplotlib — необязательная зависимость (requirements-charts.txt): без нее команда графиков недоступна
+HAS_MATPLOTLIB = importlib.util.find_spec('matplotlib') is not None
+
+
+def collect_chart_data(questions_json: str, rows: Sequence[Tuple[str, int, int]]) -> Tuple[List[float], List[float]]:
+    """По вопросам теста и строкам (answers, score, total_questions) считает проценты студентов
+    и средний балл за каждый вопрос (с учетом частичных баллов)"""
+    matchers = compile_questions(json.loads(questions_json))
+    percents = []
+    correct = [0.0] * len(matchers)
+    for answers_json, score, total in rows:
+        percents.append(100 * score / total if total else 0)
+        answers = normalize_answers(json.loads(answers_json))
+        for i, matcher in enumerate(matchers):
+            correct[i] += matcher.score(answers.get(i))
+    per_question = [100 * credit / len(rows) for credit in correct] if rows else []
+    return percents, per_question
+
+
+class ChartRenderer:
+    """Отрисовка графиков в пуле процессов: matplotlib не занимает цикл событий и GIL бота"""
+
+    def __init__(self, workers: int = 1):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    async def render(self, title: str, percents: List[float], per_question: List[float]) -> bytes:
+        if self._executor is None:
+            # spawn, а не fork: к этому времени у бота уже есть потоки (логи, бэкапы, to_thread),
+            # и форк мог бы унаследовать захваченные ими блокировки
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        png = await loop.run_in_executor(self._executor, render_png, title, percents, per_question)
+        metrics.observe('charts.render', loop.time() - started)
+        return png
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+chart_renderer = ChartRenderer(Config.CHART_WORKERS)
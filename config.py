@@ -5,4 +5,54 @@ load_dotenv()
 
 class Config:
     BOT_TOKEN = os.getenv('BOT_TOKEN')
-    ADMIN_IDS = list(map(int, os.getenv('ADMIN_IDS').split(',')))
\ No newline at end of file
+    ADMIN_IDS = list(map(int, os.getenv('ADMIN_IDS').split(',')))
+    CALLBACK_DEDUP_WINDOW = float(os.getenv('CALLBACK_DEDUP_WINDOW', '1.0'))
+    ALBUM_LATENCY = float(os.getenv('ALBUM_LATENCY', '0.6'))
+    HOMEWORK_PUSH = os.getenv('HOMEWORK_PUSH', '0') == '1'
+    FILES_DIR = os.getenv('FILES_DIR', 'files')
+    FILE_ARCHIVE_CONCURRENCY = int(os.getenv('FILE_ARCHIVE_CONCURRENCY', '4'))
+    ICS_HOST = os.getenv('ICS_HOST', '0.0.0.0')
+    ICS_PORT = int(os.getenv('ICS_PORT', '0'))
+    ICS_BASE_URL = os.getenv('ICS_BASE_URL', '').rstrip('/')
+    DRAIN_TIMEOUT = float(os.getenv('DRAIN_TIMEOUT', '25'))
+    MAX_CONCURRENT_UPDATES = int(os.getenv('MAX_CONCURRENT_UPDATES', '64'))
+    SHED_QUEUE_LATENCY = float(os.getenv('SHED_QUEUE_LATENCY', '1.0'))
+    SNAPSHOT_PATH = os.getenv('SNAPSHOT_PATH', 'student_assistant_snapshot.db')
+    SNAPSHOT_MAX_AGE = float(os.getenv('SNAPSHOT_MAX_AGE', '300'))
+    BACKUP_DIR = os.getenv('BACKUP_DIR', 'backups')
+    BACKUP_INTERVAL = float(os.getenv('BACKUP_INTERVAL', str(6 * 3600)))
+    BACKUP_KEEP = int(os.getenv('BACKUP_KEEP', '14'))
+    BACKUP_PAGES = int(os.getenv('BACKUP_PAGES', '256'))
+    BACKUP_SLEEP = float(os.getenv('BACKUP_SLEEP', '0.05'))
+    ARCHIVE_PATH = os.getenv('ARCHIVE_PATH', 'student_assistant_archive.db')
+    ARCHIVE_AFTER_DAYS = float(os.getenv('ARCHIVE_AFTER_DAYS', '180'))
+    ARCHIVE_INTERVAL = float(os.getenv('ARCHIVE_INTERVAL', str(24 * 3600)))
+    SQL_PROFILE = os.getenv('SQL_PROFILE', '1') == '1'
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '50'))
+    TRACE_FILE = os.getenv('TRACE_FILE', 'logs/traces.jsonl')
+    TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', '0.05'))
+    TRACE_SLOW_MS = float(os.getenv('TRACE_SLOW_MS', '1000'))
+    TRACE_MAX_BYTES = int(os.getenv('TRACE_MAX_BYTES', str(10 * 1024 * 1024)))
+    TRACE_BACKUPS = int(os.getenv('TRACE_BACKUPS', '5'))
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_LEVELS = os.getenv('LOG_LEVELS', 'aiogram.event=WARNING')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+    LOOP_LAG_INTERVAL = float(os.getenv('LOOP_LAG_INTERVAL', '0.5'))
+    FLOOD_USER_RATE = float(os.getenv('FLOOD_USER_RATE', '2'))
+    FLOOD_USER_BURST = float(os.getenv('FLOOD_USER_BURST', '10'))
+    FLOOD_CHAT_RATE = float(os.getenv('FLOOD_CHAT_RATE', '5'))
+    FLOOD_CHAT_BURST = float(os.getenv('FLOOD_CHAT_BURST', '30'))
+    API_POOL_LIMIT = int(os.getenv('API_POOL_LIMIT', '100'))
+    API_KEEPALIVE = float(os.getenv('API_KEEPALIVE', '60'))
+    API_DNS_TTL = int(os.getenv('API_DNS_TTL', '600'))
+    API_TIMEOUT = float(os.getenv('API_TIMEOUT', '15'))
+    API_UPLOAD_TIMEOUT = float(os.getenv('API_UPLOAD_TIMEOUT', '120'))
+    API_RETRIES = int(os.getenv('API_RETRIES', '3'))
+    API_RETRY_BACKOFF = float(os.getenv('API_RETRY_BACKOFF', '0.5'))
+    API_MAX_RETRY_AFTER = float(os.getenv('API_MAX_RETRY_AFTER', '30'))
+    OUTBOX_INTERVAL = float(os.getenv('OUTBOX_INTERVAL', '10'))
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '12'))
+    OUTBOX_BASE_DELAY = float(os.getenv('OUTBOX_BASE_DELAY', '30'))
+    OUTBOX_MAX_DELAY = float(os.getenv('OUTBOX_MAX_DELAY', '3600'))
+    CHART_WORKERS = int(os.getenv('CHART_WORKERS', '1'))
+    SIMILARITY_THRESHOLD = float(os.getenv('SIMILARITY_THRESHOLD', '0.7'))
\ No newline at end of file
@@ -2,11 +2,18 @@ import sqlite3
 from datetime import datetime
 from aiogram.types import Message
 from config import Config
+from sql_profiler import ProfiledConnection
 import os
 os.environ['TZ'] = 'Asia/Novosibirsk'  
+
+DB_PATH = 'student_assistant.db'
+
 def init_db():
-    conn = sqlite3.connect('student_assistant.db')
+    conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
+
+    # WAL: readers (reports, backups) no longer block writers and vice versa
+    cursor.execute("PRAGMA journal_mode=WAL")
     
     # Users table
     cursor.execute('''
@@ -112,9 +119,225 @@ def init_db():
         FOREIGN KEY (material_id) REFERENCES lecture_materials (material_id)
     )
     ''')
-    
+
+    # Homework submission attachments (one submission may carry a whole album)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS homework_attachments (
+        attachment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        submission_id INTEGER NOT NULL,
+        file_id TEXT NOT NULL,
+        file_type TEXT NOT NULL,
+        order_num INTEGER NOT NULL,
+        FOREIGN KEY (submission_id) REFERENCES homework_submissions (submission_id)
+    )
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_homework_attachments_submission
+    ON homework_attachments (submission_id, order_num)
+    ''')
+
+    # Local copies of Telegram files, addressed by file_unique_id
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS stored_files (
+        file_unique_id TEXT PRIMARY KEY,
+        path TEXT NOT NULL,
+        size INTEGER,
+        stored_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS stored_file_refs (
+        file_id TEXT PRIMARY KEY,
+        file_unique_id TEXT NOT NULL,
+        FOREIGN KEY (file_unique_id) REFERENCES stored_files (file_unique_id)
+    )
+    ''')
+
+    # Personal tokens of the iCalendar feed
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS calendar_tokens (
+        user_id INTEGER PRIMARY KEY,
+        token TEXT NOT NULL UNIQUE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (user_id)
+    )
+    ''')
+
+    # Small key/value state of the bot process (update offset etc.)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS bot_state (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    )
+    ''')
+
+    # Notifications that could not be delivered yet; next_attempt_at IS NULL means given up
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS outbox (
+        outbox_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        chat_id INTEGER NOT NULL,
+        steps TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at REAL,
+        last_error TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_outbox_due
+    ON outbox (next_attempt_at)
+    ''')
+
+    # MinHash signatures of text submissions and their LSH buckets for the similarity search
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS submission_signatures (
+        submission_id INTEGER PRIMARY KEY,
+        hw_id INTEGER NOT NULL,
+        signature BLOB NOT NULL,
+        FOREIGN KEY (submission_id) REFERENCES homework_submissions (submission_id)
+    )
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_submission_signatures_hw
+    ON submission_signatures (hw_id)
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS submission_lsh (
+        hw_id INTEGER NOT NULL,
+        band INTEGER NOT NULL,
+        bucket INTEGER NOT NULL,
+        submission_id INTEGER NOT NULL,
+        PRIMARY KEY (hw_id, band, bucket, submission_id)
+    ) WITHOUT ROWID
+    ''')
+
+    # Columns added after the initial schema
+    add_column_if_missing(cursor, 'tests', 'time_limit', 'INTEGER')
+    add_column_if_missing(cursor, 'homework_submissions', 'chat_id', 'INTEGER')
+    add_column_if_missing(cursor, 'homework_submissions', 'message_id', 'INTEGER')
+    add_column_if_missing(cursor, 'homework_submissions', 'is_read', 'INTEGER NOT NULL DEFAULT 0')
+    add_column_if_missing(cursor, 'homework_submissions', 'grade', 'INTEGER')
+    add_column_if_missing(cursor, 'homework_attachments', 'message_id', 'INTEGER')
+
+    # Month range queries of the calendar view
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_calendar_events_date
+    ON calendar_events (event_date)
+    ''')
+
+    # Indexes for the teacher review inbox
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_homework_submissions_hw
+    ON homework_submissions (hw_id, submission_id)
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_homework_submissions_status
+    ON homework_submissions (hw_id, is_read, grade)
+    ''')
+
+    init_search_index(cursor)
+
     conn.commit()
     conn.close()
 
+# Sources of the full-text index: table -> (kind, key column, indexed columns, condition).
+# {row} stands for the source row; rowid of an index entry is key * 4 + kind code,
+# so triggers update the index by rowid without scanning it.
+SEARCH_SOURCES = {
+    'lecture_materials': (
+        'lecture', 'material_id',
+        "{row}.title, {row}.description, {row}.material_id",
+        None
+    ),
+    'lecture_content': (
+        'lecture_content', 'content_id',
+        "(SELECT title FROM lecture_materials WHERE material_id = {row}.material_id), "
+        "{row}.message, {row}.material_id",
+        "{row}.message IS NOT NULL"
+    ),
+    'homework': (
+        'homework', 'hw_id',
+        "{row}.title, {row}.description, {row}.hw_id",
+        None
+    ),
+    'calendar_events': (
+        'event', 'event_id',
+        "{row}.title, {row}.description, {row}.event_id",
+        None
+    ),
+}
+SEARCH_KINDS = tuple(kind for kind, *_ in SEARCH_SOURCES.values())
+
+def search_insert_sql(table: str, row: str, from_table: bool = False) -> str:
+    kind, key, columns, condition = SEARCH_SOURCES[table]
+    sql = (
+        f"INSERT INTO search_index (rowid, title, body, ref_id) "
+        f"SELECT {row}.{key} * 4 + {SEARCH_KINDS.index(kind)}, {columns.format(row=row)}"
+    )
+    if from_table:
+        sql += f" FROM {table} AS {row}"
+    if condition:
+        sql += f" WHERE {condition.format(row=row)}"
+    return sql
+
+def init_search_index(cursor):
+    """Создает FTS5-индекс по лекциям, ДЗ и событиям и триггеры для его обновления"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'search_index'")
+    exists = cursor.fetchone() is not None
+
+    cursor.execute('''
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        title,
+        body,
+        ref_id UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    ''')
+
+    for table, (kind, key, _, _) in SEARCH_SOURCES.items():
+        delete = f"DELETE FROM search_index WHERE rowid = OLD.{key} * 4 + {SEARCH_KINDS.index(kind)};"
+        insert = search_insert_sql(table, 'NEW') + ";"
+        cursor.executescript(f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_search_ai AFTER INSERT ON {table}
+        BEGIN
+            {insert}
+        END;
+        CREATE TRIGGER IF NOT EXISTS {table}_search_ad AFTER DELETE ON {table}
+        BEGIN
+            {delete}
+        END;
+        CREATE TRIGGER IF NOT EXISTS {table}_search_au AFTER UPDATE ON {table}
+        BEGIN
+            {delete}
+            {insert}
+        END;
+        ''')
+
+        if not exists:
+            # Fill the index with rows created before it existed
+            cursor.execute(search_insert_sql(table, 'src', from_table=True))
+
+def add_column_if_missing(cursor, table: str, column: str, definition: str):
+    """Добавляет столбец в существующую таблицу, если его еще нет"""
+    cursor.execute(f"PRAGMA table_info({table})")
+    if column not in {row[1] for row in cursor.fetchall()}:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
 def get_db_connection():
-    return sqlite3.connect('student_assistant.db')
\ No newline at end of file
+    if Config.SQL_PROFILE:
+        return sqlite3.connect(DB_PATH, factory=ProfiledConnection)
+    return sqlite3.connect(DB_PATH)
+
+def backup_to(path: str, pages: int = -1, sleep: float = 0.25):
+    """Копирует живую БД в файл онлайн-бэкапом SQLite, подменяя файл атомарно"""
+    tmp_path = path + '.tmp'
+    source = get_db_connection()
+    target = sqlite3.connect(tmp_path)
+    try:
+        source.backup(target, pages=pages, sleep=sleep)
+        # Копия — самостоятельный файл без -wal/-shm
+        target.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        target.close()
+        source.close()
+    os.replace(tmp_path, path)
\ No newline at end of file
@@ -0,0 +1,89 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ExpireHandler = Callable[[Hashable, Any], Awaitable[None]]
+
+
+class DeadlineScheduler:
+    """Общая очередь дедлайнов: одна куча и одна фоновая задача на все попытки"""
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._entries: Dict[Hashable, Tuple[float, int, Any]] = {}
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._handler: Optional[ExpireHandler] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, key: Hashable, deadline: float, payload: Any = None):
+        """Ставит (или переносит) дедлайн для ключа; deadline — время по time.time()"""
+        seq = next(self._counter)
+        self._entries[key] = (deadline, seq, payload)
+        heapq.heappush(self._heap, (deadline, seq, key))
+        # Будим обработчик только если новый дедлайн стал ближайшим
+        if self._heap[0][1] == seq:
+            self._wakeup.set()
+
+    def cancel(self, key: Hashable):
+        """Снимает дедлайн; запись в куче удаляется лениво при обходе"""
+        self._entries.pop(key, None)
+
+    def start(self, handler: ExpireHandler):
+        self._handler = handler
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _pop_expired(self, now: float) -> List[Tuple[Hashable, Any]]:
+        expired = []
+        while self._heap and self._heap[0][0] <= now:
+            _, seq, key = heapq.heappop(self._heap)
+            entry = self._entries.get(key)
+            # Запись устарела: дедлайн отменен или перенесен
+            if entry is None or entry[1] != seq:
+                continue
+            del self._entries[key]
+            expired.append((key, entry[2]))
+        return expired
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            now = time.time()
+            expired = self._pop_expired(now)
+            if expired:
+                results = await asyncio.gather(
+                    *(self._handler(key, payload) for key, payload in expired),
+                    return_exceptions=True
+                )
+                for (key, _), result in zip(expired, results):
+                    if isinstance(result, Exception):
+                        logger.error(f"Ошибка обработки дедлайна {key}: {result}", exc_info=result)
+                continue
+
+            timeout = self._heap[0][0] - now if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+# Дедлайны попыток прохождения тестов
+test_deadlines = DeadlineScheduler()
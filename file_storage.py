@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import os
+import zipfile
+from typing import Dict, Iterable, Optional, Tuple
+
+import aiofiles
+from aiogram import Bot
+
+from config import Config
+from database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+
+class FileArchiver:
+    """Фоновая выгрузка файлов из Telegram в локальное хранилище, адресуемое по file_unique_id"""
+
+    def __init__(self, root: str = 'files', concurrency: int = 4):
+        self.root = root
+        self.concurrency = concurrency
+        self._bot: Optional[Bot] = None
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._workers = []
+
+    def start(self, bot: Bot):
+        self._bot = bot
+        os.makedirs(self.root, exist_ok=True)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        self.enqueue_missing()
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def enqueue(self, *file_ids: str):
+        """Ставит файлы в очередь на архивацию"""
+        for file_id in file_ids:
+            if file_id:
+                self._queue.put_nowait(file_id)
+
+    def enqueue_missing(self):
+        """Ставит в очередь все известные файлы, которых еще нет в хранилище"""
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT file_id FROM homework_attachments
+                UNION SELECT file_id FROM homework_submissions WHERE file_id IS NOT NULL
+                UNION SELECT file_id FROM lecture_content WHERE file_id IS NOT NULL
+                EXCEPT SELECT file_id FROM stored_file_refs
+            """)
+            file_ids = [row[0] for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+        if file_ids:
+            logger.info(f"{len(file_ids)} files queued for archiving")
+        self.enqueue(*file_ids)
+
+    async def _worker(self):
+        while True:
+            file_id = await self._queue.get()
+            try:
+                await self.ensure(file_id)
+            except Exception as e:
+                logger.error(f"Failed to archive file {file_id}: {e}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    async def ensure(self, file_id: str) -> Optional[str]:
+        """Возвращает локальный путь к файлу, при необходимости скачивая его"""
+        path = self._lookup(file_id)
+        if path:
+            return path
+
+        # Параллельные запросы одного файла ждут одну и ту же загрузку
+        task = self._inflight.get(file_id)
+        if task is None:
+            task = self._inflight[file_id] = asyncio.create_task(self._download(file_id))
+            task.add_done_callback(lambda _: self._inflight.pop(file_id, None))
+        return await task
+
+    def _lookup(self, file_id: str) -> Optional[str]:
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT f.path FROM stored_file_refs r
+                JOIN stored_files f ON f.file_unique_id = r.file_unique_id
+                WHERE r.file_id = ?
+            """, (file_id,))
+            row = cursor.fetchone()
+        finally:
+            conn.close()
+        return row[0] if row and os.path.exists(row[0]) else None
+
+    async def _download(self, file_id: str) -> str:
+        async with self._semaphore:
+            file = await self._bot.get_file(file_id)
+
+            conn = get_db_connection()
+            try:
+                cursor = conn.cursor()
+                cursor.execute("SELECT path FROM stored_files WHERE file_unique_id = ?", (file.file_unique_id,))
+                row = cursor.fetchone()
+            finally:
+                conn.close()
+
+            # Тот же файл мог быть уже сохранен под другим file_id
+            path = row[0] if row and os.path.exists(row[0]) else None
+            if path is None:
+                path = await self._stream_to_disk(file.file_unique_id, file.file_path)
+
+            conn = get_db_connection()
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO stored_files (file_unique_id, path, size) VALUES (?, ?, ?)",
+                    (file.file_unique_id, path, os.path.getsize(path))
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO stored_file_refs (file_id, file_unique_id) VALUES (?, ?)",
+                    (file_id, file.file_unique_id)
+                )
+                conn.commit()
+            finally:
+                conn.close()
+            return path
+
+    async def _stream_to_disk(self, file_unique_id: str, file_path: str) -> str:
+        directory = os.path.join(self.root, file_unique_id[:2])
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, file_unique_id + os.path.splitext(file_path)[1])
+        tmp_path = path + '.part'
+
+        url = self._bot.session.api.file_url(self._bot.token, file_path)
+        async with aiofiles.open(tmp_path, 'wb') as f:
+            async for chunk in self._bot.session.stream_content(url, timeout=60):
+                await f.write(chunk)
+        os.replace(tmp_path, path)
+        return path
+
+
+def write_zip(path: str, entries: Iterable[Tuple[str, Optional[str], Optional[str]]]):
+    """Пишет ZIP на диск потоково: (имя в архиве, путь к файлу, текст) по одной записи за раз"""
+    with zipfile.ZipFile(path, 'w') as archive:
+        for arcname, file_path, text in entries:
+            if file_path:
+                # Медиафайлы уже сжаты, поэтому кладем их без компрессии
+                archive.write(file_path, arcname, compress_type=zipfile.ZIP_STORED)
+            else:
+                archive.writestr(arcname, text, compress_type=zipfile.ZIP_DEFLATED)
+
+
+file_archive = FileArchiver(Config.FILES_DIR, Config.FILE_ARCHIVE_CONCURRENCY)
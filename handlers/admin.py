@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from datetime import datetime
 from aiogram import Router, F
@@ -6,13 +7,20 @@ from aiogram.fsm.context import FSMContext
 from aiogram.filters import StateFilter
 from states import AdminStates
 from database import get_db_connection
+from file_storage import file_archive
+from calendar_view import invalidate_month
+from ical_feed import calendar_feed
+from quiz_import import SUPPORTED_EXTENSIONS, format_report, parse_test_file
+from questions import MULTI, NUMERIC, SINGLE, TEXT, clean_question, question_error, validate_questions
 from keyboards import (
     get_admin_keyboard, 
     get_cancel_keyboard, 
     get_yes_no_keyboard, 
-    get_back_keyboard
+    get_back_keyboard,
+    get_question_type_keyboard
 )
 import json
+import re
 
 router = Router()
 logger = logging.getLogger(__name__)
@@ -29,22 +37,15 @@ async def parse_datetime(message: Message, text: str) -> datetime | None:
         )
         return None
 
-def validate_questions(questions: list) -> bool:
-    """Проверяет корректность структуры вопросов"""
-    if not isinstance(questions, list):
-        return False
-        
-    for q in questions:
-        if not isinstance(q, dict):
-            return False
-        if not all(k in q for k in ['text', 'options', 'correct']):
-            return False
-        if not isinstance(q['options'], list) or len(q['options']) < 2:
-            return False
-        if not isinstance(q['correct'], int) or q['correct'] < 0 or q['correct'] >= len(q['options']):
-            return False
-            
-    return True
+QUESTION_TYPE_BUTTONS = {
+    "1️⃣ Один ответ": SINGLE,
+    "☑️ Несколько ответов": MULTI,
+    "🔢 Число": NUMERIC,
+    "✍️ Текст": TEXT,
+}
+
+# Ограничение Bot API на скачивание файлов
+MAX_TEST_FILE_SIZE = 20 * 1024 * 1024
 
 # ===== ОБРАБОТКА ОТМЕНЫ ДЛЯ ВСЕХ РАЗДЕЛОВ =====
 @router.message(
@@ -53,11 +54,15 @@ def validate_questions(questions: list) -> bool:
         AdminStates.waiting_for_test_title,
         AdminStates.waiting_for_test_description,
         AdminStates.waiting_for_question_text,
+        AdminStates.waiting_for_question_type,
         AdminStates.waiting_for_question_options,
         AdminStates.waiting_for_question_correct,
+        AdminStates.waiting_for_question_answer,
         AdminStates.waiting_for_more_questions,
         AdminStates.waiting_for_test_start_time,
         AdminStates.waiting_for_test_end_time,
+        AdminStates.waiting_for_test_time_limit,
+        AdminStates.waiting_for_test_file,
         # ДЗ
         AdminStates.waiting_for_hw_title,
         AdminStates.waiting_for_hw_description,
@@ -96,6 +101,15 @@ async def create_test_start(message: Message, state: FSMContext):
     await state.set_state(AdminStates.waiting_for_test_title)
     await state.update_data(questions=[])
 
+@router.message(F.text == "📥 Импорт теста")
+async def import_test_start(message: Message, state: FSMContext):
+    await message.answer(
+        "Введите название теста:",
+        reply_markup=get_cancel_keyboard()
+    )
+    await state.set_state(AdminStates.waiting_for_test_title)
+    await state.update_data(questions=[], import_file=True)
+
 @router.message(AdminStates.waiting_for_test_title)
 async def process_test_title(message: Message, state: FSMContext):
     await state.update_data(title=message.text)
@@ -108,20 +122,86 @@ async def process_test_title(message: Message, state: FSMContext):
 @router.message(AdminStates.waiting_for_test_description)
 async def process_test_description(message: Message, state: FSMContext):
     await state.update_data(description=message.text)
+    data = await state.get_data()
+    if data.get('import_file'):
+        await message.answer(
+            "Отправьте файл с вопросами:\n"
+            "• .json — список вопросов {\"text\", \"options\", \"correct\"} (correct с нуля); "
+            "другие типы: \"type\": \"multi\" (correct — список), \"numeric\" (answer, tolerance), "
+            "\"text\" (answers, patterns)\n"
+            "• .jsonl — один такой вопрос на строку\n"
+            "• .csv — вопрос; номер правильного ответа (или несколько через пробел); вариант 1; вариант 2; ...\n"
+            "• .gift/.txt — формат Moodle GIFT: выбор, веса %N%, верно/неверно, {#число}, короткий ответ",
+            reply_markup=get_cancel_keyboard()
+        )
+        await state.set_state(AdminStates.waiting_for_test_file)
+        return
     await message.answer(
         "Введите текст первого вопроса:",
         reply_markup=get_cancel_keyboard()
     )
     await state.set_state(AdminStates.waiting_for_question_text)
 
+async def add_question(message: Message, state: FSMContext, question: dict):
+    """Проверяет собранный вопрос и добавляет его в тест"""
+    error = question_error(question)
+    if error:
+        await message.answer(f"❌ {error.capitalize()}. Введите снова:")
+        return
+    
+    data = await state.get_data()
+    questions = data.get("questions", [])
+    questions.append(clean_question(question))
+    await state.update_data(questions=questions, current_question=None)
+    
+    await message.answer(
+        "✅ Вопрос добавлен! Добавить еще вопрос?",
+        reply_markup=get_yes_no_keyboard()
+    )
+    await state.set_state(AdminStates.waiting_for_more_questions)
+
 @router.message(AdminStates.waiting_for_question_text)
 async def process_question_text(message: Message, state: FSMContext):
     await state.update_data(current_question={"text": message.text})
     await message.answer(
-        "Введите варианты ответов через запятую:\nПример: Вариант 1, Вариант 2, Вариант 3",
-        reply_markup=get_cancel_keyboard()
+        "Выберите тип вопроса:",
+        reply_markup=get_question_type_keyboard()
     )
-    await state.set_state(AdminStates.waiting_for_question_options)
+    await state.set_state(AdminStates.waiting_for_question_type)
+
+@router.message(AdminStates.waiting_for_question_type)
+async def process_question_type(message: Message, state: FSMContext):
+    kind = QUESTION_TYPE_BUTTONS.get(message.text)
+    if kind is None:
+        await message.answer("❌ Выберите тип вопроса кнопкой:", reply_markup=get_question_type_keyboard())
+        return
+    
+    data = await state.get_data()
+    current_question = data.get("current_question", {})
+    current_question["type"] = kind
+    await state.update_data(current_question=current_question)
+    
+    if kind in (SINGLE, MULTI):
+        await message.answer(
+            "Введите варианты ответов через запятую:\nПример: Вариант 1, Вариант 2, Вариант 3",
+            reply_markup=get_cancel_keyboard()
+        )
+        await state.set_state(AdminStates.waiting_for_question_options)
+        return
+    
+    if kind == NUMERIC:
+        prompt = (
+            "Введите правильный ответ и допустимую погрешность через пробел.\n"
+            "Пример: 3.14 0.01 (погрешность можно не указывать)"
+        )
+    else:
+        prompt = (
+            "Введите допустимые ответы, каждый с новой строки (синонимы — отдельными строками).\n"
+            "Регистр, ё/е и знаки препинания не учитываются. "
+            "Строка вида /шаблон/ — регулярное выражение, которому должен соответствовать весь ответ."
+        )
+    await message.answer(prompt, reply_markup=get_cancel_keyboard())
+    await state.set_state(AdminStates.waiting_for_question_answer)
 
 @router.message(AdminStates.waiting_for_question_options)
 async def process_question_options(message: Message, state: FSMContext):
@@ -136,40 +216,99 @@ async def process_question_options(message: Message, state: FSMContext):
     await state.update_data(current_question=current_question)
     
     options_text = "\n".join(f"{i+1}. {opt}" for i, opt in enumerate(options))
+    if current_question.get("type") == MULTI:
+        prompt = "Введите номера всех правильных ответов через запятую (например: 1, 3):"
+    else:
+        prompt = "Введите номер правильного ответа (1, 2, 3...):"
     await message.answer(
-        f"Варианты:\n{options_text}\n\nВведите номер правильного ответа (1, 2, 3...):",
+        f"Варианты:\n{options_text}\n\n{prompt}",
         reply_markup=get_cancel_keyboard()
     )
     await state.set_state(AdminStates.waiting_for_question_correct)
 
 @router.message(AdminStates.waiting_for_question_correct)
 async def process_question_correct(message: Message, state: FSMContext):
+    data = await state.get_data()
+    current_question = data.get("current_question", {})
     try:
-        correct = int(message.text) - 1
-        data = await state.get_data()
-        current_question = data.get("current_question", {})
-        options = current_question.get("options", [])
-        
-        if correct < 0 or correct >= len(options):
-            raise ValueError
-        
-        question = {
-            "text": current_question["text"],
-            "options": options,
-            "correct": correct
-        }
-        
-        questions = data.get("questions", [])
-        questions.append(question)
-        await state.update_data(questions=questions, current_question=None)
-        
-        await message.answer(
-            "✅ Вопрос добавлен! Добавить еще вопрос?",
-            reply_markup=get_yes_no_keyboard()
-        )
-        await state.set_state(AdminStates.waiting_for_more_questions)
+        numbers = [int(part) - 1 for part in re.split(r"[\s,;]+", message.text or "") if part]
     except ValueError:
+        numbers = []
+    if not numbers:
         await message.answer("❌ Неверный номер. Введите корректный номер варианта:")
+        return
+    
+    if current_question.get("type") == MULTI:
+        correct = sorted(set(numbers))
+    elif len(numbers) == 1:
+        correct = numbers[0]
+    else:
+        await message.answer("❌ Нужен один номер. Введите корректный номер варианта:")
+        return
+    await add_question(message, state, {**current_question, "correct": correct})
+
+@router.message(AdminStates.waiting_for_question_answer)
+async def process_question_answer(message: Message, state: FSMContext):
+    data = await state.get_data()
+    current_question = data.get("current_question", {})
+    text = (message.text or "").strip()
+    
+    if current_question.get("type") == NUMERIC:
+        parts = text.replace(",", ".").split()
+        try:
+            answer = float(parts[0])
+            tolerance = float(parts[1]) if len(parts) > 1 else 0.0
+        except (IndexError, ValueError):
+            await message.answer("❌ Введите число и, при необходимости, погрешность. Пример: 3.14 0.01")
+            return
+        await add_question(message, state, {**current_question, "answer": answer, "tolerance": tolerance})
+        return
+    
+    answers, patterns = [], []
+    for line in filter(None, (line.strip() for line in text.splitlines())):
+        if len(line) > 2 and line.startswith("/") and line.endswith("/"):
+            patterns.append(line[1:-1])
+        else:
+            answers.append(line)
+    await add_question(message, state, {**current_question, "answers": answers, "patterns": patterns})
+
+@router.message(AdminStates.waiting_for_test_file, F.document)
+async def process_test_file(message: Message, state: FSMContext):
+    document = message.document
+    file_name = document.file_name or ''
+    if not file_name.lower().endswith(SUPPORTED_EXTENSIONS):
+        await message.answer("❌ Поддерживаются файлы .json, .jsonl, .csv, .gift и .txt. Отправьте другой файл:")
+        return
+    if document.file_size and document.file_size > MAX_TEST_FILE_SIZE:
+        await message.answer("❌ Файл больше 20 МБ. Отправьте файл поменьше:")
+        return
+
+    try:
+        buffer = await message.bot.download(document)
+        questions, errors = await asyncio.to_thread(parse_test_file, buffer.getvalue(), file_name)
+    except Exception as e:
+        logger.error(f"Ошибка импорта теста из {file_name}: {e}", exc_info=True)
+        await message.answer("❌ Не удалось прочитать файл. Попробуйте еще раз:")
+        return
+
+    report = format_report(questions, errors)
+    if errors or not questions:
+        await message.answer(
+            f"❌ Файл не импортирован.\n\n{report}\n\nИсправьте файл и отправьте его снова:",
+            reply_markup=get_cancel_keyboard()
+        )
+        return
+
+    await state.update_data(questions=questions)
+    await message.answer(
+        f"✅ {report}\n\nВведите дату и время начала теста (ДД.ММ.ГГГГ ЧЧ:ММ):",
+        reply_markup=get_cancel_keyboard()
+    )
+    await state.set_state(AdminStates.waiting_for_test_start_time)
+
+@router.message(AdminStates.waiting_for_test_file)
+async def process_test_file_missing(message: Message, state: FSMContext):
+    await message.answer("Отправьте файл теста документом или нажмите «❌ Отмена».")
 
 @router.message(AdminStates.waiting_for_more_questions, F.text == "✅ Да")
 async def add_more_questions(message: Message, state: FSMContext):
@@ -222,16 +361,38 @@ async def process_test_end_time(message: Message, state: FSMContext):
         await message.answer("❌ Дата окончания должна быть позже начала! Введите снова:")
         return
         
-    await save_test_to_db(message, state, start_time, end_time)
+    await state.update_data(end_time=end_time)
+    await message.answer(
+        "Введите ограничение времени на прохождение теста в минутах\n"
+        "(0 — без ограничения):",
+        reply_markup=get_cancel_keyboard()
+    )
+    await state.set_state(AdminStates.waiting_for_test_time_limit)
+
+@router.message(AdminStates.waiting_for_test_time_limit)
+async def process_test_time_limit(message: Message, state: FSMContext):
+    try:
+        time_limit = int(message.text)
+        if time_limit < 0:
+            raise ValueError
+    except (TypeError, ValueError):
+        await message.answer("❌ Введите целое число минут (0 — без ограничения):")
+        return
+
+    data = await state.get_data()
+    await save_test_to_db(message, state, data['start_time'], data['end_time'], time_limit or None)
 
-async def save_test_to_db(message: Message, state: FSMContext, start_time: datetime, end_time: datetime):
+async def save_test_to_db(message: Message, state: FSMContext, start_time: datetime, end_time: datetime,
+                          time_limit: int | None = None):
     conn = None
     try:
         data = await state.get_data()
         questions = data.get('questions', [])
         
-        if not validate_questions(questions):
-            await message.answer("❌ Ошибка в вопросах теста! Начните заново.")
+        try:
+            validate_questions(questions)
+        except ValueError as e:
+            await message.answer(f"❌ Ошибка в вопросах теста ({e})! Начните заново.")
             await state.clear()
             return
             
@@ -242,24 +403,27 @@ async def save_test_to_db(message: Message, state: FSMContext, start_time: datet
         
         cursor.execute(
             """INSERT INTO tests 
-            (title, description, questions, start_time, end_time, created_by) 
-            VALUES (?, ?, ?, ?, ?, ?)""",
+            (title, description, questions, start_time, end_time, time_limit, created_by) 
+            VALUES (?, ?, ?, ?, ?, ?, ?)""",
             (
                 data['title'],
                 data['description'],
                 questions_json,
                 start_time.strftime("%Y-%m-%d %H:%M:%S"),
                 end_time.strftime("%Y-%m-%d %H:%M:%S"),
+                time_limit,
                 message.from_user.id
             )
         )
         conn.commit()
+        calendar_feed.invalidate()
         
         await message.answer(
             f"✅ Тест создан!\n\n"
             f"📝 Название: {data['title']}\n"
             f"📅 Начало: {start_time.strftime('%d.%m.%Y %H:%M')}\n"
             f"⏰ Окончание: {end_time.strftime('%d.%m.%Y %H:%M')}\n"
+            f"⏱ Ограничение: {f'{time_limit} мин.' if time_limit else 'нет'}\n"
             f"❓ Вопросов: {len(questions)}",
             reply_markup=get_admin_keyboard()
         )
@@ -324,6 +488,7 @@ async def process_hw_description(message: Message, state: FSMContext):
             )
         
         conn.commit()
+        file_archive.enqueue(file_id)
         await message.answer(
             f"Домашнее задание '{data['title']}' успешно добавлено!",
             reply_markup=get_admin_keyboard()
@@ -397,6 +562,7 @@ async def finish_lecture_creation(message: Message, state: FSMContext):
                 )
         
         conn.commit()
+        file_archive.enqueue(*(c['content'] for c in data['lecture_content'] if c['type'] != 'text'))
         await message.answer(
             f"Лекционный материал '{data['title']}' успешно создан!",
             reply_markup=get_admin_keyboard()
@@ -499,6 +665,8 @@ async def process_event_date(message: Message, state: FSMContext):
             (data['title'], data['description'], event_date, message.from_user.id)
         )
         conn.commit()
+        invalidate_month(event_date)
+        calendar_feed.invalidate()
         await message.answer(
             f"✅ Событие '{data['title']}' добавлено на {event_date.strftime('%d.%m.%Y')}!",
             reply_markup=get_admin_keyboard()
@@ -3,85 +3,123 @@ from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from states import HomeworkStates
 from database import get_db_connection
+import repository
+from config import Config
+from file_storage import file_archive
+from outbox import outbox
+from similarity import similarity_index
 from keyboards import get_cancel_keyboard
 import json
+import logging
 
 router = Router()
+logger = logging.getLogger(__name__)
 
-@router.callback_query(F.data.startswith("hw_"))
+def get_attachment(message: Message) -> tuple[str, str] | None:
+    """Возвращает (file_id, тип файла) вложения сообщения"""
+    if message.document:
+        return message.document.file_id, 'document'
+    if message.photo:
+        return message.photo[-1].file_id, 'photo'
+    if message.video:
+        return message.video.file_id, 'video'
+    if message.audio:
+        return message.audio.file_id, 'audio'
+    return None
+
+@router.callback_query(F.data.startswith("hw_"), flags={"user_lock": True})
 async def view_homework(callback: CallbackQuery, state: FSMContext):
     hw_id = int(callback.data.split("_")[1])
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT title, description FROM homework WHERE hw_id = ?", (hw_id,))
-    hw = cursor.fetchone()
+    hw = repository.homework.get(hw_id)
     
     if not hw:
         await callback.message.answer("Домашнее задание не найдено.")
         return
     
-    response = f"📝 {hw[0]}\n\n"
-    if hw[1]:
-        response += f"{hw[1]}\n\n"
+    response = f"📝 {hw.title}\n\n"
+    if hw.description:
+        response += f"{hw.description}\n\n"
     response += "Отправьте ваше решение в виде сообщения или файла."
     
     await callback.message.answer(response)
     await state.set_state(HomeworkStates.waiting_for_homework)
     await state.update_data(hw_id=hw_id)
-    
-    conn.close()
 
-@router.message(HomeworkStates.waiting_for_homework, F.text | F.document | F.photo | F.video | F.audio)
-async def submit_homework(message: Message, state: FSMContext):
+@router.message(
+    HomeworkStates.waiting_for_homework,
+    F.text | F.document | F.photo | F.video | F.audio,
+    flags={"user_lock": True, "album": True}
+)
+async def submit_homework(message: Message, state: FSMContext, album: list[Message] | None = None):
     data = await state.get_data()
     hw_id = data['hw_id']
+    messages = album or [message]
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    text = next((m.text or m.caption for m in messages if m.text or m.caption), None)
+    attachments = []
+    attachment_message_ids = []
+    for m in messages:
+        attachment = get_attachment(m)
+        if attachment:
+            attachments.append(attachment)
+            attachment_message_ids.append(m.message_id)
     
     # Get homework info for notification
-    cursor.execute("SELECT title, created_by FROM homework WHERE hw_id = ?", (hw_id,))
-    hw_info = cursor.fetchone()
+    hw_info = repository.homework.get(hw_id)
     
-    # Save submission
-    if message.text:
-        cursor.execute(
-            "INSERT INTO homework_submissions (hw_id, user_id, message) VALUES (?, ?, ?)",
-            (hw_id, message.from_user.id, message.text)
-        )
-    elif message.document:
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        # Save submission with all its attachments in one transaction
         cursor.execute(
-            "INSERT INTO homework_submissions (hw_id, user_id, file_id) VALUES (?, ?, ?)",
-            (hw_id, message.from_user.id, message.document.file_id)
+            """INSERT INTO homework_submissions (hw_id, user_id, message, file_id, chat_id, message_id)
+            VALUES (?, ?, ?, ?, ?, ?)""",
+            (hw_id, message.from_user.id, text, attachments[0][0] if attachments else None,
+             message.chat.id, messages[0].message_id)
         )
-    elif message.photo:
-        cursor.execute(
-            "INSERT INTO homework_submissions (hw_id, user_id, file_id) VALUES (?, ?, ?)",
-            (hw_id, message.from_user.id, message.photo[-1].file_id)
+        submission_id = cursor.lastrowid
+        cursor.executemany(
+            """INSERT INTO homework_attachments (submission_id, file_id, file_type, order_num, message_id)
+            VALUES (?, ?, ?, ?, ?)""",
+            [(submission_id, file_id, file_type, order_num, message_id)
+             for order_num, ((file_id, file_type), message_id)
+             in enumerate(zip(attachments, attachment_message_ids), 1)]
         )
-    # Similar for other file types
-    
-    conn.commit()
-    
-    # Notify teacher
-    if hw_info and hw_info[1]:
-        try:
-            await message.bot.send_message(
-                hw_info[1],
-                f"Новая сдача ДЗ '{hw_info[0]}' от {message.from_user.full_name} (@{message.from_user.username})"
-            )
-            if message.text:
-                await message.bot.send_message(hw_info[1], message.text)
-            elif message.document:
-                await message.bot.send_document(hw_info[1], message.document.file_id)
-            elif message.photo:
-                await message.bot.send_photo(hw_info[1], message.photo[-1].file_id)
-            # Similar for other file types
-        except Exception as e:
-            print(f"Failed to notify teacher: {e}")
+        conn.commit()
+        file_archive.enqueue(*(file_id for file_id, _ in attachments))
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Failed to save homework submission: {e}", exc_info=True)
+        await message.answer("❌ Ошибка при отправке решения. Попробуйте еще раз.")
+        return
+    finally:
+        conn.close()
     
-    conn.close()
+    # Teachers review submissions in the inbox; pushing every submission is opt-in
+    if Config.HOMEWORK_PUSH and hw_info and hw_info.created_by:
+        steps = [('text', f"Новая сдача ДЗ '{hw_info.title}' от {message.from_user.full_name} (@{message.from_user.username})")]
+        if text:
+            steps.append(('text', text))
+        if attachments:
+            steps.append(('attachments', attachments))
+        # Что не ушло сразу, дошлет outbox
+        await outbox.send(message.bot, hw_info.created_by, steps)
     
     await message.answer("Ваше решение отправлено преподавателю!")
-    await state.clear()
\ No newline at end of file
+    await state.clear()
+    
+    # Похожие тексты ищутся по LSH-корзинам задания, а не перебором всех сдач
+    try:
+        matches = await similarity_index.check(submission_id, hw_id, message.from_user.id, text)
+    except Exception as e:
+        logger.error(f"Similarity check failed: {e}", exc_info=True)
+        return
+    if matches and hw_info and hw_info.created_by:
+        lines = [f"• {match.student} (сдача #{match.submission_id}) — {match.similarity:.0%}" for match in matches[:10]]
+        await outbox.send(message.bot, hw_info.created_by, [('text',
+            f"⚠️ Похожие решения в ДЗ '{hw_info.title}'\n"
+            f"{message.from_user.full_name} (сдача #{submission_id}) совпадает с:\n"
+            + "\n".join(lines)
+            + f"\n\nОтчет по заданию: /similar {hw_id}"
+        )])
\ No newline at end of file
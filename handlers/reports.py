@@ -0,0 +1,166 @@
+from aiogram import Router
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message, FSInputFile, BufferedInputFile
+from config import Config
+from reporting import snapshot_store
+from charts import HAS_MATPLOTLIB, chart_renderer, collect_chart_data
+from lifecycle import load_state, save_state
+from questions import format_score
+import metrics
+import asyncio
+import csv
+import logging
+import os
+import tempfile
+
+router = Router()
+logger = logging.getLogger(__name__)
+
+CSV_HEADER = ["Студент", "Логин", "Баллы", "Всего вопросов", "Процент", "Сдано"]
+
+def get_tests_summary(conn):
+    """Возвращает тесты с числом результатов и средним процентом"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT t.test_id, t.title, COUNT(r.result_id),
+               AVG(100.0 * r.score / NULLIF(r.total_questions, 0))
+        FROM tests t
+        LEFT JOIN test_results r ON r.test_id = t.test_id
+        GROUP BY t.test_id
+        ORDER BY t.test_id DESC
+        LIMIT 30
+    """)
+    return cursor.fetchall()
+
+def get_test_results(conn, test_id: int):
+    cursor = conn.cursor()
+    cursor.execute("SELECT title FROM tests WHERE test_id = ?", (test_id,))
+    test = cursor.fetchone()
+    cursor.execute("""
+        SELECT COALESCE(u.full_name, r.user_id), u.username, r.score, r.total_questions,
+               strftime('%d.%m.%Y %H:%M', r.submitted_at, 'localtime')
+        FROM test_results r
+        LEFT JOIN users u ON u.user_id = r.user_id
+        WHERE r.test_id = ?
+        ORDER BY r.score DESC, r.submitted_at
+    """, (test_id,))
+    return test, cursor.fetchall()
+
+def get_chart_rows(conn, test_id: int):
+    cursor = conn.cursor()
+    cursor.execute("SELECT title, questions FROM tests WHERE test_id = ?", (test_id,))
+    test = cursor.fetchone()
+    cursor.execute("SELECT answers, score, total_questions FROM test_results WHERE test_id = ?", (test_id,))
+    return test, cursor.fetchall()
+
+def write_results_csv(path: str, rows):
+    # utf-8-sig и точка с запятой — чтобы файл сразу открывался в Excel
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(CSV_HEADER)
+        for student, username, score, total, submitted_at in rows:
+            percent = round(100 * score / total) if total else 0
+            writer.writerow([student, f"@{username}" if username else "", format_score(score), total, percent, submitted_at])
+
+@router.message(Command("results"))
+async def cmd_results(message: Message, command: CommandObject):
+    if message.from_user.id not in Config.ADMIN_IDS:
+        await message.answer("Извините, у вас нет прав преподавателя.")
+        return
+
+    # Отчеты строятся по копии БД и не мешают студентам сдавать тесты
+    conn = await snapshot_store.connect()
+    try:
+        if not command.args or not command.args.strip().isdigit():
+            tests = get_tests_summary(conn)
+            if not tests:
+                await message.answer("Тестов пока нет.")
+                return
+            lines = [
+                f"#{test_id} {title} — результатов: {count}"
+                + (f", средний: {average:.0f}%" if average is not None else "")
+                for test_id, title, count, average in tests
+            ]
+            await message.answer(
+                "📊 Результаты тестов:\n\n" + "\n".join(lines)
+                + f"\n\nДанные на {snapshot_store.format_age()}. Выгрузка: /results <номер теста>"
+            )
+            return
+
+        test_id = int(command.args)
+        test, rows = get_test_results(conn, test_id)
+    finally:
+        conn.close()
+
+    if not test:
+        await message.answer("Тест не найден.")
+        return
+    if not rows:
+        await message.answer(f"По тесту «{test[0]}» результатов пока нет (данные на {snapshot_store.format_age()}).")
+        return
+
+    fd, csv_path = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    try:
+        await asyncio.to_thread(write_results_csv, csv_path, rows)
+        average = sum(100 * r[2] / r[3] for r in rows if r[3]) / len(rows)
+        await message.answer_document(
+            FSInputFile(csv_path, filename=f"test_{test_id}_results.csv"),
+            caption=(
+                f"📊 {test[0]}\n"
+                f"Результатов: {len(rows)}, средний: {average:.0f}%\n"
+                f"Данные на {snapshot_store.format_age()}"
+            )
+        )
+    finally:
+        os.remove(csv_path)
+
+@router.message(Command("chart"))
+async def cmd_chart(message: Message, command: CommandObject):
+    if message.from_user.id not in Config.ADMIN_IDS:
+        await message.answer("Извините, у вас нет прав преподавателя.")
+        return
+    if not HAS_MATPLOTLIB:
+        await message.answer("Графики недоступны: на сервере не установлен matplotlib.")
+        return
+    if not command.args or not command.args.strip().isdigit():
+        await message.answer("Использование: /chart <номер теста>. Номера тестов: /results")
+        return
+
+    test_id = int(command.args)
+    conn = await snapshot_store.connect()
+    try:
+        test, rows = get_chart_rows(conn, test_id)
+    finally:
+        conn.close()
+
+    if not test:
+        await message.answer("Тест не найден.")
+        return
+    if not rows:
+        await message.answer(f"По тесту «{test[0]}» результатов пока нет (данные на {snapshot_store.format_age()}).")
+        return
+
+    average = sum(100 * score / total for _, score, total in rows if total) / len(rows)
+    caption = (
+        f"📈 {test[0]}\n"
+        f"Результатов: {len(rows)}, средний: {average:.0f}%\n"
+        f"Данные на {snapshot_store.format_age()}"
+    )
+
+    # Пока новых результатов нет, повторно отправляем уже загруженную картинку по file_id
+    cache_key = f"chart:{test_id}"
+    cached = load_state(cache_key)
+    if cached and cached['results'] == len(rows):
+        try:
+            await message.answer_photo(cached['file_id'], caption=caption)
+            metrics.inc('charts.cache_hit')
+            return
+        except TelegramBadRequest as e:
+            logger.warning(f"Cached chart of test {test_id} is no longer valid: {e}")
+
+    percents, per_question = await asyncio.to_thread(collect_chart_data, test[1], rows)
+    png = await chart_renderer.render(test[0], percents, per_question)
+    sent = await message.answer_photo(BufferedInputFile(png, filename=f"test_{test_id}.png"), caption=caption)
+    save_state(cache_key, {'results': len(rows), 'file_id': sent.photo[-1].file_id})
@@ -0,0 +1,326 @@
+from aiogram import Bot, Router, F
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message, CallbackQuery, FSInputFile
+from aiogram.exceptions import TelegramBadRequest
+from database import get_db_connection
+from config import Config
+from keyboards import (
+    GRADES,
+    get_review_homeworks_keyboard,
+    get_review_submissions_keyboard,
+    get_grade_keyboard
+)
+from outbox import send_attachments
+from file_storage import file_archive, write_zip
+from reporting import snapshot_store
+from similarity import similarity_index
+import asyncio
+import logging
+import os
+import re
+import tempfile
+
+router = Router()
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 10
+
+def get_homeworks_page(cursor, page: int):
+    """Возвращает страницу ДЗ со счетчиками сдач и признак следующей страницы"""
+    cursor.execute("""
+        SELECT h.hw_id, h.title,
+               COUNT(s.submission_id),
+               COALESCE(SUM(s.is_read = 0), 0),
+               COALESCE(SUM(s.grade IS NOT NULL), 0)
+        FROM homework h
+        LEFT JOIN homework_submissions s
+            ON s.hw_id = h.hw_id AND s.user_id != h.created_by
+        GROUP BY h.hw_id
+        ORDER BY h.hw_id DESC
+        LIMIT ? OFFSET ?
+    """, (PAGE_SIZE + 1, page * PAGE_SIZE))
+    rows = cursor.fetchall()
+    return rows[:PAGE_SIZE], len(rows) > PAGE_SIZE
+
+def get_submissions_page(cursor, hw_id: int, page: int):
+    """Возвращает страницу сдач по ДЗ и признак следующей страницы"""
+    cursor.execute("""
+        SELECT s.submission_id,
+               COALESCE(u.full_name, s.user_id),
+               strftime('%d.%m %H:%M', s.submitted_at, 'localtime'),
+               s.is_read, s.grade
+        FROM homework_submissions s
+        JOIN homework h ON h.hw_id = s.hw_id
+        LEFT JOIN users u ON u.user_id = s.user_id
+        WHERE s.hw_id = ? AND s.user_id != h.created_by
+        ORDER BY s.submission_id DESC
+        LIMIT ? OFFSET ?
+    """, (hw_id, PAGE_SIZE + 1, page * PAGE_SIZE))
+    rows = cursor.fetchall()
+    return rows[:PAGE_SIZE], len(rows) > PAGE_SIZE
+
+async def reject_non_teacher(callback: CallbackQuery) -> bool:
+    """Отказывает, если callback пришел не от преподавателя: callback_data можно подделать"""
+    if callback.from_user.id in Config.ADMIN_IDS:
+        return False
+    await callback.answer("Извините, у вас нет прав преподавателя.", show_alert=True)
+    return True
+
+async def show_page(callback: CallbackQuery, text: str, keyboard):
+    try:
+        await callback.message.edit_text(text, reply_markup=keyboard)
+    except TelegramBadRequest as e:
+        # Сообщение не изменилось или его нельзя редактировать
+        logger.debug(f"Cannot edit review message: {e}")
+
+@router.message(F.text == "📥 Проверка ДЗ")
+async def review_inbox(message: Message):
+    if message.from_user.id not in Config.ADMIN_IDS:
+        await message.answer("Извините, у вас нет прав преподавателя.")
+        return
+
+    conn = get_db_connection()
+    try:
+        homeworks, has_next = get_homeworks_page(conn.cursor(), 0)
+    finally:
+        conn.close()
+
+    if not homeworks:
+        await message.answer("Домашних заданий пока нет.")
+        return
+
+    await message.answer(
+        "📥 Сдачи домашних заданий:",
+        reply_markup=get_review_homeworks_keyboard(homeworks, 0, has_next)
+    )
+
+@router.callback_query(F.data.startswith("rvl_"))
+async def review_homeworks_page(callback: CallbackQuery):
+    if await reject_non_teacher(callback):
+        return
+    await callback.answer()
+    page = int(callback.data.split("_")[1])
+
+    conn = get_db_connection()
+    try:
+        homeworks, has_next = get_homeworks_page(conn.cursor(), page)
+    finally:
+        conn.close()
+
+    await show_page(
+        callback,
+        "📥 Сдачи домашних заданий:",
+        get_review_homeworks_keyboard(homeworks, page, has_next)
+    )
+
+@router.callback_query(F.data.startswith("rvh_"))
+async def review_submissions_page(callback: CallbackQuery):
+    if await reject_non_teacher(callback):
+        return
+    await callback.answer()
+    _, hw_id, page = callback.data.split("_")
+    hw_id, page = int(hw_id), int(page)
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT title FROM homework WHERE hw_id = ?", (hw_id,))
+        hw = cursor.fetchone()
+        submissions, has_next = get_submissions_page(cursor, hw_id, page)
+    finally:
+        conn.close()
+
+    if not hw:
+        await callback.message.answer("Домашнее задание не найдено.")
+        return
+
+    text = f"📝 {hw[0]}\n\n" + ("Сдачи:" if submissions else "Сдач пока нет.")
+    await show_page(callback, text, get_review_submissions_keyboard(hw_id, submissions, page, has_next))
+
+@router.callback_query(F.data.startswith("rvs_"))
+async def review_open_submission(callback: CallbackQuery):
+    if await reject_non_teacher(callback):
+        return
+    await callback.answer()
+    submission_id = int(callback.data.split("_")[1])
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT s.hw_id, s.message, s.chat_id, s.message_id, s.grade,
+                   COALESCE(u.full_name, s.user_id)
+            FROM homework_submissions s
+            LEFT JOIN users u ON u.user_id = s.user_id
+            WHERE s.submission_id = ?
+        """, (submission_id,))
+        submission = cursor.fetchone()
+        if not submission:
+            await callback.message.answer("Сдача не найдена.")
+            return
+
+        cursor.execute(
+            "SELECT file_id, file_type, message_id FROM homework_attachments WHERE submission_id = ? ORDER BY order_num",
+            (submission_id,)
+        )
+        attachments = cursor.fetchall()
+
+        cursor.execute("UPDATE homework_submissions SET is_read = 1 WHERE submission_id = ?", (submission_id,))
+        conn.commit()
+    finally:
+        conn.close()
+
+    hw_id, text, chat_id, message_id, grade, student = submission
+    chat = callback.message.chat.id
+
+    # Содержимое сдачи подгружается только при открытии: копируем исходные сообщения студента
+    message_ids = sorted({message_id, *(a[2] for a in attachments)} - {None})
+    copied = False
+    if chat_id and message_ids:
+        try:
+            await callback.bot.copy_messages(chat, chat_id, message_ids)
+            copied = True
+        except TelegramBadRequest as e:
+            logger.debug(f"Cannot copy submission {submission_id}: {e}")
+
+    # Старые сдачи без message_id или удаленные студентом сообщения отправляем по file_id
+    if not copied:
+        if text:
+            await callback.bot.send_message(chat, text)
+        if attachments:
+            await send_attachments(callback.bot, chat, [(a[0], a[1]) for a in attachments])
+
+    await callback.message.answer(
+        f"👤 {student}\n"
+        f"Оценка: {grade if grade is not None else 'не выставлена'}",
+        reply_markup=get_grade_keyboard(submission_id, hw_id)
+    )
+
+@router.callback_query(F.data.startswith("rvg_"))
+async def review_grade_submission(callback: CallbackQuery):
+    if await reject_non_teacher(callback):
+        return
+    try:
+        _, submission_id, grade = callback.data.split("_")
+        submission_id, grade = int(submission_id), int(grade)
+    except ValueError:
+        await callback.answer("Некорректная оценка.", show_alert=True)
+        return
+    if grade not in GRADES:
+        await callback.answer("Некорректная оценка.", show_alert=True)
+        return
+
+    conn = get_db_connection()
+    try:
+        conn.execute(
+            "UPDATE homework_submissions SET grade = ?, is_read = 1 WHERE submission_id = ?",
+            (grade, submission_id)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+    await callback.answer(f"Оценка {grade} выставлена")
+    await show_page(
+        callback,
+        callback.message.text.split("\n")[0] + f"\nОценка: {grade}",
+        callback.message.reply_markup
+    )
+
+async def send_submissions_zip(bot: Bot, chat_id: int, hw_id: int):
+    """Собирает все сдачи по ДЗ в ZIP на диске и отправляет его преподавателю"""
+    # Выгрузка читает копию БД, чтобы не держать блокировки, нужные сдаче работ
+    conn = await snapshot_store.connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT s.submission_id, COALESCE(u.full_name, s.user_id), s.message,
+                   COALESCE(a.file_id, s.file_id), COALESCE(a.order_num, 1)
+            FROM homework_submissions s
+            JOIN homework h ON h.hw_id = s.hw_id
+            LEFT JOIN users u ON u.user_id = s.user_id
+            LEFT JOIN homework_attachments a ON a.submission_id = s.submission_id
+            WHERE s.hw_id = ? AND s.user_id != h.created_by
+            ORDER BY s.submission_id, a.order_num
+        """, (hw_id,))
+        rows = cursor.fetchall()
+    finally:
+        conn.close()
+
+    if not rows:
+        await bot.send_message(chat_id, "Сдач по этому заданию пока нет.")
+        return
+
+    entries = []
+    missing = 0
+    seen_texts = set()
+    for submission_id, student, text, file_id, order_num in rows:
+        folder = f"{submission_id}_" + re.sub(r'[^\w.-]+', '_', str(student))
+        if text and submission_id not in seen_texts:
+            seen_texts.add(submission_id)
+            entries.append((f"{folder}/answer.txt", None, text))
+        if file_id:
+            try:
+                path = await file_archive.ensure(file_id)
+            except Exception as e:
+                logger.error(f"Cannot fetch file {file_id} for ZIP: {e}")
+                path = None
+            if path:
+                entries.append((f"{folder}/{order_num:02d}{os.path.splitext(path)[1]}", path, None))
+            else:
+                missing += 1
+
+    fd, zip_path = tempfile.mkstemp(suffix=".zip")
+    os.close(fd)
+    try:
+        await asyncio.to_thread(write_zip, zip_path, entries)
+        caption = f"Сдачи по ДЗ #{hw_id} (данные на {snapshot_store.format_age()})"
+        if missing:
+            caption += f"\n⚠️ Не удалось получить файлов: {missing}"
+        await bot.send_document(chat_id, FSInputFile(zip_path, filename=f"homework_{hw_id}.zip"), caption=caption)
+    finally:
+        os.remove(zip_path)
+
+@router.message(Command("hwzip"))
+async def cmd_homework_zip(message: Message, command: CommandObject):
+    if message.from_user.id not in Config.ADMIN_IDS:
+        await message.answer("Извините, у вас нет прав преподавателя.")
+        return
+    if not command.args or not command.args.strip().isdigit():
+        await message.answer("Использование: /hwzip <номер ДЗ>")
+        return
+    await send_submissions_zip(message.bot, message.chat.id, int(command.args))
+
+@router.callback_query(F.data.startswith("rvz_"))
+async def review_homework_zip(callback: CallbackQuery):
+    if await reject_non_teacher(callback):
+        return
+    await callback.answer("Собираю архив...")
+    await send_submissions_zip(callback.bot, callback.message.chat.id, int(callback.data.split("_")[1]))
+
+@router.message(Command("similar"))
+async def cmd_similar(message: Message, command: CommandObject):
+    if message.from_user.id not in Config.ADMIN_IDS:
+        await message.answer("Извините, у вас нет прав преподавателя.")
+        return
+    if not command.args or not command.args.strip().isdigit():
+        await message.answer("Использование: /similar <номер ДЗ>")
+        return
+
+    hw_id = int(command.args)
+    pairs = await similarity_index.report(hw_id)
+    if not pairs:
+        await message.answer(
+            f"По ДЗ #{hw_id} похожих текстовых решений не найдено "
+            f"(порог {similarity_index.threshold:.0%})."
+        )
+        return
+
+    lines = [
+        f"{a.similarity:.0%}: {a.student} (#{a.submission_id}) ↔ {b.student} (#{b.submission_id})"
+        for a, b in pairs[:40]
+    ]
+    text = f"🔍 Похожие решения по ДЗ #{hw_id} (порог {similarity_index.threshold:.0%}):\n\n" + "\n".join(lines)
+    if len(pairs) > 40:
+        text += f"\n\n…и еще пар: {len(pairs) - 40}"
+    await message.answer(text)
@@ -0,0 +1,96 @@
+from aiogram import Router, F
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message, CallbackQuery
+from aiogram.fsm.context import FSMContext
+from aiogram.exceptions import TelegramBadRequest
+from database import get_db_connection, SEARCH_KINDS
+from keyboards import get_search_keyboard
+import logging
+import re
+
+router = Router()
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 5
+
+KIND_ICONS = {
+    'lecture': '📚',
+    'lecture_content': '📚',
+    'homework': '📝',
+    'event': '📅',
+}
+
+def build_match_query(text: str) -> str | None:
+    """Превращает пользовательский запрос в безопасный FTS5-запрос с поиском по префиксам"""
+    tokens = re.findall(r"\w+", text)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+def search(match_query: str, page: int):
+    """Возвращает страницу результатов, отсортированных по релевантности, и признак следующей страницы"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT rowid % 4, ref_id, title,
+                   snippet(search_index, 1, '«', '»', '…', 12)
+            FROM search_index
+            WHERE search_index MATCH ?
+            ORDER BY bm25(search_index, 5.0, 1.0)
+            LIMIT ? OFFSET ?
+        """, (match_query, PAGE_SIZE + 1, page * PAGE_SIZE))
+        rows = cursor.fetchall()
+    finally:
+        conn.close()
+    return [(SEARCH_KINDS[code], ref_id, title, snippet) for code, ref_id, title, snippet in rows[:PAGE_SIZE]], \
+        len(rows) > PAGE_SIZE
+
+def render_results(query: str, results, page: int) -> str:
+    if not results:
+        return f"🔍 По запросу «{query}» ничего не найдено."
+    response = f"🔍 Результаты по запросу «{query}» (стр. {page + 1}):\n\n"
+    for i, (kind, _, title, snippet) in enumerate(results, page * PAGE_SIZE + 1):
+        response += f"{i}. {KIND_ICONS[kind]} {title}\n"
+        if snippet:
+            response += f"{snippet}\n"
+        response += "\n"
+    return response
+
+@router.message(Command("search"))
+async def cmd_search(message: Message, command: CommandObject, state: FSMContext):
+    query = (command.args or "").strip()
+    match_query = build_match_query(query)
+    if not match_query:
+        await message.answer("Использование: /search <запрос>\nПример: /search интегралы")
+        return
+
+    try:
+        results, has_next = search(match_query, 0)
+    except Exception as e:
+        logger.error(f"Search failed for {query!r}: {e}", exc_info=True)
+        await message.answer("Ошибка поиска")
+        return
+
+    await state.update_data(search_query=query)
+    await message.answer(
+        render_results(query, results, 0),
+        reply_markup=get_search_keyboard(results, 0, has_next)
+    )
+
+@router.callback_query(F.data.startswith("srch_"))
+async def search_page(callback: CallbackQuery, state: FSMContext):
+    await callback.answer()
+    page = int(callback.data.split("_")[1])
+    query = (await state.get_data()).get("search_query")
+    if not query:
+        return
+
+    results, has_next = search(build_match_query(query), page)
+    try:
+        await callback.message.edit_text(
+            render_results(query, results, page),
+            reply_markup=get_search_keyboard(results, page, has_next)
+        )
+    except TelegramBadRequest as e:
+        logger.debug(f"Cannot edit search results: {e}")
@@ -0,0 +1,78 @@
+from aiogram import Router
+from backups import backup_manager
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message, BufferedInputFile
+from config import Config
+from sql_profiler import profiler
+import asyncio
+import json
+import logging
+import os
+import time
+import metrics
+
+router = Router()
+logger = logging.getLogger(__name__)
+
+DBSTATS_TOP = 10
+# Запас под заголовок в пределах лимита Telegram на длину сообщения
+DBSTATS_TEXT_LIMIT = 3900
+
+@router.message(Command("metrics"))
+async def cmd_metrics(message: Message):
+    if message.from_user.id not in Config.ADMIN_IDS:
+        return
+    await message.answer(f"📈 Метрики бота:\n\n{metrics.format_snapshot()}")
+
+@router.message(Command("backup"))
+async def cmd_backup(message: Message):
+    if message.from_user.id not in Config.ADMIN_IDS:
+        return
+    await message.answer("⏳ Снимаю бэкап...")
+    try:
+        path = await asyncio.to_thread(backup_manager.run_once)
+    except Exception as e:
+        logger.error(f"Backup failed: {e}", exc_info=True)
+        await message.answer("❌ Не удалось снять бэкап")
+        return
+    await message.answer(f"✅ Бэкап сохранен: {os.path.basename(path)} ({os.path.getsize(path) // 1024} КБ)")
+
+def format_dbstats(snapshot: dict) -> str:
+    minutes = (time.time() - snapshot['since']) / 60
+    lines = [f"🗄 SQL за {minutes:.0f} мин. (медленные — от {snapshot['slow_threshold_ms']:g} мс):"]
+    for stats in snapshot['statements']:
+        sql = stats['sql'] if len(stats['sql']) <= 160 else stats['sql'][:157] + "..."
+        lines.append(
+            f"\n{sql}\n"
+            f"× {stats['count']}, всего {stats['total_ms']:.0f} мс, "
+            f"p95 {stats['p95_ms']:.1f} мс, max {stats['max_ms']:.1f} мс, медленных {stats['slow']}"
+        )
+        if stats['plan']:
+            lines.append("план: " + "; ".join(stats['plan']))
+    text = "\n".join(lines)
+    return text if len(text) <= DBSTATS_TEXT_LIMIT else text[:DBSTATS_TEXT_LIMIT] + "\n…"
+
+@router.message(Command("dbstats"))
+async def cmd_dbstats(message: Message, command: CommandObject):
+    """Статистика SQL-запросов: /dbstats, /dbstats json, /dbstats reset"""
+    if message.from_user.id not in Config.ADMIN_IDS:
+        return
+    if not Config.SQL_PROFILE:
+        await message.answer("Профилирование SQL выключено (SQL_PROFILE=0).")
+        return
+
+    arg = (command.args or "").strip().lower()
+    if arg == "reset":
+        profiler.reset()
+        await message.answer("Статистика SQL сброшена.")
+        return
+    if arg == "json":
+        data = json.dumps(profiler.snapshot(), ensure_ascii=False, indent=2).encode("utf-8")
+        await message.answer_document(BufferedInputFile(data, filename=f"dbstats_{int(time.time())}.json"))
+        return
+
+    snapshot = profiler.snapshot(DBSTATS_TOP)
+    if not snapshot['statements']:
+        await message.answer("Запросов пока не было.")
+        return
+    await message.answer(format_dbstats(snapshot))
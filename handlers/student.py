@@ -2,47 +2,39 @@ from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from database import get_db_connection
+from aiogram.exceptions import TelegramBadRequest
 from keyboards import get_tests_keyboard, get_homeworks_keyboard, get_lectures_keyboard, get_main_keyboard
+from calendar_view import render_month, parse_month
+from ical_feed import calendar_feed
+from archive import attach_archive
+import repository
+from questions import format_score
+from aiogram.filters import Command
+from config import Config
 import datetime
 import logging
 
 router = Router()
 logger = logging.getLogger(__name__)
 
+def format_db_time(value: str) -> str:
+    return datetime.datetime.strptime(value[:16], "%Y-%m-%d %H:%M").strftime("%d.%m.%Y %H:%M")
+
 @router.message(F.text == "📝 Тесты")
 async def show_available_tests(message: Message):
-    conn = None
     try:
         now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        conn = get_db_connection()
-        cursor = conn.cursor()
         logger.debug(f"Поиск доступных тестов на {now}")
-        query = """
-        SELECT test_id, title, description, questions, start_time, end_time 
-        FROM tests 
-        WHERE datetime(start_time) <= datetime(?)
-        AND datetime(end_time) >= datetime(?)
-        """
-        
-        cursor.execute(query, (now, now))
-        tests = cursor.fetchall()
-        
+        tests = repository.tests.available(now)
         
         if not tests:
-            # Для диагностики: выводим все тесты из БД
-            cursor.execute("""
-                SELECT test_id, title, 
-                       strftime('%d.%m.%Y %H:%M', start_time) as start_time,
-                       strftime('%d.%m.%Y %H:%M', end_time) as end_time 
-                FROM tests
-                ORDER BY start_time
-            """)
-            all_tests = cursor.fetchall()
+            # Вместо всех тестов за все время показываем только ближайшие
+            upcoming = repository.tests.upcoming(now)
             
-            if all_tests:
-                response = "Все тесты в системе:\n\n"
-                for test in all_tests:
-                    response += f"{test[0]}. {test[1]} ({test[2]} - {test[3]})\n"
+            if upcoming:
+                response = "Ближайшие тесты:\n\n"
+                for test in upcoming:
+                    response += f"• {test.title} ({format_db_time(test.start_time)} - {format_db_time(test.end_time)})\n"
                 await message.answer(response)
             
             await message.answer("Сейчас нет доступных тестов. Попробуйте позже.")
@@ -57,19 +49,11 @@ async def show_available_tests(message: Message):
     except Exception as e:
         logger.error(f"Ошибка при показе тестов: {e}", exc_info=True)
         await message.answer("Произошла ошибка при загрузке тестов.")
-    finally:
-        if conn:
-            conn.close()
 
 @router.message(F.text == "📝 Домашние задания")
 async def show_homeworks(message: Message):
-    conn = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT hw_id, title, description FROM homework")
-        homeworks = cursor.fetchall()
+        homeworks = repository.homework.list()
         
         if not homeworks:
             await message.answer("Нет активных домашних заданий.")
@@ -81,19 +65,11 @@ async def show_homeworks(message: Message):
     except Exception as e:
         logger.error(f"Ошибка при показе ДЗ: {e}")
         await message.answer("Ошибка загрузки домашних заданий")
-    finally:
-        if conn:
-            conn.close()
 
 @router.message(F.text == "📚 Лекционные материалы")
 async def show_lectures(message: Message):
-    conn = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT material_id, title, description FROM lecture_materials")
-        lectures = cursor.fetchall()
+        lectures = repository.lectures.list()
         
         if not lectures:
             await message.answer("Нет доступных лекционных материалов.")
@@ -105,32 +81,94 @@ async def show_lectures(message: Message):
     except Exception as e:
         logger.error(f"Ошибка при показе лекций: {e}")
         await message.answer("Ошибка загрузки материалов")
-    finally:
-        if conn:
-            conn.close()
 @router.message(F.text == "📅 Календарь")
 async def show_calendar(message: Message):
     today = datetime.date.today()
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute(
-        "SELECT title, description, event_date FROM calendar_events WHERE event_date >= ? ORDER BY event_date",
-        (today,)
+    text, keyboard, _ = render_month(today.year, today.month)
+    await message.answer(text, reply_markup=keyboard)
+
+@router.callback_query(F.data.startswith("cal_"))
+async def switch_calendar_month(callback: CallbackQuery):
+    _, year, month = callback.data.split("_")
+    parsed = parse_month(year, month)
+    if parsed is None:
+        await callback.answer("Этот месяц недоступен.", show_alert=True)
+        return
+    await callback.answer()
+    text, keyboard, _ = render_month(*parsed)
+    try:
+        await callback.message.edit_text(text, reply_markup=keyboard)
+    except TelegramBadRequest as e:
+        logger.debug(f"Cannot edit calendar: {e}")
+
+@router.callback_query(F.data.startswith("cald_"))
+async def show_calendar_day(callback: CallbackQuery):
+    _, year, month, day = callback.data.split("_")
+    parsed = parse_month(year, month)
+    if parsed is None or not day.isdigit():
+        await callback.answer("Этот месяц недоступен.", show_alert=True)
+        return
+    _, _, events_by_day = render_month(*parsed)
+    lines = []
+    for event in events_by_day.get(int(day), []):
+        lines.append(f"📌 {event.title}" + (f"\n{event.description}" if event.description else ""))
+    # Всплывающее окно Telegram вмещает не больше 200 символов
+    text = "\n".join(lines) or "Событий нет."
+    await callback.answer(text[:197] + "…" if len(text) > 200 else text, show_alert=True)
+
+@router.callback_query(F.data == "caln")
+async def calendar_noop(callback: CallbackQuery):
+    await callback.answer()
+
+@router.message(Command("ics"))
+async def cmd_calendar_feed(message: Message):
+    if not Config.ICS_BASE_URL:
+        await message.answer("Подписка на календарь сейчас недоступна.")
+        return
+    token = calendar_feed.get_token(message.from_user.id)
+    await message.answer(
+        "📅 Ссылка для подписки на календарь (события и тесты):\n"
+        f"{Config.ICS_BASE_URL}/calendar/{token}.ics\n\n"
+        "Добавьте ее в приложение календаря как подписку по URL. Не передавайте ссылку другим."
     )
-    events = cursor.fetchall()
-    conn.close()
-    
-    if not events:
-        await message.answer("На ближайшее время событий нет.")
+
+@router.message(Command("history"))
+async def show_history(message: Message):
+    """Результаты тестов пользователя, включая перенесенные в архив"""
+    conn = get_db_connection()
+    try:
+        query = """
+            SELECT t.title, r.score, r.total_questions, r.submitted_at
+            FROM main.test_results r JOIN main.tests t ON t.test_id = r.test_id
+            WHERE r.user_id = ?
+        """
+        params = [message.from_user.id]
+        # Архив подключается только здесь: обычные запросы работают с небольшой основной БД
+        if attach_archive(conn):
+            query += """
+            UNION ALL
+            SELECT t.title, r.score, r.total_questions, r.submitted_at
+            FROM archive.test_results r JOIN archive.tests t ON t.test_id = r.test_id
+            WHERE r.user_id = ?
+            """
+            params.append(message.from_user.id)
+        cursor = conn.cursor()
+        # Сортируем по исходной отметке времени, а дату форматируем уже после отбора
+        cursor.execute(f"""
+            SELECT title, score, total_questions, strftime('%d.%m.%Y', submitted_at, 'localtime')
+            FROM ({query}) ORDER BY submitted_at DESC LIMIT 50
+        """, params)
+        results = cursor.fetchall()
+    except Exception as e:
+        logger.error(f"Ошибка при загрузке истории: {e}", exc_info=True)
+        await message.answer("Произошла ошибка при загрузке истории.")
         return
-    
-    response = "📅 Предстоящие события:\n\n"
-    for event in events:
-        response += f"📌 {event[0]}\n"
-        response += f"📅 {event[2]}\n"
-        if event[1]:
-            response += f"📝 {event[1]}\n"
-        response += "\n"
-    
-    await message.answer(response)
\ No newline at end of file
+    finally:
+        conn.close()
+
+    if not results:
+        await message.answer("Вы еще не проходили тестов.")
+        return
+
+    lines = [f"{date} — {title}: {format_score(score)}/{total}" for title, score, total, date in results]
+    await message.answer("📜 История результатов:\n\n" + "\n".join(lines))
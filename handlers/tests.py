@@ -1,72 +1,52 @@
-from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery
+from aiogram import Bot, Router, F
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message, CallbackQuery, User
 from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
 from states import TestStates
-from database import get_db_connection
+import repository
+from deadlines import test_deadlines
+from outbox import outbox
+from keyboards import get_answer_keyboard
+from questions import (
+    CHOICE_TYPES, MULTI, NUMERIC, TEXT, calculate_score, compiled_test, format_score,
+    normalize_answers, question_type, validate_questions
+)
 import json
 import datetime
 import logging
-from typing import Dict, List
+from typing import List
 
 router = Router()
 logger = logging.getLogger(__name__)
 
-def validate_questions(questions: List[dict]):
-    """Проверяет корректность структуры вопросов"""
-    if not isinstance(questions, list):
-        raise ValueError("Questions should be a list")
-    
-    for i, q in enumerate(questions):
-        if not isinstance(q, dict):
-            raise ValueError(f"Question {i} should be a dictionary")
-        if not all(k in q for k in ['text', 'options', 'correct']):
-            raise ValueError(f"Question {i} missing required fields")
-        if not isinstance(q['options'], list) or len(q['options']) < 2:
-            raise ValueError(f"Question {i} has invalid options")
-        if not isinstance(q['correct'], int) or q['correct'] < 0 or q['correct'] >= len(q['options']):
-            raise ValueError(f"Question {i} has invalid correct index")
-
-def validate_answer(answer_text: str, options: List[str]) -> int | None:
-    """Проверяет и преобразует ответ пользователя"""
-    try:
-        answer = int(answer_text.strip())
-        if 1 <= answer <= len(options):
-            return answer - 1  # Конвертируем в 0-based индекс
-    except ValueError:
-        return None
-
 def format_options(options: List[str]) -> str:
     """Форматирует варианты ответов для отображения"""
     return "\n".join(f"{i+1}. {opt}" for i, opt in enumerate(options))
 
-def calculate_score(questions: List[dict], answers: Dict[int, int]) -> int:
-    """Подсчитывает количество правильных ответов"""
-    return sum(
-        1 for i, q in enumerate(questions) 
-        if answers.get(i) == q['correct']
-    )
+def format_time_left(deadline: float) -> str:
+    """Форматирует оставшееся до дедлайна время"""
+    minutes, seconds = divmod(max(0, int(deadline - datetime.datetime.now().timestamp())), 60)
+    return f"{minutes}:{seconds:02d}"
 
-async def notify_teacher(message: Message, cursor, test_id: int, score: int, total: int):
+async def notify_teacher(bot: Bot, user: User, test_id: int, score: float, total: int):
     """Отправляет уведомление преподавателю"""
     try:
-        cursor.execute("""
-            SELECT title, created_by FROM tests WHERE test_id = ?
-        """, (test_id,))
-        test_info = cursor.fetchone()
-        
-        if test_info and test_info[1]:
-            teacher_id = test_info[1]
-            test_title = test_info[0]
-            student_name = message.from_user.full_name
+        test_info = repository.tests.get_owner(test_id)
+        
+        if test_info and test_info.created_by:
+            teacher_id = test_info.created_by
+            test_title = test_info.title
+            student_name = user.full_name
             percentage = score / total
             
-            await message.bot.send_message(
-                teacher_id,
+            # Что не ушло сразу, дошлет outbox
+            await outbox.send(bot, teacher_id, [('text',
                 f"📌 Новый результат теста:\n"
                 f"📝 Название: {test_title}\n"
                 f"👤 Студент: {student_name}\n"
-                f"📊 Результат: {score}/{total} ({percentage:.0%})"
-            )
+                f"📊 Результат: {format_score(score)}/{total} ({percentage:.0%})"
+            )])
     except Exception as e:
         logger.error(f"Failed to notify teacher: {e}", exc_info=True)
 
@@ -81,92 +61,129 @@ def get_result_feedback(percentage: float) -> str:
     else:
         return "Неудовлетворительно. Рекомендуем повторить материал. 🧠"
 
-@router.callback_query(F.data.startswith("test_"))
+@router.callback_query(F.data.startswith("test_"), flags={"user_lock": True})
 async def start_test(callback: CallbackQuery, state: FSMContext):
-    conn = None
     try:
         test_id = int(callback.data.split("_")[1])
         user_id = callback.from_user.id
         
         logger.info(f"User {user_id} starts test {test_id}")
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT title, questions, start_time, end_time 
-            FROM tests 
-            WHERE test_id = ?
-            AND datetime(start_time) <= datetime('now', 'localtime')
-            AND datetime(end_time) >= datetime('now', 'localtime')
-        """, (test_id,))
-        test = cursor.fetchone()
+        if await state.get_state() == TestStates.taking_test.state:
+            await callback.answer("Тест уже начат.")
+            return
+            
+        test = repository.tests.get_open(test_id)
         
         if not test:
             await callback.message.answer("❌ Тест недоступен. Проверьте сроки проведения.")
             return
             
-        cursor.execute("""
-            SELECT 1 FROM test_results 
-            WHERE test_id = ? AND user_id = ? 
-            LIMIT 1
-        """, (test_id, user_id))
-        if cursor.fetchone():
+        if repository.results.exists(test_id, user_id):
             await callback.message.answer("⚠️ Вы уже проходили этот тест.")
             return
             
         try:
-            questions = json.loads(test[1])
+            questions = json.loads(test.questions)
             validate_questions(questions)
+            # Проверяющие объекты собираются один раз на тест и переиспользуются всеми студентами
+            compiled_test(test_id, questions)
         except Exception as e:
             logger.error(f"Invalid test format: {e}")
             await callback.message.answer("❌ Ошибка в формате теста. Сообщите преподавателю.")
             return
             
+        now = datetime.datetime.now()
+        deadline = None
+        if test.time_limit:
+            end_time = datetime.datetime.strptime(test.end_time, "%Y-%m-%d %H:%M:%S")
+            deadline = min(now + datetime.timedelta(minutes=test.time_limit), end_time).timestamp()
+            
         await state.set_state(TestStates.taking_test)
         await state.set_data({
             'test_id': test_id,
             'questions': questions,
             'current_question': 0,
             'answers': {},
-            'start_time': datetime.datetime.now().isoformat()
+            'start_time': now.isoformat(),
+            'deadline': deadline,
+            'student': callback.from_user.model_dump(exclude_none=True)
         })
+        if deadline:
+            test_deadlines.add(state.key, deadline, test_id)
+            await callback.answer(f"⏱ На прохождение теста отводится {test.time_limit} мин.")
+        else:
+            await callback.answer()
         
-        await callback.answer()
-        await send_question(callback.message, state)
+        # Вопросы показываются в сообщении со списком тестов, оно редактируется на месте
+        await send_question(callback.message, state, callback.from_user, edit=True)
         
     except Exception as e:
         logger.error(f"Error in start_test: {e}", exc_info=True)
         await callback.message.answer("❌ Ошибка при запуске теста")
-    finally:
-        if conn:
-            conn.close()
 
-async def send_question(message: Message, state: FSMContext):
+QUESTION_PROMPTS = {
+    MULTI: "➡️ Отметьте все верные варианты и нажмите «Готово» или введите номера через запятую:",
+    NUMERIC: "➡️ Введите ответ числом:",
+    TEXT: "➡️ Введите ответ текстом:",
+}
+
+def render_question(data: dict) -> str:
+    """Формирует текст текущего вопроса"""
+    current = data['current_question']
+    questions = data['questions']
+    question = questions[current]
+    kind = question_type(question)
+    time_left = f"⏱ Осталось: {format_time_left(data['deadline'])}\n" if data.get('deadline') else ""
+    options = f"Варианты:\n{format_options(question['options'])}\n\n" if kind in CHOICE_TYPES else ""
+    
+    return (
+        f"❓ Вопрос {current+1}/{len(questions)}:\n"
+        f"{time_left}\n"
+        f"{question['text']}\n\n"
+        f"{options}"
+        + QUESTION_PROMPTS.get(kind, "➡️ Выберите ответ кнопкой или введите его номер:")
+    )
+
+def question_keyboard(data: dict):
+    """Кнопки вариантов для вопросов с выбором; на остальные вопросы отвечают текстом"""
+    current = data['current_question']
+    question = data['questions'][current]
+    kind = question_type(question)
+    if kind not in CHOICE_TYPES:
+        return None
+    return get_answer_keyboard(current, question['options'], multi=kind == MULTI, selected=data.get('selected', []))
+
+async def send_question(message: Message, state: FSMContext, user: User, edit: bool = False):
+    """Показывает текущий вопрос; при edit=True редактирует сообщение бота вместо отправки нового"""
     try:
         data = await state.get_data()
         current = data['current_question']
         questions = data['questions']
         
         if current >= len(questions):
-            await submit_test(message, state)
+            if edit:
+                await message.edit_text("✅ Все ответы приняты.")
+            await submit_test(message.bot, message.chat.id, user, state)
             return
             
-        question = questions[current]
-        options = format_options(question['options'])
+        text = render_question(data)
+        keyboard = question_keyboard(data)
         
-        await message.answer(
-            f"❓ Вопрос {current+1}/{len(questions)}:\n\n"
-            f"{question['text']}\n\n"
-            f"Варианты:\n{options}\n\n"
-            "➡️ Введите номер правильного ответа:"
-        )
+        if edit:
+            try:
+                await message.edit_text(text, reply_markup=keyboard)
+                return
+            except TelegramBadRequest as e:
+                logger.debug(f"Cannot edit question message: {e}")
+                
+        await message.answer(text, reply_markup=keyboard)
     except Exception as e:
         logger.error(f"Error in send_question: {e}")
         await message.answer("❌ Ошибка при загрузке вопроса")
         await state.clear()
 
-@router.message(TestStates.taking_test, F.text)
+@router.message(TestStates.taking_test, F.text, flags={"user_lock": True})
 async def process_test_answer(message: Message, state: FSMContext):
     try:
         data = await state.get_data()
@@ -174,65 +191,140 @@ async def process_test_answer(message: Message, state: FSMContext):
         questions = data['questions']
         answers = data['answers']
         
-        answer = validate_answer(message.text, questions[current]['options'])
+        deadline = data.get('deadline')
+        if deadline and datetime.datetime.now().timestamp() >= deadline:
+            await message.answer("⏰ Время на прохождение теста истекло.")
+            await submit_test(message.bot, message.chat.id, message.from_user, state)
+            return
+        
+        matcher = compiled_test(data['test_id'], questions)[current]
+        answer = matcher.parse(message.text)
         if answer is None:
-            await message.answer("⚠️ Введите номер варианта (1, 2, 3...). Попробуйте снова:")
+            await message.answer(matcher.hint)
             return
             
         answers[current] = answer
         
         await state.update_data({
             'current_question': current + 1,
-            'answers': answers
+            'answers': answers,
+            'selected': []
         })
         
-        await send_question(message, state)
+        await send_question(message, state, message.from_user)
         
     except Exception as e:
         logger.error(f"Error in process_answer: {e}")
         await message.answer("❌ Ошибка обработки ответа")
         await state.clear()
 
-async def submit_test(message: Message, state: FSMContext):
-    conn = None
+@router.callback_query(TestStates.taking_test, F.data.startswith("ans_"), flags={"user_lock": True})
+async def process_test_callback(callback: CallbackQuery, state: FSMContext):
+    # Отвечаем сразу, чтобы у студента не висел индикатор загрузки
+    await callback.answer()
     try:
+        _, question_index, option_index = callback.data.split("_")
+        data = await state.get_data()
+        current = data['current_question']
+        questions = data['questions']
+        answers = data['answers']
+        
+        # Нажатие на кнопку уже отвеченного вопроса
+        if int(question_index) != current:
+            return
+            
+        deadline = data.get('deadline')
+        if deadline and datetime.datetime.now().timestamp() >= deadline:
+            await callback.message.edit_text("⏰ Время на прохождение теста истекло.")
+            await submit_test(callback.bot, callback.message.chat.id, callback.from_user, state)
+            return
+            
+        question = questions[current]
+        if question_type(question) == MULTI:
+            selected = data.get('selected', [])
+            if option_index != "done":
+                # Нажатие на вариант только переключает отметку, вопрос остается на экране
+                index = int(option_index)
+                if not 0 <= index < len(question['options']):
+                    return
+                selected = sorted(set(selected) ^ {index})
+                await state.update_data(selected=selected)
+                await send_question(callback.message, state, callback.from_user, edit=True)
+                return
+            # «Готово» без отметок ничего не делает
+            if not selected:
+                return
+            answer = selected
+        else:
+            answer = int(option_index)
+            if not 0 <= answer < len(question['options']):
+                return
+            
+        answers[current] = answer
+        
+        await state.update_data({
+            'current_question': current + 1,
+            'answers': answers,
+            'selected': []
+        })
+        
+        await send_question(callback.message, state, callback.from_user, edit=True)
+        
+    except Exception as e:
+        logger.error(f"Error in process_test_callback: {e}", exc_info=True)
+        await callback.message.answer("❌ Ошибка обработки ответа")
+        await state.clear()
+
+@router.callback_query(F.data.startswith("ans_"))
+async def stale_answer_callback(callback: CallbackQuery):
+    await callback.answer("Тест уже завершен.")
+
+async def submit_test(bot: Bot, chat_id: int, user: User, state: FSMContext, data: dict | None = None):
+    """Подсчитывает и сохраняет попытку; data передается, если вызывающий уже снял ее с состояния"""
+    if data is None:
         data = await state.get_data()
+        # Сбрасываем состояние сразу, чтобы попытку нельзя было отправить дважды
+        await state.clear()
+    test_deadlines.cancel(state.key)
+    if 'test_id' not in data:
+        # Попытку уже отправил другой путь: последний ответ студента или таймер
+        return
+    try:
         test_id = data['test_id']
         questions = data['questions']
         answers = data.get('answers', {})
-        user_id = message.from_user.id
+        user_id = user.id
         
-        score = calculate_score(questions, answers)
+        score = calculate_score(compiled_test(test_id, questions), normalize_answers(answers))
         percentage = score / len(questions)
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO test_results 
-            (test_id, user_id, answers, score, total_questions) 
-            VALUES (?, ?, ?, ?, ?)
-        """, (
-            test_id, 
-            user_id, 
-            json.dumps(answers), 
-            score, 
-            len(questions)
-        ))
-        
-        await notify_teacher(message, cursor, test_id, score, len(questions))
-        conn.commit()
-        
-        await message.answer(
+        # Результат сохраняется до уведомления: сбой отправки не должен его потерять
+        repository.results.add(test_id, user_id, json.dumps(answers), score, len(questions))
+        await notify_teacher(bot, user, test_id, score, len(questions))
+        
+        await bot.send_message(
+            chat_id,
             f"📊 Тест завершен!\n"
-            f"✅ Правильных ответов: {score} из {len(questions)}\n"
+            f"✅ Баллов: {format_score(score)} из {len(questions)}\n"
             f"📈 Результат: {percentage:.0%}\n\n"
             f"{get_result_feedback(percentage)}"
         )
     except Exception as e:
         logger.error(f"Error in submit_test: {e}", exc_info=True)
-        await message.answer("❌ Ошибка при сохранении результатов")
-    finally:
-        if conn:
-            conn.close()
-        await state.clear()
\ No newline at end of file
+        await bot.send_message(chat_id, "❌ Ошибка при сохранении результатов")
+
+async def expire_test_attempt(bot: Bot, storage: BaseStorage, key: StorageKey, test_id: int):
+    """Автоматически отправляет попытку, у которой истекло время"""
+    state = FSMContext(storage=storage, key=key)
+    if await state.get_state() != TestStates.taking_test.state:
+        return
+    data = await state.get_data()
+    if data.get('test_id') != test_id:
+        return
+    # Таймер идет мимо блокировки пользователя: забираем попытку до первого сетевого вызова,
+    # чтобы одновременный последний ответ студента не отправил ее второй раз
+    await state.clear()
+        
+    logger.info(f"Test {test_id} time is up for user {key.user_id}")
+    await bot.send_message(key.chat_id, "⏰ Время на прохождение теста истекло. Ответы отправлены автоматически.")
+    await submit_test(bot, key.chat_id, User(**data['student']), state, data)
\ No newline at end of file
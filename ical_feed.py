@@ -0,0 +1,209 @@
+import asyncio
+import datetime
+import hashlib
+import logging
+import secrets
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional, Set
+
+from aiohttp import web
+
+from database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+PRODID = "-//pkgn_study_bot//Calendar//RU"
+
+
+def escape_text(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def fold_line(line: str) -> str:
+    """Переносит строки длиннее 75 октетов, как требует RFC 5545"""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line
+    parts = []
+    while encoded:
+        limit = 75 if not parts else 74
+        chunk = encoded[:limit]
+        # Не разрываем многобайтовый символ UTF-8
+        while chunk and (encoded[len(chunk):len(chunk) + 1] or b"\x00")[0] & 0xC0 == 0x80:
+            chunk = chunk[:-1]
+        parts.append(chunk.decode("utf-8"))
+        encoded = encoded[len(chunk):]
+    return "\r\n ".join(parts)
+
+
+def format_local(value: str) -> str:
+    """Переводит время из БД (локальное) в формат iCalendar без часового пояса"""
+    return datetime.datetime.strptime(value[:19], "%Y-%m-%d %H:%M:%S").strftime("%Y%m%dT%H%M%S")
+
+
+def render_calendar(stamp: datetime.datetime) -> bytes:
+    """Формирует ленту .ics из событий календаря и окон проведения тестов"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT event_id, title, description, event_date FROM calendar_events ORDER BY event_date")
+        events = cursor.fetchall()
+        cursor.execute("""
+            SELECT test_id, title, description, start_time, end_time FROM tests
+            WHERE start_time IS NOT NULL AND end_time IS NOT NULL
+            ORDER BY start_time
+        """)
+        tests = cursor.fetchall()
+    finally:
+        conn.close()
+
+    dtstamp = stamp.strftime("%Y%m%dT%H%M%SZ")
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        "X-WR-CALNAME:Учебный календарь",
+        "X-WR-TIMEZONE:Asia/Novosibirsk",
+    ]
+    for event_id, title, description, event_date in events:
+        day = datetime.date.fromisoformat(str(event_date)[:10])
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:event-{event_id}@pkgn_study_bot",
+            f"DTSTAMP:{dtstamp}",
+            f"DTSTART;VALUE=DATE:{day.strftime('%Y%m%d')}",
+            f"DTEND;VALUE=DATE:{(day + datetime.timedelta(days=1)).strftime('%Y%m%d')}",
+            f"SUMMARY:{escape_text(title)}",
+        ]
+        if description:
+            lines.append(f"DESCRIPTION:{escape_text(description)}")
+        lines.append("END:VEVENT")
+    for test_id, title, description, start_time, end_time in tests:
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:test-{test_id}@pkgn_study_bot",
+            f"DTSTAMP:{dtstamp}",
+            f"DTSTART:{format_local(start_time)}",
+            f"DTEND:{format_local(end_time)}",
+            f"SUMMARY:{escape_text('📝 Тест: ' + title)}",
+        ]
+        if description:
+            lines.append(f"DESCRIPTION:{escape_text(description)}")
+        lines.append("END:VEVENT")
+    lines.append("END:VCALENDAR")
+    return ("\r\n".join(fold_line(line) for line in lines) + "\r\n").encode("utf-8")
+
+
+class CalendarFeed:
+    """Заранее собранная лента .ics с условными GET-запросами по ETag и Last-Modified"""
+
+    def __init__(self):
+        self._tokens: Set[str] = set()
+        self._body: Optional[bytes] = None
+        self._etag = ""
+        self._last_modified = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+        self._rebuild_task: Optional[asyncio.Task] = None
+        self._runner: Optional[web.AppRunner] = None
+
+    def load_tokens(self):
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT token FROM calendar_tokens")
+            self._tokens = {row[0] for row in cursor.fetchall()}
+        finally:
+            conn.close()
+
+    def get_token(self, user_id: int) -> str:
+        """Возвращает персональный токен ленты пользователя, создавая его при необходимости"""
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT token FROM calendar_tokens WHERE user_id = ?", (user_id,))
+            row = cursor.fetchone()
+            if row:
+                return row[0]
+            token = secrets.token_urlsafe(16)
+            cursor.execute("INSERT INTO calendar_tokens (user_id, token) VALUES (?, ?)", (user_id, token))
+            conn.commit()
+        finally:
+            conn.close()
+        self._tokens.add(token)
+        return token
+
+    def invalidate(self):
+        """Помечает ленту устаревшей и пересобирает ее в фоне"""
+        self._body = None
+        self._last_modified = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+        if self._runner is None:
+            # Лента не раздается: соберем ее при первом запросе
+            return
+        try:
+            self._rebuild_task = asyncio.get_running_loop().create_task(self._rebuild())
+        except RuntimeError:
+            # Нет запущенного цикла событий: лента соберется при первом запросе
+            pass
+
+    async def _rebuild(self) -> bytes:
+        while True:
+            stamp = self._last_modified
+            body = await asyncio.to_thread(render_calendar, stamp)
+            # Пока шла сборка, данные могли снова измениться
+            if stamp == self._last_modified:
+                self._body = body
+                self._etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+                return body
+
+    def _is_not_modified(self, request: web.Request) -> bool:
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match is not None:
+            return self._etag in {tag.strip() for tag in if_none_match.split(",")} or if_none_match.strip() == "*"
+        if_modified_since = request.headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                return parsedate_to_datetime(if_modified_since) >= self._last_modified
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if request.match_info["token"] not in self._tokens:
+            raise web.HTTPNotFound()
+
+        body = self._body
+        if body is None:
+            body = await self._rebuild()
+
+        headers = {
+            "ETag": self._etag,
+            "Last-Modified": format_datetime(self._last_modified, usegmt=True),
+            "Cache-Control": "private, max-age=300",
+        }
+        if self._is_not_modified(request):
+            return web.Response(status=304, headers=headers)
+        return web.Response(body=body, headers=headers, content_type="text/calendar", charset="utf-8")
+
+    async def start(self, host: str, port: int):
+        self.load_tokens()
+        await self._rebuild()
+        app = web.Application()
+        app.router.add_get("/calendar/{token}.ics", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        logger.info(f"Calendar feed is served on {host}:{port}")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+calendar_feed = CalendarFeed()
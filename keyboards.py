@@ -1,6 +1,10 @@
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
+import calendar
 import logging
 
+# Оценки, которые преподаватель может выставить за ДЗ
+GRADES = range(2, 6)
+
 def get_role_keyboard():
     return ReplyKeyboardMarkup(
         keyboard=[
@@ -11,8 +15,6 @@ def get_role_keyboard():
     )
 
 def get_main_keyboard(is_teacher=False):
-    print(f"Формируем клавиатуру для {'преподавателя' if is_teacher else 'студента'}")  # Лог
-    
     buttons = [
         [KeyboardButton(text="📅 Календарь")],
         [KeyboardButton(text="📚 Лекционные материалы")],
@@ -26,7 +28,6 @@ def get_main_keyboard(is_teacher=False):
     else:
         buttons.append([KeyboardButton(text="🛠 Администрирование")])
     
-    print(buttons)  # Выводим структуру кнопок
     return ReplyKeyboardMarkup(keyboard=buttons, resize_keyboard=True)
 
 def get_admin_keyboard():
@@ -34,8 +35,10 @@ def get_admin_keyboard():
         keyboard=[
             [KeyboardButton(text="📅 Добавить событие")],
             [KeyboardButton(text="📝 Создать тест")],
+            [KeyboardButton(text="📥 Импорт теста")],
             [KeyboardButton(text="📝 Добавить ДЗ")],
             [KeyboardButton(text="📚 Добавить лекцию")],
+            [KeyboardButton(text="📥 Проверка ДЗ")],
             [KeyboardButton(text="🔙 Назад")]
         ],
         resize_keyboard=True
@@ -65,13 +68,23 @@ def get_yes_no_keyboard():
         resize_keyboard=True
     )
 
+def get_question_type_keyboard():
+    return ReplyKeyboardMarkup(
+        keyboard=[
+            [KeyboardButton(text="1️⃣ Один ответ"), KeyboardButton(text="☑️ Несколько ответов")],
+            [KeyboardButton(text="🔢 Число"), KeyboardButton(text="✍️ Текст")],
+            [KeyboardButton(text="❌ Отмена")]
+        ],
+        resize_keyboard=True
+    )
+
 def get_tests_keyboard(tests):
     """Создает инлайн-клавиатуру для списка тестов"""
     keyboard = InlineKeyboardMarkup(inline_keyboard=[])
     for test in tests:
         try:
             # Пытаемся преобразовать строку в datetime, если это необходимо
-            end_time = test[4]
+            end_time = test.end_time
             if end_time and isinstance(end_time, str):
                 from datetime import datetime
                 end_time = datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S")
@@ -80,8 +93,8 @@ def get_tests_keyboard(tests):
             
             keyboard.inline_keyboard.append([
                 InlineKeyboardButton(
-                    text=f"{test[1]} (до {end_time_str})",
-                    callback_data=f"test_{test[0]}"  # test[0] - ID теста
+                    text=f"{test.title} (до {end_time_str})",
+                    callback_data=f"test_{test.test_id}"
                 )
             ])
         except Exception as e:
@@ -95,8 +108,8 @@ def get_homeworks_keyboard(homeworks):
     for hw in homeworks:
         keyboard.inline_keyboard.append([
             InlineKeyboardButton(
-                text=hw[1],  # hw[1] - название ДЗ
-                callback_data=f"hw_{hw[0]}"  # hw[0] - ID задания
+                text=hw.title,
+                callback_data=f"hw_{hw.hw_id}"
             )
         ])
     return keyboard if keyboard.inline_keyboard else None
@@ -107,8 +120,120 @@ def get_lectures_keyboard(lectures):
     for lecture in lectures:
         keyboard.inline_keyboard.append([
             InlineKeyboardButton(
-                text=lecture[1],  # lecture[1] - название лекции
-                callback_data=f"lecture_{lecture[0]}"  # lecture[0] - ID лекции
+                text=lecture.title,
+                callback_data=f"lecture_{lecture.material_id}"
+            )
+        ])
+    return keyboard if keyboard.inline_keyboard else None
+
+def get_answer_keyboard(question_index, options, multi=False, selected=()):
+    """Создает инлайн-клавиатуру с вариантами ответа на вопрос теста;
+    при multi=True варианты отмечаются галочками и выбор подтверждается кнопкой «Готово»"""
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[])
+    for i, option in enumerate(options):
+        mark = ("☑️ " if i in selected else "⬜ ") if multi else ""
+        keyboard.inline_keyboard.append([
+            InlineKeyboardButton(
+                text=f"{mark}{i+1}. {option}",
+                callback_data=f"ans_{question_index}_{i}"  # компактно: номер вопроса и варианта
+            )
+        ])
+    if multi:
+        keyboard.inline_keyboard.append([
+            InlineKeyboardButton(text="✅ Готово", callback_data=f"ans_{question_index}_done")
+        ])
+    return keyboard
+
+def get_pagination_row(prefix, page, has_next):
+    """Создает строку кнопок навигации по страницам"""
+    row = []
+    if page > 0:
+        row.append(InlineKeyboardButton(text="⬅️", callback_data=f"{prefix}_{page - 1}"))
+    if has_next:
+        row.append(InlineKeyboardButton(text="➡️", callback_data=f"{prefix}_{page + 1}"))
+    return row
+
+def get_review_homeworks_keyboard(homeworks, page, has_next):
+    """Создает инлайн-клавиатуру со списком ДЗ и счетчиками сдач"""
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[])
+    for hw_id, title, total, unread, graded in homeworks:
+        keyboard.inline_keyboard.append([
+            InlineKeyboardButton(
+                text=f"{title} (🆕{unread} ✅{graded} / {total})",
+                callback_data=f"rvh_{hw_id}_0"
             )
         ])
-    return keyboard if keyboard.inline_keyboard else None
\ No newline at end of file
+    nav = get_pagination_row("rvl", page, has_next)
+    if nav:
+        keyboard.inline_keyboard.append(nav)
+    return keyboard
+
+def get_review_submissions_keyboard(hw_id, submissions, page, has_next):
+    """Создает инлайн-клавиатуру со списком сдач по одному ДЗ"""
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[])
+    for submission_id, student, submitted_at, is_read, grade in submissions:
+        marker = f"✅{grade}" if grade is not None else ("👁" if is_read else "🆕")
+        keyboard.inline_keyboard.append([
+            InlineKeyboardButton(
+                text=f"{marker} {student} • {submitted_at}",
+                callback_data=f"rvs_{submission_id}"
+            )
+        ])
+    nav = get_pagination_row(f"rvh_{hw_id}", page, has_next)
+    if nav:
+        keyboard.inline_keyboard.append(nav)
+    keyboard.inline_keyboard.append([InlineKeyboardButton(text="🗜 Скачать ZIP", callback_data=f"rvz_{hw_id}")])
+    keyboard.inline_keyboard.append([InlineKeyboardButton(text="🔙 К списку ДЗ", callback_data="rvl_0")])
+    return keyboard
+
+def get_grade_keyboard(submission_id, hw_id):
+    """Создает инлайн-клавиатуру для выставления оценки"""
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text=str(grade), callback_data=f"rvg_{submission_id}_{grade}")
+            for grade in GRADES
+        ],
+        [InlineKeyboardButton(text="🔙 К списку сдач", callback_data=f"rvh_{hw_id}_0")]
+    ])
+
+def get_search_keyboard(results, page, has_next):
+    """Создает инлайн-клавиатуру результатов поиска со ссылками на материалы"""
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[])
+    callbacks = {'lecture': 'lecture', 'lecture_content': 'lecture', 'homework': 'hw'}
+    seen = set()
+    for kind, ref_id, title, _ in results:
+        prefix = callbacks.get(kind)
+        # События открывать некуда, а несколько фрагментов одной лекции ведут на одну кнопку
+        if not prefix or (prefix, ref_id) in seen:
+            continue
+        seen.add((prefix, ref_id))
+        keyboard.inline_keyboard.append([
+            InlineKeyboardButton(text=title, callback_data=f"{prefix}_{ref_id}")
+        ])
+    nav = get_pagination_row("srch", page, has_next)
+    if nav:
+        keyboard.inline_keyboard.append(nav)
+    return keyboard
+
+def get_month_keyboard(year, month, event_days, prev_month, next_month):
+    """Создает инлайн-календарь на месяц; дни с событиями отмечены точкой"""
+    noop = "caln"
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=f"{month:02d}.{year}", callback_data=noop)],
+        [InlineKeyboardButton(text=day, callback_data=noop) for day in ("Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс")]
+    ])
+    for week in calendar.monthcalendar(year, month):
+        row = []
+        for day in week:
+            if not day:
+                row.append(InlineKeyboardButton(text=" ", callback_data=noop))
+            elif day in event_days:
+                row.append(InlineKeyboardButton(text=f"•{day}", callback_data=f"cald_{year}_{month}_{day}"))
+            else:
+                row.append(InlineKeyboardButton(text=str(day), callback_data=noop))
+        keyboard.inline_keyboard.append(row)
+    keyboard.inline_keyboard.append([
+        InlineKeyboardButton(text="⬅️", callback_data=f"cal_{prev_month[0]}_{prev_month[1]}"),
+        InlineKeyboardButton(text="➡️", callback_data=f"cal_{next_month[0]}_{next_month[1]}")
+    ])
+    return keyboard
\ No newline at end of file
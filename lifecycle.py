@@ -0,0 +1,141 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.types import Update
+
+from database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+STATE_KEY = 'polling'
+
+
+def load_state(key: str) -> Optional[dict]:
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT value FROM bot_state WHERE key = ?", (key,))
+        row = cursor.fetchone()
+    finally:
+        conn.close()
+    return json.loads(row[0]) if row else None
+
+
+def save_state(key: str, value: dict):
+    conn = get_db_connection()
+    try:
+        conn.execute(
+            "INSERT OR REPLACE INTO bot_state (key, value) VALUES (?, ?)",
+            (key, json.dumps(value))
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+class UpdateTracker(BaseMiddleware):
+    """Считает обрабатываемые апдейты, отбрасывает повторы и хранит смещение между перезапусками"""
+
+    def __init__(self):
+        self.offset = 0
+        self.done: Set[int] = set()
+        self.in_flight: Set[int] = set()
+        self.last_processed_at: Optional[float] = None
+        self.restart_gap: Optional[float] = None
+        self._previous_stop: Optional[float] = None
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._persist_task: Optional[asyncio.Task] = None
+
+    def load(self):
+        state = load_state(STATE_KEY) or {}
+        self.offset = state.get('offset', 0)
+        self.done = set(state.get('done', []))
+        self._previous_stop = state.get('last_processed_at')
+
+    def persist(self):
+        """Сохраняет смещение: все апдейты до offset обработаны, выше него — только перечисленные в done"""
+        offset = min(self.in_flight) - 1 if self.in_flight else max(self.done, default=self.offset)
+        offset = max(offset, self.offset)
+        self.offset = offset
+        self.done = {update_id for update_id in self.done if update_id > offset}
+        save_state(STATE_KEY, {
+            'offset': offset,
+            'done': sorted(self.done),
+            'last_processed_at': self.last_processed_at,
+            'restart_gap': self.restart_gap,
+        })
+
+    async def confirm_offset(self, bot: Bot):
+        """Подтверждает Telegram уже обработанные апдейты, чтобы они не пришли повторно"""
+        if not self.offset:
+            return
+        try:
+            await bot.get_updates(offset=self.offset + 1, limit=1, timeout=0)
+        except Exception as e:
+            logger.warning(f"Cannot confirm update offset {self.offset}: {e}")
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        update_id = event.update_id
+        if update_id <= self.offset or update_id in self.done or update_id in self.in_flight:
+            logger.info(f"Duplicate update {update_id} skipped")
+            return None
+
+        if self.restart_gap is None and self._previous_stop is not None:
+            self.restart_gap = time.time() - self._previous_stop
+            logger.info(f"Update processing gap after restart: {self.restart_gap:.1f}s")
+
+        self.in_flight.add(update_id)
+        self._idle.clear()
+        try:
+            return await handler(event, data)
+        finally:
+            self.in_flight.discard(update_id)
+            self.done.add(update_id)
+            self.last_processed_at = time.time()
+            if not self.in_flight:
+                self._idle.set()
+
+    async def drain(self, timeout: float) -> bool:
+        """Ждет завершения обрабатываемых апдейтов не дольше timeout секунд"""
+        if self.in_flight:
+            logger.info(f"Draining {len(self.in_flight)} in-flight updates")
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning(f"Drain timed out, {len(self.in_flight)} updates are still running")
+            return False
+
+    async def start(self, bot: Bot, persist_interval: float = 30):
+        self.load()
+        await self.confirm_offset(bot)
+        self._persist_task = asyncio.create_task(self._persist_periodically(persist_interval))
+
+    async def _persist_periodically(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.persist()
+            except Exception as e:
+                logger.error(f"Failed to persist update offset: {e}", exc_info=True)
+
+    async def shutdown(self, timeout: float):
+        """Дожидается обработки уже полученных апдейтов и сохраняет смещение"""
+        if self._persist_task is not None:
+            self._persist_task.cancel()
+        drained = await self.drain(timeout)
+        self.persist()
+        logger.info(f"Update offset {self.offset} saved (drained: {drained})")
+
+
+update_tracker = UpdateTracker()
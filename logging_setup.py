@@ -0,0 +1,89 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from typing import Dict, List
+
+from config import Config
+from tracing import current_span
+
+# Логи уходят в очередь, а в поток/файл их пишет фоновый поток QueueListener:
+# медленный stderr (например, пайп воркера Procfile) больше не тормозит цикл событий.
+
+_listeners: List[logging.handlers.QueueListener] = []
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+
+class StructuredQueueHandler(logging.handlers.QueueHandler):
+    """Кладет запись в очередь, сохраняя сообщение и трейсбек отдельными полями"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        # Контекст апдейта доступен только в вызывающем потоке, поэтому берем его здесь
+        span = current_span.get()
+        record.trace_id = span.trace_id if span is not None else None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        trace_id = getattr(record, 'trace_id', None)
+        if trace_id:
+            entry['trace_id'] = trace_id
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def parse_levels(spec: str) -> Dict[str, int]:
+    """Разбирает строку вида 'aiogram.event=WARNING,handlers=DEBUG'"""
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, level = item.partition('=')
+        levels[name.strip()] = logging.getLevelName(level.strip().upper())
+    return levels
+
+
+def queue_handler(*handlers: logging.Handler) -> logging.Handler:
+    """Возвращает обработчик, который передает записи handlers через фоновый поток"""
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    listener.start()
+    _listeners.append(listener)
+    return StructuredQueueHandler(records)
+
+
+def setup_logging():
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(JsonFormatter() if Config.LOG_FORMAT == 'json' else logging.Formatter(TEXT_FORMAT))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler(stream))
+    root.setLevel(Config.LOG_LEVEL.upper())
+    for name, level in parse_levels(Config.LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Дописывает оставшиеся в очереди записи"""
+    while _listeners:
+        _listeners.pop().stop()
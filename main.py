@@ -9,23 +9,88 @@ from handlers.admin import router as admin_router
 from handlers.student import router as student_router
 from handlers.homework import router as homework_router
 from handlers.lectures import router as lectures_router
-from handlers.tests import router as tests_router
+from handlers.tests import router as tests_router, expire_test_attempt
+from handlers.review import router as review_router
+from handlers.search import router as search_router
+from handlers.stats import router as stats_router
+from handlers.reports import router as reports_router
 from database import init_db
+from deadlines import test_deadlines
+from file_storage import file_archive
+from ical_feed import calendar_feed
+from lifecycle import update_tracker
+from reporting import snapshot_store
+from backups import backup_manager
+from archive import archive_job
+from outbox import outbox
+from transport import create_session
+from charts import chart_renderer
+from similarity import similarity_index
+import repository
+from tracing import tracer, ApiSpanMiddleware, HandlerSpanMiddleware
+from logging_setup import setup_logging, queue_handler
+import metrics
+from scheduler import UpdateScheduler
+from middlewares import AlbumMiddleware, CallbackDedupMiddleware, FloodMiddleware, UserLockMiddleware
+from functools import partial
+import asyncio
 import time
-print("Текущая временная зона:", time.tzname)
 
-# Initialize logger
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 async def main():
+    # Logging goes through a queue to a background thread, never blocking the event loop.
+    # Set up here, not at import: chart worker processes (spawn) import this module too
+    setup_logging()
+    
+    logger.info(f"Time zone: {time.tzname}")
+    
+    # Watch how long the event loop stalls between iterations
+    loop_monitor = asyncio.create_task(metrics.monitor_loop_lag(Config.LOOP_LAG_INTERVAL))
+    
     # Initialize database
     init_db()
     
-    # Create bot and dispatcher
-    bot = Bot(token=Config.BOT_TOKEN)
+    # Create bot and dispatcher; the session retries transient Bot API failures
+    bot = Bot(token=Config.BOT_TOKEN, session=create_session())
     dp = Dispatcher(storage=MemoryStorage())
     
+    # Drop floods first, before tracing, bookkeeping, scheduling, handlers or the DB
+    dp.update.outer_middleware(FloodMiddleware(
+        Config.FLOOD_USER_RATE, Config.FLOOD_USER_BURST, Config.FLOOD_CHAT_RATE, Config.FLOOD_CHAT_BURST
+    ))
+    
+    # One span per update with DB and Bot API child spans, written to a rotating JSONL file
+    if Config.TRACE_FILE:
+        tracer.setup(queue_handler)
+        dp.update.outer_middleware(tracer)
+        handler_spans = HandlerSpanMiddleware()
+        dp.message.middleware(handler_spans)
+        dp.callback_query.middleware(handler_spans)
+        bot.session.middleware(ApiSpanMiddleware())
+    
+    # Track in-flight updates and skip ones already handled before a restart
+    dp.update.outer_middleware(update_tracker)
+    await update_tracker.start(bot)
+    
+    async def on_shutdown():
+        # Polling has stopped: let running handlers finish and save the offset
+        await update_tracker.shutdown(Config.DRAIN_TIMEOUT)
+    
+    dp.shutdown.register(on_shutdown)
+    
+    # Handle each user's updates in order, different users in parallel, with a global cap;
+    # under overload test-taking goes first and navigation gets a short "busy" reply
+    dp.update.outer_middleware(UpdateScheduler(Config.MAX_CONCURRENT_UPDATES, Config.SHED_QUEUE_LATENCY))
+    
+    # Drop double taps before any handler runs, serialize state-mutating handlers per user
+    dp.callback_query.outer_middleware(CallbackDedupMiddleware(Config.CALLBACK_DEDUP_WINDOW))
+    # Album collection must wrap the user lock, otherwise album parts would queue behind the first one
+    dp.message.middleware(AlbumMiddleware(Config.ALBUM_LATENCY))
+    user_lock = UserLockMiddleware()
+    dp.message.middleware(user_lock)
+    dp.callback_query.middleware(user_lock)
+    
     # Include routers
     dp.include_router(common_router)
     dp.include_router(admin_router)
@@ -33,10 +98,51 @@ async def main():
     dp.include_router(homework_router)
     dp.include_router(lectures_router)
     dp.include_router(tests_router)
+    dp.include_router(review_router)
+    dp.include_router(search_router)
+    dp.include_router(stats_router)
+    dp.include_router(reports_router)
+    
+    # Start the shared test deadline sweeper
+    test_deadlines.start(partial(expire_test_attempt, bot, dp.storage))
+    
+    # Start archiving Telegram files to local storage
+    file_archive.start(bot)
+    
+    # Keep a periodically refreshed copy of the database for reports
+    snapshot_store.start()
+    
+    # Throttled online backups in a background thread
+    backup_manager.start()
+    
+    # Move long-closed tests and their results to the archive database
+    archive_job.start()
+    
+    # Index text submissions made before the similarity search existed
+    similarity_index.start()
+    
+    # Retry teacher notifications that could not be delivered right away
+    outbox.start(bot)
+    
+    # Serve the iCalendar feed when a port is configured
+    if Config.ICS_PORT:
+        await calendar_feed.start(Config.ICS_HOST, Config.ICS_PORT)
     
     # Start polling
-    await dp.start_polling(bot)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        await test_deadlines.stop()
+        await file_archive.stop()
+        await calendar_feed.stop()
+        await snapshot_store.stop()
+        await archive_job.stop()
+        await outbox.stop()
+        chart_renderer.shutdown()
+        await similarity_index.stop()
+        await asyncio.to_thread(backup_manager.stop)
+        repository.close_connection()
+        loop_monitor.cancel()
 
 if __name__ == '__main__':
-    import asyncio
     asyncio.run(main())
\ No newline at end of file
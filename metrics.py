@@ -0,0 +1,80 @@
+import asyncio
+import time
+from collections import deque
+from typing import Callable, Deque, Dict
+
+# Простой реестр метрик процесса: счетчики, вычисляемые показатели и окна задержек
+_counters: Dict[str, int] = {}
+_gauges: Dict[str, Callable[[], float]] = {}
+_latencies: Dict[str, Deque[float]] = {}
+
+WINDOW_SIZE = 1024
+
+
+def inc(name: str, value: int = 1):
+    _counters[name] = _counters.get(name, 0) + value
+
+
+def register_gauge(name: str, getter: Callable[[], float]):
+    _gauges[name] = getter
+
+
+def observe(name: str, seconds: float):
+    window = _latencies.get(name)
+    if window is None:
+        window = _latencies[name] = deque(maxlen=WINDOW_SIZE)
+    window.append(seconds)
+
+
+def percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def latency_summary(name: str) -> Dict[str, float]:
+    window = _latencies.get(name, ())
+    return {
+        'count': len(window),
+        'p50_ms': percentile(window, 0.5) * 1000,
+        'p99_ms': percentile(window, 0.99) * 1000,
+        'max_ms': max(window, default=0.0) * 1000,
+    }
+
+
+def snapshot() -> dict:
+    """Возвращает текущие значения всех метрик"""
+    return {
+        'counters': dict(_counters),
+        'gauges': {name: getter() for name, getter in _gauges.items()},
+        'latencies': {name: latency_summary(name) for name in _latencies},
+    }
+
+
+def format_snapshot() -> str:
+    data = snapshot()
+    lines = []
+    for name, value in sorted(data['gauges'].items()):
+        lines.append(f"{name}: {value:g}")
+    for name, value in sorted(data['counters'].items()):
+        lines.append(f"{name}: {value}")
+    for name, summary in sorted(data['latencies'].items()):
+        lines.append(
+            f"{name}: p50 {summary['p50_ms']:.1f} мс, p99 {summary['p99_ms']:.1f} мс, "
+            f"max {summary['max_ms']:.1f} мс (n={summary['count']})"
+        )
+    return "\n".join(lines) or "Метрик пока нет."
+
+
+async def monitor_loop_lag(interval: float = 0.5):
+    """Замеряет, на сколько цикл событий опаздывает разбудить задачу: это время,
+    когда он был занят синхронным кодом (запись логов, запросы к БД и т. п.)"""
+    worst = 0.0
+    register_gauge('loop.lag_max_ms', lambda: worst * 1000)
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag = max(0.0, time.perf_counter() - started - interval)
+        observe('loop.lag', lag)
+        worst = max(worst, lag)
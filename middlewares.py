@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, Message, TelegramObject, Update
+
+import metrics
+from scheduler import HIGH, classify
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]]
+
+
+class CallbackDedupMiddleware(BaseMiddleware):
+    """Отбрасывает повторные нажатия одной и той же кнопки в пределах окна"""
+
+    # Ответы в тесте не дедуплицируем: повторное нажатие варианта в вопросе с несколькими
+    # ответами снимает отметку, а устаревшие нажатия отсекает сам обработчик по номеру вопроса
+    EXEMPT_PREFIXES = ('ans_',)
+
+    def __init__(self, window: float = 1.0):
+        self.window = window
+        # (user_id, data) -> время последнего нажатия; порядок вставки совпадает с порядком времени
+        self._seen: OrderedDict[Tuple[int, str], float] = OrderedDict()
+
+    def _evict(self, now: float):
+        while self._seen:
+            key, seen_at = next(iter(self._seen.items()))
+            if now - seen_at < self.window:
+                break
+            del self._seen[key]
+
+    async def __call__(self, handler: Handler, event: CallbackQuery, data: Dict[str, Any]) -> Any:
+        if event.data and event.data.startswith(self.EXEMPT_PREFIXES):
+            return await handler(event, data)
+
+        now = time.monotonic()
+        self._evict(now)
+
+        key = (event.from_user.id, event.data)
+        if key in self._seen:
+            logger.debug(f"Duplicate callback {event.data!r} from user {event.from_user.id} dropped")
+            await event.answer()
+            return None
+
+        self._seen[key] = now
+        return await handler(event, data)
+
+
+class UserLockMiddleware(BaseMiddleware):
+    """Выполняет помеченные флагом user_lock обработчики одного пользователя строго по очереди"""
+
+    def __init__(self):
+        # user_id -> [lock, число ожидающих]; запись удаляется, когда она никому не нужна
+        self._locks: Dict[int, list] = {}
+
+    async def __call__(self, handler: Handler, event: TelegramObject, data: Dict[str, Any]) -> Any:
+        user = data.get("event_from_user")
+        if user is None or not get_flag(data, "user_lock"):
+            return await handler(event, data)
+
+        entry = self._locks.get(user.id)
+        if entry is None:
+            entry = self._locks[user.id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                return await handler(event, data)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[user.id]
+
+
+class AlbumMiddleware(BaseMiddleware):
+    """Собирает части альбома (media group) и вызывает помеченный флагом album обработчик один раз"""
+
+    def __init__(self, latency: float = 0.6):
+        self.latency = latency
+        self._albums: Dict[str, list] = {}
+
+    async def __call__(self, handler: Handler, event: Message, data: Dict[str, Any]) -> Any:
+        if not event.media_group_id or not get_flag(data, "album"):
+            return await handler(event, data)
+
+        album = self._albums.get(event.media_group_id)
+        if album is not None:
+            album.append(event)
+            return None
+
+        # Первая часть альбома ждет, пока не перестанут приходить остальные
+        album = self._albums[event.media_group_id] = [event]
+        try:
+            received = 0
+            while received != len(album):
+                received = len(album)
+                await asyncio.sleep(self.latency)
+        finally:
+            del self._albums[event.media_group_id]
+
+        data["album"] = sorted(album, key=lambda message: message.message_id)
+        return await handler(event, data)
+
+
+class TokenBuckets:
+    """Корзины токенов по ключу; полностью восполненная корзина не хранится"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        # Через столько секунд простоя корзина снова полна и неотличима от новой
+        self.idle = burst / rate
+        # key -> [токены, время последнего обращения, уведомлен ли о превышении]
+        self._buckets: OrderedDict[int, list] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _evict(self, now: float):
+        while self._buckets:
+            key, bucket = next(iter(self._buckets.items()))
+            if now - bucket[1] < self.idle:
+                break
+            del self._buckets[key]
+
+    def take(self, key: int, now: float) -> Tuple[bool, list]:
+        """Списывает токен; возвращает, хватило ли токена, и корзину"""
+        self._evict(now)
+        bucket = self._buckets.pop(key, None)
+        if bucket is None:
+            bucket = [self.burst, now, False]
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        # Корзина переезжает в конец: порядок словаря совпадает с порядком обращений
+        self._buckets[key] = bucket
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            bucket[2] = False
+            return True, bucket
+        return False, bucket
+
+
+class FloodMiddleware(BaseMiddleware):
+    """Внешний middleware апдейтов: ограничивает частоту запросов пользователя и чата,
+    лишние апдейты отбрасываются до обработчиков и БД"""
+
+    NOTICE = "⏳ Слишком много запросов. Подождите несколько секунд."
+
+    def __init__(self, user_rate: float = 2.0, user_burst: float = 10,
+                 chat_rate: float = 5.0, chat_burst: float = 30):
+        self.users = TokenBuckets(user_rate, user_burst)
+        self.chats = TokenBuckets(chat_rate, chat_burst)
+        metrics.register_gauge('flood.user_buckets', lambda: len(self.users))
+        metrics.register_gauge('flood.chat_buckets', lambda: len(self.chats))
+
+    async def __call__(self, handler: Handler, event: Update, data: Dict[str, Any]) -> Any:
+        user = data.get("event_from_user")
+        chat = data.get("event_chat")
+        # Части альбома приходят пачкой, но их число ограничено самим Telegram
+        if user is None or (event.message and event.message.media_group_id):
+            return await handler(event, data)
+
+        now = time.monotonic()
+        allowed, bucket = self.users.take(user.id, now)
+        scope = 'user'
+        if allowed and chat is not None and chat.id != user.id:
+            allowed, bucket = self.chats.take(chat.id, now)
+            scope = 'chat'
+        if allowed:
+            return await handler(event, data)
+
+        # Ответы на тест не теряем: они дешевые, а потеря ответа хуже лишней нагрузки
+        if classify(event, data.get("raw_state")) == HIGH:
+            metrics.inc('flood.exempt')
+            return await handler(event, data)
+
+        metrics.inc(f'flood.dropped.{scope}')
+        if not bucket[2]:
+            # Предупреждаем один раз за эпизод, остальное отбрасываем молча
+            bucket[2] = True
+            metrics.inc('flood.notified')
+            logger.info(f"Throttling {scope} {chat.id if scope == 'chat' else user.id}")
+            try:
+                if event.callback_query:
+                    await event.callback_query.answer(self.NOTICE)
+                elif event.message:
+                    await event.message.answer(self.NOTICE)
+            except Exception as e:
+                logger.debug(f"Cannot send flood notice: {e}")
+        return None
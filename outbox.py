@@ -0,0 +1,160 @@
+import asyncio
+import json
+import logging
+import time
+from typing import List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from aiogram.types import InputMediaAudio, InputMediaDocument, InputMediaPhoto, InputMediaVideo
+
+from config import Config
+import metrics
+import repository
+
+logger = logging.getLogger(__name__)
+
+INPUT_MEDIA = {
+    'photo': InputMediaPhoto,
+    'video': InputMediaVideo,
+    'document': InputMediaDocument,
+    'audio': InputMediaAudio,
+}
+
+# Telegram позволяет смешивать в альбоме только фото с видео; документы и аудио идут отдельными альбомами
+MEDIA_GROUP_KIND = {'photo': 'visual', 'video': 'visual', 'document': 'document', 'audio': 'audio'}
+
+# Ошибки, которые повтор не исправит: бот заблокирован, чат или файл не найден
+PERMANENT_ERRORS = (TelegramForbiddenError, TelegramBadRequest)
+
+# Шаг уведомления: ('text', текст) или ('attachments', [[file_id, тип файла], ...])
+Step = Tuple[str, object]
+
+
+async def send_attachments(bot: Bot, chat_id: int, attachments: list[tuple[str, str]]):
+    """Пересылает вложения одним альбомом (или несколькими, если типы нельзя смешивать)"""
+    if len(attachments) == 1:
+        file_id, file_type = attachments[0]
+        send = {
+            'photo': bot.send_photo,
+            'video': bot.send_video,
+            'document': bot.send_document,
+            'audio': bot.send_audio,
+        }[file_type]
+        await send(chat_id, file_id)
+        return
+        
+    groups: dict[str, list] = {}
+    for file_id, file_type in attachments:
+        groups.setdefault(MEDIA_GROUP_KIND[file_type], []).append(INPUT_MEDIA[file_type](media=file_id))
+    for media in groups.values():
+        for i in range(0, len(media), 10):
+            chunk = media[i:i + 10]
+            if len(chunk) == 1:
+                await send_attachments(bot, chat_id, [(chunk[0].media, chunk[0].type)])
+            else:
+                await bot.send_media_group(chat_id, chunk)
+
+
+async def send_step(bot: Bot, chat_id: int, step: Step):
+    kind, value = step
+    if kind == 'text':
+        await bot.send_message(chat_id, value)
+    elif kind == 'attachments':
+        await send_attachments(bot, chat_id, [tuple(item) for item in value])
+    else:
+        raise ValueError(f"Unknown outbox step: {kind}")
+
+
+class Outbox:
+    """Уведомления с гарантией доставки: что не ушло сразу, сохраняется в таблицу outbox
+    и повторяется фоновой задачей с экспоненциальной паузой"""
+
+    def __init__(self, interval: float = 10, max_attempts: int = 12,
+                 base_delay: float = 30, max_delay: float = 3600):
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._bot: Optional[Bot] = None
+        self._task: Optional[asyncio.Task] = None
+        metrics.register_gauge('outbox.pending', lambda: repository.outbox.counts()[0])
+        metrics.register_gauge('outbox.dead', lambda: repository.outbox.counts()[1])
+
+    def start(self, bot: Bot):
+        self._bot = bot
+        self._task = asyncio.create_task(self._run_periodically())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def send(self, bot: Bot, chat_id: int, steps: List[Step]) -> bool:
+        """Отправляет шаги по порядку; при временном сбое ставит недоставленные в очередь.
+        Возвращает True, если все доставлено сразу"""
+        done, error = await self._deliver(bot, chat_id, steps)
+        if error is None:
+            return True
+        if isinstance(error, PERMANENT_ERRORS):
+            metrics.inc('outbox.rejected')
+            logger.error(f"Notification to {chat_id} rejected: {error}")
+            return False
+        repository.outbox.add(
+            chat_id, json.dumps(steps[done:], ensure_ascii=False), 1, self._next_attempt(1, error), str(error)
+        )
+        metrics.inc('outbox.queued')
+        logger.warning(f"Notification to {chat_id} queued for retry: {error}")
+        return False
+
+    async def _deliver(self, bot: Bot, chat_id: int, steps: List[Step]) -> Tuple[int, Optional[Exception]]:
+        """Возвращает число доставленных шагов и ошибку, на которой остановились"""
+        for done, step in enumerate(steps):
+            try:
+                await send_step(bot, chat_id, step)
+            except Exception as e:
+                return done, e
+        return len(steps), None
+
+    def _next_attempt(self, attempts: int, error: Exception) -> float:
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        if isinstance(error, TelegramRetryAfter):
+            delay = max(delay, error.retry_after)
+        return time.time() + delay
+
+    async def retry_due(self) -> int:
+        """Повторяет созревшие уведомления; возвращает число доставленных"""
+        delivered = 0
+        for item in repository.outbox.due(time.time()):
+            steps = json.loads(item.steps)
+            done, error = await self._deliver(self._bot, item.chat_id, steps)
+            if error is None:
+                repository.outbox.remove(item.outbox_id)
+                metrics.inc('outbox.delivered')
+                delivered += 1
+                continue
+
+            attempts = item.attempts + 1
+            remaining = json.dumps(steps[done:], ensure_ascii=False)
+            if isinstance(error, PERMANENT_ERRORS) or attempts >= self.max_attempts:
+                # Строка остается в таблице для разбора, но больше не повторяется
+                repository.outbox.reschedule(item.outbox_id, remaining, attempts, None, str(error))
+                metrics.inc('outbox.dead')
+                logger.error(f"Giving up on notification {item.outbox_id} to {item.chat_id}: {error}")
+            else:
+                repository.outbox.reschedule(
+                    item.outbox_id, remaining, attempts, self._next_attempt(attempts, error), str(error)
+                )
+        return delivered
+
+    async def _run_periodically(self):
+        while True:
+            try:
+                await self.retry_due()
+            except Exception as e:
+                logger.error(f"Outbox retry failed: {e}", exc_info=True)
+            await asyncio.sleep(self.interval)
+
+
+outbox = Outbox(Config.OUTBOX_INTERVAL, Config.OUTBOX_MAX_ATTEMPTS, Config.OUTBOX_BASE_DELAY, Config.OUTBOX_MAX_DELAY)
@@ -0,0 +1,252 @@
+import math
+import re
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+# Типы вопросов теста и их проверка. В JSON теста вопрос без поля type — это выбор
+# одного варианта в прежнем формате {"text", "options", "correct"}; остальные типы:
+#   {"type": "multi", "text", "options", "correct": [номера с нуля]} — несколько ответов, частичный балл
+#   {"type": "numeric", "text", "answer": 3.14, "tolerance": 0.01} — число с допуском
+#   {"type": "text", "text", "answers": ["ответ", "синоним"], "patterns": ["регулярное выражение"]}
+# Перед подсчетом баллов каждый вопрос компилируется в проверяющий объект: нормализация
+# эталонов и компиляция регулярных выражений выполняются один раз на тест, а не на каждый ответ.
+
+SINGLE, MULTI, NUMERIC, TEXT = 'single', 'multi', 'numeric', 'text'
+QUESTION_TYPES = (SINGLE, MULTI, NUMERIC, TEXT)
+CHOICE_TYPES = (SINGLE, MULTI)
+
+# Скомпилированные тесты по test_id: тесты после создания не меняются
+COMPILED_CACHE_SIZE = 128
+
+_NOT_WORD_RE = re.compile(r"[^\w\s]+")
+_SPACE_RE = re.compile(r"\s+")
+_NUMBERS_RE = re.compile(r"[\s,;]+")
+
+
+def question_type(question: dict) -> str:
+    return question.get('type', SINGLE)
+
+
+def normalize_text(text: str) -> str:
+    """Нижний регистр, ё→е, без знаков препинания и лишних пробелов"""
+    text = _NOT_WORD_RE.sub(" ", text.lower().replace("ё", "е"))
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def _is_index(value, count: int) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool) and 0 <= value < count
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def question_error(question) -> Optional[str]:
+    """Возвращает описание ошибки в вопросе или None, если вопрос корректен"""
+    if not isinstance(question, dict):
+        return "вопрос должен быть объектом"
+    kind = question_type(question)
+    if kind not in QUESTION_TYPES:
+        return f"неизвестный тип вопроса: {kind}"
+    if not isinstance(question.get('text'), str) or not question['text'].strip():
+        return "пустой текст вопроса"
+
+    if kind in CHOICE_TYPES:
+        missing = [key for key in ('options', 'correct') if key not in question]
+        if missing:
+            return f"нет полей: {', '.join(missing)}"
+        options = question['options']
+        if not isinstance(options, list) or len(options) < 2:
+            return "нужно минимум 2 варианта ответа"
+        if not all(isinstance(option, str) and option.strip() for option in options):
+            return "варианты ответа должны быть непустыми строками"
+        correct = question['correct']
+        if kind == SINGLE:
+            if not _is_index(correct, len(options)):
+                return "неверный номер правильного ответа"
+        elif (not isinstance(correct, list) or not correct
+              or not all(_is_index(index, len(options)) for index in correct)
+              or len(set(correct)) != len(correct)):
+            return "правильные ответы — непустой список разных номеров вариантов"
+        return None
+
+    if kind == NUMERIC:
+        if not _is_number(question.get('answer')):
+            return "правильный ответ должен быть числом"
+        tolerance = question.get('tolerance', 0)
+        if not _is_number(tolerance) or tolerance < 0:
+            return "допуск должен быть неотрицательным числом"
+        return None
+
+    answers = question.get('answers', [])
+    patterns = question.get('patterns', [])
+    if not isinstance(answers, list) or not all(isinstance(answer, str) and normalize_text(answer) for answer in answers):
+        return "допустимые ответы должны быть непустыми строками"
+    if not isinstance(patterns, list) or not all(isinstance(pattern, str) and pattern for pattern in patterns):
+        return "шаблоны должны быть непустыми строками"
+    if not answers and not patterns:
+        return "нужен хотя бы один допустимый ответ или шаблон"
+    for pattern in patterns:
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            return f"ошибка в регулярном выражении {pattern!r}: {e}"
+    return None
+
+
+def clean_question(question: dict) -> dict:
+    """Оставляет в корректном вопросе только поля его типа"""
+    kind = question_type(question)
+    if kind == SINGLE:
+        return {'text': question['text'], 'options': question['options'], 'correct': question['correct']}
+    if kind == MULTI:
+        return {'type': MULTI, 'text': question['text'], 'options': question['options'],
+                'correct': sorted(question['correct'])}
+    if kind == NUMERIC:
+        return {'type': NUMERIC, 'text': question['text'], 'answer': question['answer'],
+                'tolerance': question.get('tolerance', 0)}
+    return {'type': TEXT, 'text': question['text'], 'answers': question.get('answers', []),
+            'patterns': question.get('patterns', [])}
+
+
+def validate_questions(questions: List[dict]):
+    """Проверяет список вопросов теста; ValueError с номером первого неверного вопроса"""
+    if not isinstance(questions, list) or not questions:
+        raise ValueError("нужен непустой список вопросов")
+    for number, question in enumerate(questions, 1):
+        error = question_error(question)
+        if error:
+            raise ValueError(f"вопрос {number}: {error}")
+
+
+class SingleChoice:
+    __slots__ = ('options', 'correct')
+    hint = "⚠️ Введите номер варианта (1, 2, 3...). Попробуйте снова:"
+
+    def __init__(self, question: dict):
+        self.options = len(question['options'])
+        self.correct = question['correct']
+
+    def parse(self, text: str) -> Optional[int]:
+        try:
+            answer = int(text.strip())
+        except ValueError:
+            return None
+        return answer - 1 if 1 <= answer <= self.options else None
+
+    def score(self, answer) -> float:
+        return 1.0 if answer == self.correct else 0.0
+
+
+class MultiChoice:
+    """Каждый верно выбранный вариант дает 1/k балла, каждый ошибочный столько же отнимает"""
+
+    __slots__ = ('options', 'correct', 'weight')
+    hint = "⚠️ Введите номера вариантов через запятую (например: 1, 3). Попробуйте снова:"
+
+    def __init__(self, question: dict):
+        self.options = len(question['options'])
+        self.correct = frozenset(question['correct'])
+        self.weight = 1.0 / len(self.correct)
+
+    def parse(self, text: str) -> Optional[List[int]]:
+        try:
+            answer = {int(part) - 1 for part in _NUMBERS_RE.split(text.strip()) if part}
+        except ValueError:
+            return None
+        if not answer or not all(0 <= index < self.options for index in answer):
+            return None
+        return sorted(answer)
+
+    def score(self, answer) -> float:
+        if not answer:
+            return 0.0
+        hits = sum(1 for index in answer if index in self.correct)
+        return max(0.0, (2 * hits - len(answer)) * self.weight)
+
+
+class NumericAnswer:
+    __slots__ = ('low', 'high')
+    hint = "⚠️ Введите число (например: 3.14). Попробуйте снова:"
+
+    def __init__(self, question: dict):
+        tolerance = question.get('tolerance', 0)
+        # Запас на погрешность двоичного представления: 0.1 + 0.2 должно совпасть с 0.3
+        slack = 1e-9 * max(1.0, abs(question['answer']))
+        self.low = question['answer'] - tolerance - slack
+        self.high = question['answer'] + tolerance + slack
+
+    def parse(self, text: str) -> Optional[float]:
+        try:
+            answer = float(text.strip().replace(',', '.').replace(' ', ''))
+        except ValueError:
+            return None
+        return answer if math.isfinite(answer) else None
+
+    def score(self, answer) -> float:
+        return 1.0 if answer is not None and self.low <= answer <= self.high else 0.0
+
+
+class TextAnswer:
+    """Ответ засчитывается, если после нормализации совпал с одним из допустимых
+    или целиком подошел под один из шаблонов"""
+
+    __slots__ = ('answers', 'patterns')
+    hint = "⚠️ Введите ответ текстом. Попробуйте снова:"
+
+    def __init__(self, question: dict):
+        self.answers = frozenset(normalize_text(answer) for answer in question.get('answers', []))
+        self.patterns = tuple(re.compile(pattern, re.IGNORECASE) for pattern in question.get('patterns', []))
+
+    def parse(self, text: str) -> Optional[str]:
+        text = text.strip()
+        return text or None
+
+    def score(self, answer) -> float:
+        if not answer:
+            return 0.0
+        if normalize_text(answer) in self.answers:
+            return 1.0
+        return 1.0 if any(pattern.fullmatch(answer.strip()) for pattern in self.patterns) else 0.0
+
+
+MATCHERS = {
+    SINGLE: SingleChoice,
+    MULTI: MultiChoice,
+    NUMERIC: NumericAnswer,
+    TEXT: TextAnswer,
+}
+
+Matcher = Any
+_compiled: OrderedDict[int, List[Matcher]] = OrderedDict()
+
+
+def compile_questions(questions: Sequence[dict]) -> List[Matcher]:
+    return [MATCHERS[question_type(question)](question) for question in questions]
+
+
+def compiled_test(test_id: int, questions: Sequence[dict]) -> List[Matcher]:
+    """Проверяющие объекты теста, собранные один раз на test_id"""
+    matchers = _compiled.get(test_id)
+    if matchers is None:
+        matchers = _compiled[test_id] = compile_questions(questions)
+        if len(_compiled) > COMPILED_CACHE_SIZE:
+            _compiled.popitem(last=False)
+    else:
+        _compiled.move_to_end(test_id)
+    return matchers
+
+
+def normalize_answers(answers: Dict) -> Dict[int, Any]:
+    """Ключи ответов — номера вопросов; после JSON они становятся строками"""
+    return {int(index): answer for index, answer in answers.items()}
+
+
+def calculate_score(matchers: Sequence[Matcher], answers: Dict[int, Any]) -> float:
+    """Сумма баллов за вопросы; частичные баллы округляются до сотых"""
+    get = answers.get
+    return round(sum(matcher.score(get(index)) for index, matcher in enumerate(matchers)), 2)
+
+
+def format_score(score: Optional[float]) -> str:
+    return "—" if score is None else f"{score:g}"
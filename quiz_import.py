@@ -0,0 +1,236 @@
+import csv
+import io
+import json
+import re
+from typing import IO, Iterable, Iterator, List, Tuple
+
+from questions import MULTI, NUMERIC, TEXT, clean_question, question_error
+
+# Импорт тестов из файлов: JSON (как в БД), JSON Lines, CSV и Moodle GIFT.
+# JSON Lines, CSV и GIFT читаются построчно, JSON разбирается целиком. Все разборщики
+# возвращают вопросы вместе со списком ошибок вида (номер строки, описание), чтобы
+# преподаватель мог исправить файл за один раз.
+
+SUPPORTED_EXTENSIONS = ('.json', '.jsonl', '.csv', '.gift', '.txt')
+MAX_REPORTED_ERRORS = 20
+
+ParseResult = Tuple[List[dict], List[Tuple[int, str]]]
+
+
+def _checked(question: dict, line: int, questions: List[dict], errors: List[Tuple[int, str]], prefix: str = ''):
+    error = question_error(question)
+    if error:
+        errors.append((line, prefix + error))
+    else:
+        questions.append(clean_question(question))
+
+
+def parse_json(stream: IO[str]) -> ParseResult:
+    """Разбирает список вопросов в формате БД (или объект с ключом questions)"""
+    questions, errors = [], []
+    try:
+        document = json.load(stream)
+    except json.JSONDecodeError as e:
+        return questions, [(e.lineno, f"ошибка JSON: {e.msg}")]
+    if isinstance(document, dict):
+        document = document.get('questions')
+    if not isinstance(document, list):
+        return questions, [(1, "ожидается список вопросов")]
+    for number, question in enumerate(document, 1):
+        # Номера строк в многострочном JSON неизвестны: указываем номер вопроса
+        _checked(question, 0, questions, errors, prefix=f"вопрос {number}: ")
+    return questions, errors
+
+
+def parse_jsonl(stream: IO[str]) -> ParseResult:
+    """Разбирает JSON Lines: один вопрос на строку"""
+    questions, errors = [], []
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            question = json.loads(line)
+        except json.JSONDecodeError as e:
+            errors.append((line_number, f"ошибка JSON: {e.msg}"))
+            continue
+        _checked(question, line_number, questions, errors)
+    return questions, errors
+
+
+def parse_csv(stream: IO[str]) -> ParseResult:
+    """Разбирает CSV вида: вопрос; номер правильного ответа; вариант 1; вариант 2; ...
+
+    Разделитель (запятая или точка с запятой) определяется по первой строке,
+    строка-заголовок пропускается. Несколько номеров через пробел («1 3») — вопрос
+    с несколькими правильными ответами.
+    """
+    questions, errors = [], []
+    first_line = stream.readline()
+    delimiter = ';' if first_line.count(';') >= first_line.count(',') else ','
+    reader = csv.reader(_chain_line(first_line, stream), delimiter=delimiter)
+    for row in reader:
+        row = [cell.strip() for cell in row]
+        if not any(row):
+            continue
+        if reader.line_num == 1 and len(row) > 1 and not row[1].replace(' ', '').isdigit():
+            continue
+        if len(row) < 4:
+            errors.append((reader.line_num, "нужны вопрос, номер ответа и минимум 2 варианта"))
+            continue
+        try:
+            correct = [int(number) - 1 for number in re.split(r'[\s,]+', row[1]) if number]
+        except ValueError:
+            errors.append((reader.line_num, f"номер правильного ответа не число: {row[1]}"))
+            continue
+        options = [option for option in row[2:] if option]
+        question = {'text': row[0], 'options': options, 'correct': correct[0] if len(correct) == 1 else correct}
+        if len(correct) > 1:
+            question['type'] = MULTI
+        _checked(question, reader.line_num, questions, errors)
+    return questions, errors
+
+
+def _chain_line(first_line: str, stream: Iterable[str]) -> Iterator[str]:
+    if first_line:
+        yield first_line
+    yield from stream
+
+
+GIFT_ESCAPES = {'\\~': '~', '\\=': '=', '\\#': '#', '\\{': '{', '\\}': '}', '\\:': ':', '\\n': '\n'}
+GIFT_ESCAPE_RE = re.compile(r'\\[~=#{}:n]')
+GIFT_TITLE_RE = re.compile(r'^::(.*?)::')
+GIFT_ANSWER_RE = re.compile(r'(?<!\\)([=~])')
+GIFT_WEIGHT_RE = re.compile(r'^%(-?\d+(?:\.\d+)?)%')
+GIFT_NUMBER_RE = re.compile(r'^(-?\d+(?:\.\d+)?)(?:(:|\.\.)(-?\d+(?:\.\d+)?))?$')
+
+
+def _gift_unescape(text: str) -> str:
+    return GIFT_ESCAPE_RE.sub(lambda m: GIFT_ESCAPES[m.group()], text).strip()
+
+
+def _gift_strip_feedback(text: str) -> str:
+    return re.split(r'(?<!\\)#', text, maxsplit=1)[0]
+
+
+def parse_gift_numeric(answers: str) -> dict:
+    """{#3.14:0.01} — число с допуском, {#1..5} — диапазон"""
+    answers = _gift_strip_feedback(answers.lstrip('=')).strip()
+    match = GIFT_NUMBER_RE.match(answers.replace(' ', ''))
+    if not match:
+        raise ValueError("числовой ответ задается как {#число}, {#число:допуск} или {#от..до}")
+    value = float(match.group(1))
+    if match.group(2) == '..':
+        high = float(match.group(3))
+        return {'type': NUMERIC, 'answer': (value + high) / 2, 'tolerance': abs(high - value) / 2}
+    return {'type': NUMERIC, 'answer': value, 'tolerance': float(match.group(3) or 0)}
+
+
+def parse_gift_question(block: str) -> dict:
+    """Переводит один вопрос GIFT в формат БД: выбор одного или нескольких вариантов,
+    верно/неверно, числовой ответ и короткий текстовый ответ"""
+    block = GIFT_TITLE_RE.sub('', block.strip(), count=1)
+    block = re.sub(r'^\[(html|moodle|plain|markdown)\]', '', block.strip())
+    match = re.search(r'(?<!\\)\{(.*?)(?<!\\)\}', block, re.DOTALL)
+    if not match:
+        raise ValueError("нет блока ответов {...}")
+    text = _gift_unescape(block[:match.start()] + ' ' + block[match.end():])
+    answers = match.group(1).strip()
+
+    if answers.upper() in ('T', 'TRUE', 'F', 'FALSE'):
+        return {'text': text, 'options': ["Верно", "Неверно"], 'correct': 0 if answers.upper().startswith('T') else 1}
+    if answers.startswith('#'):
+        return {'text': text, **parse_gift_numeric(answers[1:])}
+
+    parts = GIFT_ANSWER_RE.split(answers)
+    if parts[0].strip():
+        raise ValueError("варианты ответа должны начинаться с = или ~")
+    markers = parts[1::2]
+
+    # Только «=» без «~» — короткий текстовый ответ с допустимыми вариантами
+    if '~' not in markers:
+        accepted = []
+        for option in parts[2::2]:
+            option = _gift_strip_feedback(option).strip()
+            weight = GIFT_WEIGHT_RE.match(option)
+            if weight and float(weight.group(1)) != 100:
+                raise ValueError("частичные баллы в текстовом ответе не поддерживаются")
+            accepted.append(_gift_unescape(GIFT_WEIGHT_RE.sub('', option)))
+        return {'type': TEXT, 'text': text, 'answers': accepted, 'patterns': []}
+
+    # Варианты с положительным весом %N% считаются правильными: это вопрос с несколькими ответами
+    options, correct, weighted = [], [], False
+    for marker, option in zip(markers, parts[2::2]):
+        option = _gift_strip_feedback(option).strip()
+        weight = GIFT_WEIGHT_RE.match(option)
+        if weight:
+            weighted = True
+            option = GIFT_WEIGHT_RE.sub('', option)
+        if marker == '=' or (weight and float(weight.group(1)) > 0):
+            correct.append(len(options))
+        options.append(_gift_unescape(option))
+    if weighted:
+        return {'type': MULTI, 'text': text, 'options': options, 'correct': correct}
+    if len(correct) != 1:
+        raise ValueError("в вопросе с выбором должен быть один ответ «=» или веса %N% у правильных")
+    return {'text': text, 'options': options, 'correct': correct[0]}
+
+
+def parse_gift(stream: IO[str]) -> ParseResult:
+    """Разбирает Moodle GIFT: вопросы разделены пустыми строками, // — комментарии"""
+    questions, errors = [], []
+    block: List[str] = []
+    block_start = 0
+
+    def flush():
+        if not block:
+            return
+        try:
+            _checked(parse_gift_question('\n'.join(block)), block_start, questions, errors)
+        except ValueError as e:
+            errors.append((block_start, str(e)))
+        block.clear()
+
+    for line_number, line in enumerate(stream, 1):
+        line = line.rstrip('\r\n')
+        stripped = line.strip()
+        if stripped.startswith('//') or stripped.startswith('$CATEGORY'):
+            continue
+        if not stripped:
+            flush()
+            continue
+        if not block:
+            block_start = line_number
+        block.append(line)
+    flush()
+    return questions, errors
+
+
+PARSERS = {
+    '.json': parse_json,
+    '.jsonl': parse_jsonl,
+    '.csv': parse_csv,
+    '.gift': parse_gift,
+    '.txt': parse_gift,
+}
+
+
+def parse_test_file(data: bytes, file_name: str) -> ParseResult:
+    """Выбирает разборщик по расширению файла; вызывается вне цикла событий"""
+    extension = '.' + file_name.rsplit('.', 1)[-1].lower() if '.' in file_name else ''
+    parser = PARSERS.get(extension)
+    if parser is None:
+        return [], [(0, f"неподдерживаемый формат файла: {file_name}")]
+    stream = io.TextIOWrapper(io.BytesIO(data), encoding='utf-8-sig', errors='strict', newline='')
+    try:
+        return parser(stream)
+    except UnicodeDecodeError:
+        return [], [(0, "файл должен быть в кодировке UTF-8")]
+
+
+def format_report(questions: List[dict], errors: List[Tuple[int, str]]) -> str:
+    lines = [f"Найдено вопросов: {len(questions)}, ошибок: {len(errors)}"]
+    for line_number, error in errors[:MAX_REPORTED_ERRORS]:
+        lines.append(f"• строка {line_number}: {error}" if line_number else f"• {error}")
+    if len(errors) > MAX_REPORTED_ERRORS:
+        lines.append(f"… и еще {len(errors) - MAX_REPORTED_ERRORS}")
+    return "\n".join(lines)
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from typing import Optional
+
+from config import Config
+from database import backup_to
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotStore:
+    """Согласованная копия БД для отчетов и выгрузок: тяжелые запросы не мешают записи"""
+
+    def __init__(self, path: str = 'student_assistant_snapshot.db', max_age: float = 300):
+        self.path = path
+        self.max_age = max_age
+        self.taken_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        metrics.register_gauge('snapshot.age_seconds', lambda: self.age if self.taken_at else -1)
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.taken_at if self.taken_at else float('inf')
+
+    async def refresh(self):
+        """Снимает новую копию, если ее не сняли, пока мы ждали блокировку"""
+        requested_at = time.time()
+        async with self._lock:
+            if self.taken_at and self.taken_at >= requested_at:
+                return
+            started = time.monotonic()
+            taken_at = time.time()
+            await asyncio.to_thread(backup_to, self.path)
+            self.taken_at = taken_at
+            metrics.observe('snapshot.refresh', time.monotonic() - started)
+            logger.info(f"Reporting snapshot refreshed in {time.monotonic() - started:.2f}s")
+
+    async def connect(self, max_age: Optional[float] = None) -> sqlite3.Connection:
+        """Открывает копию только на чтение, обновляя ее, если она старше max_age секунд"""
+        if self.age > (self.max_age if max_age is None else max_age) or not os.path.exists(self.path):
+            await self.refresh()
+        return sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+
+    def format_age(self) -> str:
+        return time.strftime('%d.%m %H:%M', time.localtime(self.taken_at)) if self.taken_at else "—"
+
+    def start(self):
+        if os.path.exists(self.path):
+            # Копия с прошлого запуска годится, пока не устарела
+            self.taken_at = os.path.getmtime(self.path)
+        self._task = asyncio.create_task(self._refresh_periodically())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _refresh_periodically(self):
+        while True:
+            try:
+                if self.age >= self.max_age:
+                    await self.refresh()
+            except Exception as e:
+                logger.error(f"Failed to refresh reporting snapshot: {e}", exc_info=True)
+            await asyncio.sleep(max(1.0, self.max_age - self.age) if self.taken_at else self.max_age)
+
+
+snapshot_store = SnapshotStore(Config.SNAPSHOT_PATH, Config.SNAPSHOT_MAX_AGE)
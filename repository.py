@@ -0,0 +1,256 @@
+import sqlite3
+from functools import lru_cache
+from dataclasses import dataclass, fields
+from typing import Callable, Dict, List, Optional, Type, TypeVar
+
+from config import Config
+from database import DB_PATH
+from sql_profiler import ProfiledConnection
+
+# Запросы обработчиков в одном месте. Строки возвращаются объектами с __slots__:
+# поля читаются по имени, а не по номеру столбца, и весят меньше словаря.
+#
+# Все методы синхронные и выполняются целиком в потоке цикла событий, поэтому одно
+# общее соединение безопасно и сохраняет кэш подготовленных выражений между вызовами.
+
+_connection: Optional[sqlite3.Connection] = None
+
+Row = TypeVar('Row')
+_factories: Dict[type, Callable] = {}
+
+
+def get_connection() -> sqlite3.Connection:
+    global _connection
+    if _connection is None:
+        factory = ProfiledConnection if Config.SQL_PROFILE else sqlite3.Connection
+        _connection = sqlite3.connect(DB_PATH, check_same_thread=False, cached_statements=256, factory=factory)
+    return _connection
+
+
+def close_connection():
+    global _connection
+    if _connection is not None:
+        _connection.close()
+        _connection = None
+
+
+@lru_cache(maxsize=None)
+def columns(cls: type) -> str:
+    """Список столбцов запроса в порядке полей класса строки"""
+    return ", ".join(field.name for field in fields(cls))
+
+
+def _factory(cls: Type[Row]) -> Callable[[sqlite3.Cursor, tuple], Row]:
+    factory = _factories.get(cls)
+    if factory is None:
+        factory = _factories[cls] = lambda cursor, row: cls(*row)
+    return factory
+
+
+def fetch_all(cls: Type[Row], sql: str, params=()) -> List[Row]:
+    cursor = get_connection().cursor()
+    cursor.row_factory = _factory(cls)
+    return cursor.execute(sql, params).fetchall()
+
+
+def fetch_one(cls: Type[Row], sql: str, params=()) -> Optional[Row]:
+    cursor = get_connection().cursor()
+    cursor.row_factory = _factory(cls)
+    return cursor.execute(sql, params).fetchone()
+
+
+def fetch_value(sql: str, params=()):
+    row = get_connection().execute(sql, params).fetchone()
+    return row[0] if row else None
+
+
+def execute(sql: str, params=()) -> int:
+    conn = get_connection()
+    with conn:
+        return conn.execute(sql, params).lastrowid
+
+
+@dataclass(slots=True)
+class TestInfo:
+    test_id: int
+    title: str
+    description: Optional[str]
+    start_time: str
+    end_time: str
+
+
+@dataclass(slots=True)
+class OpenTest:
+    test_id: int
+    title: str
+    questions: str
+    start_time: str
+    end_time: str
+    time_limit: Optional[int]
+
+
+@dataclass(slots=True)
+class TestOwner:
+    title: str
+    created_by: int
+
+
+@dataclass(slots=True)
+class Homework:
+    hw_id: int
+    title: str
+    description: Optional[str]
+    created_by: int
+
+
+@dataclass(slots=True)
+class Lecture:
+    material_id: int
+    title: str
+    description: Optional[str]
+
+
+@dataclass(slots=True)
+class LectureContent:
+    message: Optional[str]
+    file_id: Optional[str]
+    file_type: Optional[str]
+
+
+@dataclass(slots=True)
+class Event:
+    title: str
+    description: Optional[str]
+    event_date: str
+
+
+@dataclass(slots=True)
+class OutboxItem:
+    outbox_id: int
+    chat_id: int
+    steps: str
+    attempts: int
+
+
+class UserRepository:
+    def get_role(self, user_id: int) -> Optional[str]:
+        return fetch_value("SELECT role FROM users WHERE user_id = ?", (user_id,))
+
+    def add(self, user_id: int, username: Optional[str], full_name: str, role: str):
+        execute(
+            "INSERT INTO users (user_id, username, full_name, role) VALUES (?, ?, ?, ?)",
+            (user_id, username, full_name, role)
+        )
+
+
+class TestRepository:
+    def available(self, now: str) -> List[TestInfo]:
+        return fetch_all(TestInfo, f"""
+            SELECT {columns(TestInfo)} FROM tests
+            WHERE datetime(start_time) <= datetime(?) AND datetime(end_time) >= datetime(?)
+        """, (now, now))
+
+    def upcoming(self, now: str, limit: int = 5) -> List[TestInfo]:
+        return fetch_all(TestInfo, f"""
+            SELECT {columns(TestInfo)} FROM tests
+            WHERE start_time > ? ORDER BY start_time LIMIT ?
+        """, (now, limit))
+
+    def get_open(self, test_id: int) -> Optional[OpenTest]:
+        """Тест, если он сейчас открыт для прохождения"""
+        return fetch_one(OpenTest, f"""
+            SELECT {columns(OpenTest)} FROM tests
+            WHERE test_id = ?
+            AND datetime(start_time) <= datetime('now', 'localtime')
+            AND datetime(end_time) >= datetime('now', 'localtime')
+        """, (test_id,))
+
+    def get_owner(self, test_id: int) -> Optional[TestOwner]:
+        return fetch_one(TestOwner, f"SELECT {columns(TestOwner)} FROM tests WHERE test_id = ?", (test_id,))
+
+
+class ResultRepository:
+    def exists(self, test_id: int, user_id: int) -> bool:
+        return fetch_value(
+            "SELECT 1 FROM test_results WHERE test_id = ? AND user_id = ? LIMIT 1",
+            (test_id, user_id)
+        ) is not None
+
+    def add(self, test_id: int, user_id: int, answers: str, score: int, total: int) -> int:
+        return execute(
+            "INSERT INTO test_results (test_id, user_id, answers, score, total_questions) VALUES (?, ?, ?, ?, ?)",
+            (test_id, user_id, answers, score, total)
+        )
+
+
+class HomeworkRepository:
+    def list(self) -> List[Homework]:
+        return fetch_all(Homework, f"SELECT {columns(Homework)} FROM homework")
+
+    def get(self, hw_id: int) -> Optional[Homework]:
+        return fetch_one(Homework, f"SELECT {columns(Homework)} FROM homework WHERE hw_id = ?", (hw_id,))
+
+
+class LectureRepository:
+    def list(self) -> List[Lecture]:
+        return fetch_all(Lecture, f"SELECT {columns(Lecture)} FROM lecture_materials")
+
+    def get(self, material_id: int) -> Optional[Lecture]:
+        return fetch_one(
+            Lecture, f"SELECT {columns(Lecture)} FROM lecture_materials WHERE material_id = ?", (material_id,)
+        )
+
+    def contents(self, material_id: int) -> List[LectureContent]:
+        return fetch_all(
+            LectureContent,
+            f"SELECT {columns(LectureContent)} FROM lecture_content WHERE material_id = ? ORDER BY order_num",
+            (material_id,)
+        )
+
+
+class EventRepository:
+    def between(self, start: str, end: str) -> List[Event]:
+        """События с start включительно до end, по индексу на event_date"""
+        return fetch_all(Event, f"""
+            SELECT {columns(Event)} FROM calendar_events
+            WHERE event_date >= ? AND event_date < ?
+            ORDER BY event_date
+        """, (start, end))
+
+
+class OutboxRepository:
+    def add(self, chat_id: int, steps: str, attempts: int, next_attempt_at: float, error: str) -> int:
+        return execute(
+            "INSERT INTO outbox (chat_id, steps, attempts, next_attempt_at, last_error) VALUES (?, ?, ?, ?, ?)",
+            (chat_id, steps, attempts, next_attempt_at, error)
+        )
+
+    def due(self, now: float, limit: int = 50) -> List[OutboxItem]:
+        return fetch_all(OutboxItem, f"""
+            SELECT {columns(OutboxItem)} FROM outbox
+            WHERE next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?
+        """, (now, limit))
+
+    def reschedule(self, outbox_id: int, steps: str, attempts: int, next_attempt_at: Optional[float], error: str):
+        execute(
+            "UPDATE outbox SET steps = ?, attempts = ?, next_attempt_at = ?, last_error = ? WHERE outbox_id = ?",
+            (steps, attempts, next_attempt_at, error, outbox_id)
+        )
+
+    def remove(self, outbox_id: int):
+        execute("DELETE FROM outbox WHERE outbox_id = ?", (outbox_id,))
+
+    def counts(self) -> tuple:
+        """(ожидают повтора, брошены)"""
+        return get_connection().execute(
+            "SELECT COUNT(next_attempt_at), COUNT(*) - COUNT(next_attempt_at) FROM outbox"
+        ).fetchone()
+
+
+users = UserRepository()
+tests = TestRepository()
+results = ResultRepository()
+homework = HomeworkRepository()
+lectures = LectureRepository()
+events = EventRepository()
+outbox = OutboxRepository()
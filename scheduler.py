@@ -0,0 +1,192 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+
+import metrics
+from backups import backup_manager
+from states import HomeworkStates, TestStates
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты апдейтов: меньше — важнее
+HIGH, NORMAL, LOW = 0, 1, 2
+
+HIGH_PRIORITY_STATES = {TestStates.taking_test.state, HomeworkStates.waiting_for_homework.state}
+HIGH_PRIORITY_CALLBACKS = ("ans_", "test_")
+LOW_PRIORITY_TEXTS = {"📚 Лекционные материалы", "📅 Календарь", "📝 Домашние задания", "/search"}
+LOW_PRIORITY_CALLBACKS = ("lecture_", "cal_", "cald_", "caln", "srch_")
+
+BUSY_TEXT = "⏳ Сейчас идет тестирование и бот сильно загружен. Попробуйте через минуту."
+
+
+def classify(event: Update, raw_state: Optional[str]) -> int:
+    """Определяет приоритет апдейта: ответы на тесты и сдача работ важнее навигации"""
+    if raw_state in HIGH_PRIORITY_STATES:
+        return HIGH
+    if event.callback_query and event.callback_query.data:
+        data = event.callback_query.data
+        if data.startswith(HIGH_PRIORITY_CALLBACKS):
+            return HIGH
+        if data.startswith(LOW_PRIORITY_CALLBACKS):
+            return LOW
+    if event.message and event.message.text:
+        text = event.message.text
+        if text in LOW_PRIORITY_TEXTS or text.split(maxsplit=1)[0] in LOW_PRIORITY_TEXTS:
+            return LOW
+    return NORMAL
+
+
+class PrioritySemaphore:
+    """Семафор, который при освобождении слота пропускает вперед самого приоритетного ожидающего"""
+
+    def __init__(self, value: int):
+        self._value = value
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, priority: int = NORMAL):
+        if self._value > 0 and not self._waiters:
+            self._value -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Слот мог быть уже передан нам: отдаем его следующему
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._value += 1
+
+
+class UpdateScheduler(BaseMiddleware):
+    """Обрабатывает апдейты одного пользователя строго по очереди, разных — параллельно,
+    ограничивая общее число одновременно выполняемых обработчиков. При перегрузке
+    навигационные апдейты получают короткий ответ вместо обработки"""
+
+    def __init__(self, max_concurrency: int = 64, shed_latency: float = 1.0):
+        self.max_concurrency = max_concurrency
+        self.shed_latency = shed_latency
+        self.queue_wait_ewma = 0.0
+        self._semaphore = PrioritySemaphore(max_concurrency)
+        # user_id -> (future завершения последнего апдейта в очереди, длина очереди)
+        self._mailboxes: Dict[int, Tuple[asyncio.Future, int]] = {}
+        self.queued = 0
+        self.running = 0
+
+        metrics.register_gauge('scheduler.queued', lambda: self.queued)
+        metrics.register_gauge('scheduler.running', lambda: self.running)
+        metrics.register_gauge('scheduler.mailboxes', lambda: len(self._mailboxes))
+        metrics.register_gauge('scheduler.max_mailbox_depth', self.max_depth)
+        metrics.register_gauge('scheduler.queue_wait_ewma_ms', lambda: self.queue_wait_ewma * 1000)
+
+    def max_depth(self) -> int:
+        return max((depth for _, depth in self._mailboxes.values()), default=0)
+
+    @property
+    def overloaded(self) -> bool:
+        # Без ожидающих в очереди апдейт сразу получит слот и заодно снизит среднее
+        return self.queue_wait_ewma > self.shed_latency and len(self._semaphore) > 0
+
+    async def _run(self, handler, event, data, queued_at: float, priority: int):
+        try:
+            await self._semaphore.acquire(priority)
+        finally:
+            self.queued -= 1
+        self.running += 1
+        wait = time.monotonic() - queued_at
+        self.queue_wait_ewma += 0.1 * (wait - self.queue_wait_ewma)
+        metrics.observe('scheduler.queue_wait', wait)
+        metrics.observe(f'scheduler.queue_wait.p{priority}', wait)
+        started = time.monotonic()
+        try:
+            return await handler(event, data)
+        finally:
+            self.running -= 1
+            self._semaphore.release()
+            # Отдельное окно на время бэкапа показывает, насколько он замедляет обработчики
+            metrics.observe('handler.during_backup' if backup_manager.running else 'handler',
+                            time.monotonic() - started)
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        priority = classify(event, data.get("raw_state"))
+        if priority == LOW and self.overloaded:
+            metrics.inc('scheduler.shed')
+            await self._shed(event)
+            return None
+
+        queued_at = time.monotonic()
+        self.queued += 1
+        user = data.get("event_from_user")
+
+        # Части альбома собирает AlbumMiddleware; очередь пользователя их не упорядочивает,
+        # иначе первая часть ждала бы остальные, стоящие за ней же
+        if user is None or (event.message and event.message.media_group_id):
+            return await self._run(handler, event, data, queued_at, priority)
+
+        loop = asyncio.get_running_loop()
+        previous, depth = self._mailboxes.get(user.id, (None, 0))
+        done = loop.create_future()
+        self._mailboxes[user.id] = (done, depth + 1)
+        started = False
+        try:
+            if previous is not None:
+                await asyncio.wait({previous})
+                # FSMContextMiddleware прочитал состояние до ожидания, а предыдущий апдейт мог его сменить
+                state = data.get("state")
+                if state is not None:
+                    data["raw_state"] = await state.get_state()
+                    priority = classify(event, data["raw_state"])
+            started = True
+            return await self._run(handler, event, data, queued_at, priority)
+        finally:
+            if not started:
+                self.queued -= 1
+            self._release(user.id, previous, done)
+
+    def _release(self, user_id: int, previous, done: asyncio.Future):
+        def finish(_=None):
+            done.set_result(None)
+            tail, depth = self._mailboxes.get(user_id, (None, 0))
+            if tail is done:
+                del self._mailboxes[user_id]
+            elif tail is not None:
+                self._mailboxes[user_id] = (tail, depth - 1)
+
+        # Если апдейт отменили, пока он ждал очереди, следующий все равно ждет предыдущего
+        if previous is not None and not previous.done():
+            previous.add_done_callback(finish)
+        else:
+            finish()
+
+    async def _shed(self, event: Update):
+        """Отвечает заранее подготовленным текстом, не трогая БД и не занимая слот"""
+        try:
+            if event.callback_query:
+                await event.callback_query.answer(BUSY_TEXT, show_alert=True)
+            elif event.message:
+                await event.message.answer(BUSY_TEXT)
+        except Exception as e:
+            logger.debug(f"Cannot send busy reply: {e}")
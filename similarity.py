@@ -0,0 +1,229 @@
+import asyncio
+import hashlib
+import logging
+import random
+import re
+import time
+import zlib
+from array import array
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from config import Config
+from database import get_db_connection
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Поиск похожих текстовых сдач: каждая сдача превращается в MinHash-подпись из NUM_PERM чисел,
+# подпись режется на BANDS полос, и сдачи с совпавшей полосой попадают в одну LSH-корзину.
+# Новая сдача сравнивается только с соседями по корзинам, а не со всеми сдачами задания.
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+# Короткие ответы («42», «да») совпадают у всех и ничего не говорят о списывании
+MIN_TEXT_LENGTH = 40
+
+_PRIME = (1 << 61) - 1
+_random = random.Random(20240901)
+_PERMUTATIONS = [(_random.randrange(1, _PRIME), _random.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+_NOT_WORD_RE = re.compile(r"[\W_]+")
+
+
+class Match(NamedTuple):
+    submission_id: int
+    student: str
+    similarity: float
+
+
+def normalize(text: str) -> str:
+    return _NOT_WORD_RE.sub(" ", text.lower().replace("ё", "е")).strip()
+
+
+def shingles(text: str) -> Set[int]:
+    """Хэши всех подстрок длины SHINGLE_SIZE нормализованного текста"""
+    text = normalize(text)
+    if len(text) < MIN_TEXT_LENGTH:
+        return set()
+    return {zlib.crc32(text[i:i + SHINGLE_SIZE].encode()) for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def minhash(hashes: Set[int]) -> array:
+    return array('q', (min((a * x + b) % _PRIME for x in hashes) for a, b in _PERMUTATIONS))
+
+
+def band_buckets(signature: array) -> List[int]:
+    """Номер корзины для каждой полосы подписи"""
+    return [
+        int.from_bytes(
+            hashlib.blake2b(signature[band * ROWS:(band + 1) * ROWS].tobytes(), digest_size=8).digest(),
+            'big', signed=True
+        )
+        for band in range(BANDS)
+    ]
+
+
+def estimate(a: array, b: array) -> float:
+    """Оценка коэффициента Жаккара по доле совпавших позиций подписей"""
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+def load_signature(blob: bytes) -> array:
+    signature = array('q')
+    signature.frombytes(blob)
+    return signature
+
+
+def index_submission(cursor, submission_id: int, hw_id: int, text: Optional[str]) -> Optional[array]:
+    """Сохраняет подпись и корзины сдачи; None, если текст слишком короткий для сравнения"""
+    hashes = shingles(text or "")
+    if not hashes:
+        # Пустая подпись отмечает, что сдача уже разобрана
+        cursor.execute(
+            "INSERT OR REPLACE INTO submission_signatures (submission_id, hw_id, signature) VALUES (?, ?, ?)",
+            (submission_id, hw_id, b"")
+        )
+        return None
+    signature = minhash(hashes)
+    cursor.execute(
+        "INSERT OR REPLACE INTO submission_signatures (submission_id, hw_id, signature) VALUES (?, ?, ?)",
+        (submission_id, hw_id, signature.tobytes())
+    )
+    cursor.executemany(
+        "INSERT OR IGNORE INTO submission_lsh (hw_id, band, bucket, submission_id) VALUES (?, ?, ?, ?)",
+        [(hw_id, band, bucket, submission_id) for band, bucket in enumerate(band_buckets(signature))]
+    )
+    return signature
+
+
+def find_similar(cursor, submission_id: int, hw_id: int, user_id: int, signature: array,
+                 threshold: float) -> List[Match]:
+    """Сдачи других студентов из тех же корзин, похожие не меньше чем на threshold"""
+    buckets = band_buckets(signature)
+    values = ", ".join("(?, ?)" for _ in buckets)
+    cursor.execute(f"""
+        SELECT s.submission_id, COALESCE(u.full_name, s.user_id), g.signature
+        FROM (
+            SELECT DISTINCT submission_id FROM submission_lsh
+            WHERE hw_id = ? AND (band, bucket) IN (VALUES {values})
+        ) c
+        JOIN submission_signatures g ON g.submission_id = c.submission_id
+        JOIN homework_submissions s ON s.submission_id = c.submission_id
+        LEFT JOIN users u ON u.user_id = s.user_id
+        WHERE s.submission_id != ? AND s.user_id != ?
+    """, (hw_id, *(value for pair in enumerate(buckets) for value in pair), submission_id, user_id))
+    matches = []
+    for other_id, student, blob in cursor.fetchall():
+        score = estimate(signature, load_signature(blob))
+        if score >= threshold:
+            matches.append(Match(other_id, str(student), score))
+    return sorted(matches, key=lambda match: match.similarity, reverse=True)
+
+
+def check_submission(submission_id: int, hw_id: int, user_id: int, text: Optional[str],
+                     threshold: float) -> List[Match]:
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        signature = index_submission(cursor, submission_id, hw_id, text)
+        conn.commit()
+        if signature is None:
+            return []
+        return find_similar(cursor, submission_id, hw_id, user_id, signature, threshold)
+    finally:
+        conn.close()
+
+
+def index_missing() -> int:
+    """Строит подписи сдач, сделанных до появления индекса"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT submission_id, hw_id, message FROM homework_submissions
+            WHERE message IS NOT NULL
+            AND submission_id NOT IN (SELECT submission_id FROM submission_signatures)
+        """)
+        rows = cursor.fetchall()
+        for submission_id, hw_id, text in rows:
+            index_submission(cursor, submission_id, hw_id, text)
+        conn.commit()
+        return len(rows)
+    finally:
+        conn.close()
+
+
+def similarity_report(hw_id: int, threshold: float) -> List[Tuple[Match, Match]]:
+    """Все пары похожих сдач разных студентов по заданию, от самых похожих"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT s.submission_id, s.user_id, COALESCE(u.full_name, s.user_id), g.signature
+            FROM submission_signatures g
+            JOIN homework_submissions s ON s.submission_id = g.submission_id
+            LEFT JOIN users u ON u.user_id = s.user_id
+            WHERE g.hw_id = ? AND length(g.signature) > 0
+        """, (hw_id,))
+        submissions: Dict[int, tuple] = {row[0]: row[1:] for row in cursor.fetchall()}
+        # Кандидаты — только пары, попавшие хотя бы в одну общую корзину
+        cursor.execute("""
+            SELECT DISTINCT a.submission_id, b.submission_id
+            FROM submission_lsh a
+            JOIN submission_lsh b
+                ON b.hw_id = a.hw_id AND b.band = a.band AND b.bucket = a.bucket
+                AND b.submission_id > a.submission_id
+            WHERE a.hw_id = ?
+        """, (hw_id,))
+        candidates = cursor.fetchall()
+    finally:
+        conn.close()
+
+    signatures = {submission_id: load_signature(row[2]) for submission_id, row in submissions.items()}
+    pairs = []
+    for a, b in candidates:
+        if a not in submissions or b not in submissions or submissions[a][0] == submissions[b][0]:
+            continue
+        score = estimate(signatures[a], signatures[b])
+        if score >= threshold:
+            pairs.append((Match(a, str(submissions[a][1]), score), Match(b, str(submissions[b][1]), score)))
+    return sorted(pairs, key=lambda pair: pair[0].similarity, reverse=True)
+
+
+class SimilarityIndex:
+    def __init__(self, threshold: float = 0.7):
+        self.threshold = threshold
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._backfill())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def check(self, submission_id: int, hw_id: int, user_id: int, text: Optional[str]) -> List[Match]:
+        """Индексирует новую сдачу и возвращает похожие сдачи других студентов"""
+        started = time.monotonic()
+        matches = await asyncio.to_thread(check_submission, submission_id, hw_id, user_id, text, self.threshold)
+        metrics.observe('similarity.check', time.monotonic() - started)
+        if matches:
+            metrics.inc('similarity.flagged')
+        return matches
+
+    async def report(self, hw_id: int) -> List[Tuple[Match, Match]]:
+        return await asyncio.to_thread(similarity_report, hw_id, self.threshold)
+
+    async def _backfill(self):
+        try:
+            count = await asyncio.to_thread(index_missing)
+            if count:
+                logger.info(f"Indexed {count} earlier submissions for similarity search")
+        except Exception as e:
+            logger.error(f"Similarity backfill failed: {e}", exc_info=True)
+
+
+similarity_index = SimilarityIndex(Config.SIMILARITY_THRESHOLD)
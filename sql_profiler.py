@@ -0,0 +1,159 @@
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from config import Config
+from tracing import record_child
+import metrics
+
+# Профилировщик SQL: курсоры соединений из фабрики замеряют время каждого выражения,
+# а trace-колбэк SQLite считает выражения так, как их видит сама SQLite: вместе с неявными
+# BEGIN/COMMIT модуля sqlite3 и выражениями, которые выполнили триггеры (в том числе FTS5).
+# Статистика собирается по «отпечатку» — тексту запроса без литералов и лишних пробелов.
+
+WINDOW_SIZE = 256
+SLOW_PLAN_PREFIXES = ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT')
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def fingerprint(sql: str) -> str:
+    """Приводит запрос к виду, одинаковому для всех значений параметров"""
+    sql = _STRING_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = _SPACE_RE.sub(" ", sql).strip()
+    return _IN_LIST_RE.sub("(?, ...)", sql)
+
+
+class StatementStats:
+    __slots__ = ('count', 'total', 'max', 'slow', 'durations', 'plan')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.slow = 0
+        self.durations: Deque[float] = deque(maxlen=WINDOW_SIZE)
+        self.plan: Optional[List[str]] = None
+
+    def as_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'total_ms': self.total * 1000,
+            'p95_ms': metrics.percentile(self.durations, 0.95) * 1000,
+            'max_ms': self.max * 1000,
+            'slow': self.slow,
+            'plan': self.plan,
+        }
+
+
+class SQLProfiler:
+    def __init__(self, slow_threshold: float = 0.05):
+        self.slow_threshold = slow_threshold
+        self.started_at = time.time()
+        self._stats: Dict[str, StatementStats] = {}
+        self._traced: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, conn: sqlite3.Connection, sql: str, params, duration: float, executions: int = 1) -> str:
+        key = fingerprint(sql)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = StatementStats()
+            stats.count += executions
+            stats.total += duration
+            stats.max = max(stats.max, duration)
+            stats.durations.append(duration / executions)
+            slow = duration >= self.slow_threshold
+            if slow:
+                stats.slow += 1
+            need_plan = slow and stats.plan is None
+        if need_plan:
+            plan = self.explain(conn, sql, params)
+            with self._lock:
+                stats.plan = plan
+        return key
+
+    def trace(self, statement: str):
+        """trace-колбэк SQLite: получает выражение уже с подставленными значениями"""
+        key = fingerprint(statement)
+        with self._lock:
+            self._traced[key] = self._traced.get(key, 0) + 1
+
+    @staticmethod
+    def explain(conn: sqlite3.Connection, sql: str, params) -> List[str]:
+        if not sql.lstrip().upper().startswith(SLOW_PLAN_PREFIXES):
+            return []
+        try:
+            # Обычный курсор: план не должен попадать в статистику
+            cursor = sqlite3.Cursor(conn)
+            rows = cursor.execute("EXPLAIN QUERY PLAN " + sql, params or ()).fetchall()
+        except sqlite3.Error as e:
+            return [f"не удалось получить план: {e}"]
+        return [detail for _, _, _, detail in rows]
+
+    def snapshot(self, limit: Optional[int] = None) -> dict:
+        with self._lock:
+            statements = sorted(self._stats.items(), key=lambda item: item[1].total, reverse=True)
+            return {
+                'since': self.started_at,
+                'slow_threshold_ms': self.slow_threshold * 1000,
+                'statements': [
+                    dict(sql=sql, sqlite_steps=self._traced.get(sql, 0), **stats.as_dict())
+                    for sql, stats in statements[:limit]
+                ],
+                # Выражения мимо курсоров: BEGIN/COMMIT, executescript и с префиксом «-- » — внутри триггеров
+                'untimed': {sql: count for sql, count in self._traced.items() if sql not in self._stats},
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._traced.clear()
+            self.started_at = time.time()
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            duration = time.perf_counter() - started
+            record_child('db', profiler.record(self.connection, sql, parameters, duration), started, duration)
+
+    def executemany(self, sql, seq_of_parameters):
+        rows = list(seq_of_parameters)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, rows)
+        finally:
+            duration = time.perf_counter() - started
+            key = profiler.record(self.connection, sql, rows[0] if rows else (), duration, max(1, len(rows)))
+            record_child('db', key, started, duration)
+
+
+class ProfiledConnection(sqlite3.Connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.set_trace_callback(profiler.trace)
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    # Connection.execute создает курсор в обход cursor(), поэтому переопределяем и его
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+profiler = SQLProfiler(Config.SLOW_QUERY_MS / 1000)
@@ -9,14 +9,18 @@ class AdminStates(StatesGroup):
     waiting_for_test_questions = State()
     waiting_for_test_start_time = State()
     waiting_for_test_end_time = State()
+    waiting_for_test_time_limit = State()
+    waiting_for_test_file = State()
     waiting_for_hw_title = State()
     waiting_for_hw_description = State()
     waiting_for_lecture_title = State()
     waiting_for_lecture_description = State()
     waiting_for_lecture_content = State()
     waiting_for_question_text = State()
+    waiting_for_question_type = State()
     waiting_for_question_options = State()
     waiting_for_question_correct = State()
+    waiting_for_question_answer = State()
     waiting_for_more_questions = State()
 
 class TestStates(StatesGroup):
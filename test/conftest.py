@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Config читает обязательные переменные при импорте
+os.environ.setdefault('BOT_TOKEN', '1:test')
+os.environ.setdefault('ADMIN_IDS', '1')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
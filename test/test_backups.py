@@ -0,0 +1,25 @@
+import os
+
+import pytest
+
+from backups import BACKUP_PREFIX, BACKUP_SUFFIX, BackupManager, list_backups
+
+
+def make_backups(directory, count):
+    for i in range(count):
+        open(os.path.join(directory, f"{BACKUP_PREFIX}2025010{i}-000000{BACKUP_SUFFIX}"), 'wb').close()
+
+
+@pytest.mark.parametrize('count, keep, left', [(5, 2, 2), (5, 1, 1), (2, 14, 2)])
+def test_rotate_keeps_newest_backups(tmp_path, count, keep, left):
+    make_backups(str(tmp_path), count)
+
+    BackupManager(str(tmp_path), keep=keep).rotate()
+
+    backups = [os.path.basename(path) for path in list_backups(str(tmp_path))]
+    assert backups == [f"{BACKUP_PREFIX}2025010{i}-000000{BACKUP_SUFFIX}" for i in range(count - left, count)]
+
+
+def test_keep_zero_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        BackupManager(str(tmp_path), keep=0)
@@ -0,0 +1,34 @@
+import asyncio
+import datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+import calendar_view
+import handlers.student as student
+
+
+@pytest.mark.parametrize('data', ['cal_2025_13', 'cal_2025_0', 'cal_99999_1', 'cal_x_1'])
+def test_forged_month_is_rejected(monkeypatch, data):
+    def no_render(year, month):
+        raise AssertionError("недопустимый месяц дошел до render_month")
+
+    monkeypatch.setattr(student, 'render_month', no_render)
+    callback = SimpleNamespace(data=data, answer=AsyncMock(), message=SimpleNamespace(edit_text=AsyncMock()))
+
+    asyncio.run(student.switch_calendar_month(callback))
+
+    assert callback.answer.await_args.kwargs.get('show_alert')
+
+
+def test_month_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(calendar_view, '_cache', calendar_view.OrderedDict())
+    monkeypatch.setattr(calendar_view, 'get_month_events', lambda year, month: [])
+    year = datetime.date.today().year
+
+    for delta in range(calendar_view.CACHE_SIZE + 10):
+        calendar_view.render_month(*calendar_view.shift_month(year, 1, delta))
+
+    assert len(calendar_view._cache) == calendar_view.CACHE_SIZE
+    assert (year, 1) not in calendar_view._cache
@@ -0,0 +1,79 @@
+import asyncio
+import time
+
+from deadlines import DeadlineScheduler
+
+
+def test_expired_deadlines_pop_in_order():
+    deadlines = DeadlineScheduler()
+    deadlines.add('b', 20, 'второй')
+    deadlines.add('a', 10, 'первый')
+    deadlines.add('c', 30, 'третий')
+
+    assert deadlines._pop_expired(25) == [('a', 'первый'), ('b', 'второй')]
+    assert len(deadlines) == 1
+    assert deadlines._pop_expired(25) == []
+
+
+def test_cancelled_deadline_does_not_expire():
+    deadlines = DeadlineScheduler()
+    deadlines.add('a', 10)
+    deadlines.cancel('a')
+    deadlines.cancel('missing')
+
+    assert deadlines._pop_expired(100) == []
+    assert len(deadlines) == 0
+
+
+def test_rescheduled_deadline_expires_once_at_new_time():
+    deadlines = DeadlineScheduler()
+    deadlines.add('a', 10, 'старый')
+    deadlines.add('a', 50, 'новый')
+
+    assert deadlines._pop_expired(20) == []
+    assert deadlines._pop_expired(60) == [('a', 'новый')]
+
+
+def test_background_task_calls_handler_for_earlier_deadline_added_later():
+    async def scenario():
+        deadlines = DeadlineScheduler()
+        expired = []
+        done = asyncio.Event()
+
+        async def handler(key, payload):
+            expired.append(key)
+            if len(expired) == 2:
+                done.set()
+
+        deadlines.start(handler)
+        now = time.time()
+        deadlines.add('late', now + 0.2)
+        await asyncio.sleep(0)
+        # Более близкий дедлайн должен разбудить задачу, которая ждет 'late'
+        deadlines.add('early', now + 0.05)
+        await asyncio.wait_for(done.wait(), 2)
+        await deadlines.stop()
+        return expired
+
+    assert asyncio.run(scenario()) == ['early', 'late']
+
+
+def test_handler_error_does_not_stop_other_deadlines():
+    async def scenario():
+        deadlines = DeadlineScheduler()
+        expired = []
+
+        async def handler(key, payload):
+            if key == 'broken':
+                raise RuntimeError("сбой")
+            expired.append(key)
+
+        deadlines.start(handler)
+        deadlines.add('broken', time.time())
+        deadlines.add('ok', time.time())
+        deadlines.add('after', time.time() + 0.05)
+        await asyncio.sleep(0.2)
+        await deadlines.stop()
+        return expired
+
+    assert asyncio.run(scenario()) == ['ok', 'after']
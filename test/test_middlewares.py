@@ -0,0 +1,76 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from middlewares import CallbackDedupMiddleware, TokenBuckets
+
+
+def tap(middleware, handler, data):
+    callback = SimpleNamespace(data=data, from_user=SimpleNamespace(id=42), answer=AsyncMock())
+    return asyncio.run(middleware(handler, callback, {}))
+
+
+def test_double_tap_on_same_button_is_dropped():
+    middleware = CallbackDedupMiddleware(window=60)
+    handler = AsyncMock()
+
+    tap(middleware, handler, 'test_1')
+    tap(middleware, handler, 'test_1')
+    tap(middleware, handler, 'hw_1')
+
+    assert [call.args[0].data for call in handler.await_args_list] == ['test_1', 'hw_1']
+
+
+def test_quick_second_toggle_of_option_reaches_handler():
+    middleware = CallbackDedupMiddleware(window=60)
+    handler = AsyncMock()
+
+    tap(middleware, handler, 'ans_0_1')
+    tap(middleware, handler, 'ans_0_1')
+
+    assert handler.await_count == 2
+
+
+def test_bucket_allows_burst_then_limits():
+    buckets = TokenBuckets(rate=2, burst=3)
+
+    assert [buckets.take(1, 0)[0] for _ in range(4)] == [True, True, True, False]
+    # Другой ключ — своя корзина
+    assert buckets.take(2, 0)[0]
+
+
+def test_bucket_refills_at_rate_up_to_burst():
+    buckets = TokenBuckets(rate=2, burst=3)
+    for _ in range(3):
+        buckets.take(1, 0)
+
+    assert not buckets.take(1, 0.25)[0]
+    # За 0.5 с при 2 токенах в секунду набегает ровно один токен
+    assert buckets.take(1, 0.5)[0]
+    assert not buckets.take(1, 0.5)[0]
+    # После долгого простоя токенов не больше burst
+    assert [buckets.take(1, 100 + i * 0.01)[0] for i in range(4)] == [True, True, True, False]
+
+
+def test_throttled_flag_resets_when_token_is_available_again():
+    buckets = TokenBuckets(rate=1, burst=1)
+    buckets.take(1, 0)
+    allowed, bucket = buckets.take(1, 0)
+    bucket[2] = True
+
+    assert not allowed
+    allowed, bucket = buckets.take(1, 1)
+    assert allowed and bucket[2] is False
+
+
+def test_idle_full_buckets_are_evicted():
+    buckets = TokenBuckets(rate=2, burst=4)
+    buckets.take(1, 0)
+    buckets.take(2, 1)
+
+    assert len(buckets) == 2
+    # Через burst / rate = 2 с простоя корзина 1 снова полна и удаляется
+    buckets.take(3, 2.5)
+    assert len(buckets) == 2
+    buckets.take(3, 10)
+    assert len(buckets) == 1
@@ -0,0 +1,111 @@
+import pytest
+
+from questions import (
+    MultiChoice, NumericAnswer, SingleChoice, TextAnswer, calculate_score, compile_questions,
+    format_score, normalize_answers, normalize_text, question_error,
+)
+
+MULTI_QUESTION = {'type': 'multi', 'text': "Простые числа?", 'options': ["2", "3", "4", "5"], 'correct': [0, 1, 3]}
+
+
+@pytest.mark.parametrize('answer, expected', [
+    ([0, 1, 3], 1.0),
+    ([0, 1], 2 / 3),
+    ([0], 1 / 3),
+    ([0, 1, 2], 1 / 3),
+    ([0, 2], 0.0),
+    ([2], 0.0),
+    ([0, 1, 2, 3], 2 / 3),
+    ([], 0.0),
+    (None, 0.0),
+])
+def test_multi_choice_partial_credit(answer, expected):
+    assert MultiChoice(MULTI_QUESTION).score(answer) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("1, 2", [0, 1]),
+    ("4 2;1", [0, 1, 3]),
+    ("2,2", [1]),
+    ("5", None),
+    ("0", None),
+    ("один", None),
+    ("", None),
+])
+def test_multi_choice_parse(text, expected):
+    assert MultiChoice(MULTI_QUESTION).parse(text) == expected
+
+
+def test_single_choice_parse_and_score():
+    matcher = SingleChoice({'text': "2 + 2?", 'options': ["3", "4"], 'correct': 1})
+
+    assert matcher.parse(" 2 ") == 1
+    assert matcher.parse("3") is None
+    assert matcher.parse("два") is None
+    assert matcher.score(1) == 1.0
+    assert matcher.score(0) == 0.0
+
+
+@pytest.mark.parametrize('question, answer, expected', [
+    ({'answer': 3.14, 'tolerance': 0.01}, 3.15, 1.0),
+    ({'answer': 3.14, 'tolerance': 0.01}, 3.13, 1.0),
+    ({'answer': 3.14, 'tolerance': 0.01}, 3.16, 0.0),
+    ({'answer': 0.3}, 0.1 + 0.2, 1.0),
+    ({'answer': 0.3}, 0.30001, 0.0),
+    ({'answer': 1e12}, 1e12 + 1e-3, 1.0),
+    ({'answer': 5}, None, 0.0),
+])
+def test_numeric_tolerance(question, answer, expected):
+    assert NumericAnswer({'type': 'numeric', 'text': "?", **question}).score(answer) == expected
+
+
+@pytest.mark.parametrize('text, expected', [("3,14", 3.14), (" 1 000 ", 1000.0), ("inf", None), ("nan", None), ("пи", None)])
+def test_numeric_parse(text, expected):
+    assert NumericAnswer({'type': 'numeric', 'text': "?", 'answer': 0}).parse(text) == expected
+
+
+def test_normalize_text():
+    assert normalize_text("  Ёлка,   ЗЕЛЁНАЯ!  ") == "елка зеленая"
+
+
+@pytest.mark.parametrize('answer, expected', [
+    ("Пётр Первый", 1.0),
+    ("  петр   первый! ", 1.0),
+    ("Петр I", 1.0),
+    ("Петр II", 0.0),
+    ("Екатерина", 0.0),
+    ("", 0.0),
+    (None, 0.0),
+])
+def test_text_answer_normalization_and_patterns(answer, expected):
+    matcher = TextAnswer({'type': 'text', 'text': "Кто основал Петербург?",
+                          'answers': ["Петр Первый"], 'patterns': [r"петр\s+(1|i)"]})
+
+    assert matcher.score(answer) == expected
+
+
+def test_calculate_score_with_string_keys_from_json():
+    matchers = compile_questions([
+        {'text': "2 + 2?", 'options': ["3", "4"], 'correct': 1},
+        MULTI_QUESTION,
+        {'type': 'numeric', 'text': "Пи?", 'answer': 3.14, 'tolerance': 0.01},
+    ])
+    answers = normalize_answers({'0': 1, '1': [0, 1]})
+
+    score = calculate_score(matchers, answers)
+
+    assert score == 1.67
+    assert format_score(score) == "1.67"
+    assert format_score(None) == "—"
+
+
+@pytest.mark.parametrize('question, error', [
+    ({'text': "?", 'options': ["a", "b"], 'correct': 2}, "неверный номер правильного ответа"),
+    ({'type': 'multi', 'text': "?", 'options': ["a", "b"], 'correct': [0, 0]},
+     "правильные ответы — непустой список разных номеров вариантов"),
+    ({'type': 'numeric', 'text': "?", 'answer': 1, 'tolerance': -1}, "допуск должен быть неотрицательным числом"),
+    ({'type': 'text', 'text': "?", 'answers': [], 'patterns': []}, "нужен хотя бы один допустимый ответ или шаблон"),
+    ({'type': 'essay', 'text': "?"}, "неизвестный тип вопроса: essay"),
+])
+def test_question_error(question, error):
+    assert question_error(question) == error
@@ -0,0 +1,127 @@
+import json
+
+import pytest
+
+from quiz_import import MAX_REPORTED_ERRORS, format_report, parse_gift_question, parse_test_file
+
+SINGLE = {'text': "2 + 2?", 'options': ["3", "4"], 'correct': 1}
+
+
+def parse(text: str, file_name: str):
+    return parse_test_file(text.encode('utf-8'), file_name)
+
+
+def test_json_list_and_questions_object():
+    assert parse(json.dumps([SINGLE]), 'test.json') == ([SINGLE], [])
+    assert parse(json.dumps({'questions': [SINGLE]}), 'test.JSON') == ([SINGLE], [])
+
+
+def test_json_reports_question_numbers_once():
+    questions, errors = parse(json.dumps([SINGLE, {'text': "?"}, "текст"]), 'test.json')
+
+    assert questions == [SINGLE]
+    assert errors == [(0, "вопрос 2: нет полей: options, correct"), (0, "вопрос 3: вопрос должен быть объектом")]
+
+
+@pytest.mark.parametrize('text, error', [
+    ('[{"text": "?",\n', (2, "ошибка JSON: Expecting property name enclosed in double quotes")),
+    ('{"title": "Тест"}', (1, "ожидается список вопросов")),
+])
+def test_json_document_errors(text, error):
+    assert parse(text, 'test.json') == ([], [error])
+
+
+def test_jsonl_reports_line_numbers():
+    lines = [json.dumps(SINGLE), "", "{сломано", json.dumps({'text': "?", 'options': ["a"], 'correct': 0})]
+
+    questions, errors = parse("\n".join(lines), 'test.jsonl')
+
+    assert questions == [SINGLE]
+    assert [line for line, _ in errors] == [3, 4]
+    assert errors[1][1] == "нужно минимум 2 варианта ответа"
+
+
+@pytest.mark.parametrize('delimiter', [';', ','])
+def test_csv_with_header_and_multi_answers(delimiter):
+    rows = [
+        ["Вопрос", "Ответ", "Вариант 1", "Вариант 2", "Вариант 3"],
+        ["2 + 2?", "2", "3", "4", ""],
+        ["Четные?", "1 3", "2", "3", "4"],
+        ["Без вариантов", "1", "да"],
+        ["Буква?", "б", "а", "б"],
+    ]
+    text = "\n".join(delimiter.join(row) for row in rows)
+
+    questions, errors = parse(text, 'test.csv')
+
+    assert questions == [
+        SINGLE,
+        {'type': 'multi', 'text': "Четные?", 'options': ["2", "3", "4"], 'correct': [0, 2]},
+    ]
+    assert errors == [
+        (4, "нужны вопрос, номер ответа и минимум 2 варианта"),
+        (5, "номер правильного ответа не число: б"),
+    ]
+
+
+def test_csv_out_of_range_answer_is_reported():
+    assert parse("Вопрос;5;а;б", 'test.csv') == ([], [(1, "неверный номер правильного ответа")])
+
+
+@pytest.mark.parametrize('block, question', [
+    ("::Сумма:: 2 + 2 = {~3 =4 ~5}", {'text': "2 + 2 =", 'options': ["3", "4", "5"], 'correct': 1}),
+    ("Земля круглая {T}", {'text': "Земля круглая", 'options': ["Верно", "Неверно"], 'correct': 0}),
+    ("Пи {#3.14:0.01}", {'text': "Пи", 'type': 'numeric', 'answer': 3.14, 'tolerance': 0.01}),
+    ("От 1 до 5 {#1..5}", {'text': "От 1 до 5", 'type': 'numeric', 'answer': 3.0, 'tolerance': 2.0}),
+    ("Столица России? {=Москва =Moscow#верно}",
+     {'type': 'text', 'text': "Столица России?", 'answers': ["Москва", "Moscow"], 'patterns': []}),
+    ("Простые {~%50%2 ~%50%3 ~%-100%4}", {'type': 'multi', 'text': "Простые", 'options': ["2", "3", "4"], 'correct': [0, 1]}),
+    (r"Знак \= в {=a\=b ~a\~b}", {'text': "Знак = в", 'options': ["a=b", "a~b"], 'correct': 0}),
+])
+def test_gift_question_types(block, question):
+    assert parse_gift_question(block) == question
+
+
+@pytest.mark.parametrize('block, error', [
+    ("Нет ответов", "нет блока ответов {...}"),
+    ("Два верных {=a =b ~c}", "в вопросе с выбором должен быть один ответ «=» или веса %N% у правильных"),
+    ("Число {#пи}", "числовой ответ задается как {#число}, {#число:допуск} или {#от..до}"),
+])
+def test_gift_question_errors(block, error):
+    with pytest.raises(ValueError, match=error.replace('{', r'\{').replace('}', r'\}').replace('.', r'\.')):
+        parse_gift_question(block)
+
+
+def test_gift_file_reports_block_start_lines():
+    text = "\n".join([
+        "// комментарий",
+        "$CATEGORY: Арифметика",
+        "2 + 2 = {",
+        "  ~3 =4",
+        "}",
+        "",
+        "Без ответов",
+        "",
+        "Земля плоская {F}",
+    ])
+
+    questions, errors = parse(text, 'test.gift')
+
+    assert [question['text'] for question in questions] == ["2 + 2 =", "Земля плоская"]
+    assert errors == [(7, "нет блока ответов {...}")]
+
+
+def test_unsupported_extension_and_bad_encoding():
+    assert parse("", 'test.docx') == ([], [(0, "неподдерживаемый формат файла: test.docx")])
+    assert parse_test_file("вопрос".encode('cp1251'), 'test.jsonl') == ([], [(0, "файл должен быть в кодировке UTF-8")])
+
+
+def test_format_report_truncates_errors():
+    errors = [(0, "общая ошибка")] + [(line, "ошибка") for line in range(1, MAX_REPORTED_ERRORS + 5)]
+
+    report = format_report([SINGLE], errors).split("\n")
+
+    assert report[0] == f"Найдено вопросов: 1, ошибок: {len(errors)}"
+    assert report[1] == "• общая ошибка"
+    assert report[2] == "• строка 1: ошибка"
+    assert report[-1] == f"… и еще {len(errors) - MAX_REPORTED_ERRORS}"
@@ -0,0 +1,56 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+import handlers.review as review
+from config import Config
+
+STUDENT_ID = 999_999
+
+
+def make_callback(data: str, user_id: int):
+    return SimpleNamespace(
+        data=data,
+        from_user=SimpleNamespace(id=user_id),
+        answer=AsyncMock(),
+        message=SimpleNamespace(chat=SimpleNamespace(id=user_id), answer=AsyncMock(), edit_text=AsyncMock()),
+        bot=SimpleNamespace(copy_messages=AsyncMock(), send_message=AsyncMock()),
+    )
+
+
+@pytest.mark.parametrize('handler, data', [
+    (review.review_homeworks_page, 'rvl_0'),
+    (review.review_submissions_page, 'rvh_1_0'),
+    (review.review_open_submission, 'rvs_1'),
+    (review.review_grade_submission, 'rvg_1_5'),
+    (review.review_homework_zip, 'rvz_1'),
+])
+def test_non_teacher_callback_is_rejected(monkeypatch, handler, data):
+    assert STUDENT_ID not in Config.ADMIN_IDS
+
+    def no_db():
+        raise AssertionError("обработчик обратился к БД для чужого пользователя")
+
+    monkeypatch.setattr(review, 'get_db_connection', no_db)
+    callback = make_callback(data, STUDENT_ID)
+
+    asyncio.run(handler(callback))
+
+    callback.answer.assert_awaited_once_with("Извините, у вас нет прав преподавателя.", show_alert=True)
+    callback.message.answer.assert_not_called()
+    callback.bot.copy_messages.assert_not_called()
+
+
+@pytest.mark.parametrize('data', ['rvg_1_99', 'rvg_1_0', 'rvg_1_x', 'rvg_x_5', 'rvg_1_5_5'])
+def test_invalid_grade_is_rejected(monkeypatch, data):
+    def no_db():
+        raise AssertionError("некорректная оценка дошла до БД")
+
+    monkeypatch.setattr(review, 'get_db_connection', no_db)
+    callback = make_callback(data, Config.ADMIN_IDS[0])
+
+    asyncio.run(review.review_grade_submission(callback))
+
+    callback.answer.assert_awaited_once_with("Некорректная оценка.", show_alert=True)
@@ -0,0 +1,54 @@
+import asyncio
+import datetime
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import Chat, Message, Update, User
+
+from scheduler import HIGH, UpdateScheduler, classify
+from states import TestStates
+
+USER = User(id=42, is_bot=False, first_name="Студент")
+CHAT = Chat(id=42, type="private")
+
+
+def make_update(update_id: int, text: str) -> Update:
+    message = Message(message_id=update_id, date=datetime.datetime.now(), chat=CHAT, from_user=USER, text=text)
+    return Update(update_id=update_id, message=message)
+
+
+def test_queued_update_sees_state_set_by_previous_update():
+    async def scenario():
+        scheduler = UpdateScheduler(max_concurrency=4)
+        state = FSMContext(storage=MemoryStorage(), key=StorageKey(bot_id=1, chat_id=CHAT.id, user_id=USER.id))
+        first_running = asyncio.Event()
+        release_first = asyncio.Event()
+        seen = {}
+
+        async def start_test(event, data):
+            first_running.set()
+            await release_first.wait()
+            await state.set_state(TestStates.taking_test)
+
+        async def answer(event, data):
+            seen['raw_state'] = data['raw_state']
+            seen['priority'] = classify(event, data['raw_state'])
+
+        # Оба апдейта прошли FSMContextMiddleware до того, как первый сменил состояние
+        first = asyncio.create_task(scheduler(start_test, make_update(1, "test"), {
+            'event_from_user': USER, 'state': state, 'raw_state': await state.get_state(),
+        }))
+        await first_running.wait()
+        second = asyncio.create_task(scheduler(answer, make_update(2, "1"), {
+            'event_from_user': USER, 'state': state, 'raw_state': await state.get_state(),
+        }))
+        await asyncio.sleep(0)
+        release_first.set()
+        await asyncio.gather(first, second)
+        return seen
+
+    seen = asyncio.run(scenario())
+
+    assert seen['raw_state'] == TestStates.taking_test.state
+    assert seen['priority'] == HIGH
@@ -0,0 +1,98 @@
+import pytest
+
+import database
+import similarity
+from similarity import check_submission, estimate, minhash, shingles, similarity_report
+
+ESSAY = (
+    "Алгоритм Дейкстры находит кратчайшие пути от одной вершины графа до всех остальных. "
+    "На каждом шаге он выбирает непосещенную вершину с наименьшим расстоянием и обновляет "
+    "расстояния до ее соседей. Для графов с отрицательными весами ребер алгоритм не подходит."
+)
+# Списанный текст с парой замененных слов
+EDITED = ESSAY.replace("наименьшим", "минимальным").replace("не подходит", "неприменим")
+OTHER = (
+    "Быстрая сортировка делит массив относительно опорного элемента на две части и рекурсивно "
+    "сортирует каждую из них. В среднем она работает за n log n, в худшем случае за квадрат."
+)
+
+
+def jaccard(a: str, b: str) -> float:
+    a, b = shingles(a), shingles(b)
+    return len(a & b) / len(a | b)
+
+
+def test_short_text_has_no_shingles():
+    assert shingles("Ответ: 42") == set()
+
+
+def test_normalization_ignores_case_punctuation_and_yo():
+    assert shingles(ESSAY.upper().replace("е", "ё")) == shingles(ESSAY)
+
+
+@pytest.mark.parametrize('a, b', [(ESSAY, EDITED), (ESSAY, OTHER)])
+def test_minhash_estimates_jaccard(a, b):
+    assert estimate(minhash(shingles(a)), minhash(shingles(b))) == pytest.approx(jaccard(a, b), abs=0.15)
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'test.db'))
+    database.init_db()
+    conn = database.get_db_connection()
+    conn.executemany("INSERT INTO users (user_id, full_name) VALUES (?, ?)",
+                     [(1, "Преподаватель"), (2, "Анна"), (3, "Борис"), (4, "Вера")])
+    conn.execute("INSERT INTO homework (hw_id, title, created_by) VALUES (1, 'Графы', 1)")
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def submit(db, submission_id: int, user_id: int, text: str, threshold: float = 0.7):
+    db.execute("INSERT INTO homework_submissions (submission_id, hw_id, user_id, message) VALUES (?, 1, ?, ?)",
+               (submission_id, user_id, text))
+    db.commit()
+    return check_submission(submission_id, 1, user_id, text, threshold)
+
+
+def test_near_duplicate_of_other_student_is_flagged(db):
+    assert submit(db, 1, 2, ESSAY) == []
+    assert submit(db, 2, 3, OTHER) == []
+
+    matches = submit(db, 3, 4, EDITED)
+
+    assert [(match.submission_id, match.student) for match in matches] == [(1, "Анна")]
+    assert matches[0].similarity >= 0.7
+
+
+def test_own_resubmission_is_not_flagged(db):
+    submit(db, 1, 2, ESSAY)
+
+    assert submit(db, 2, 2, EDITED) == []
+
+
+def test_threshold_above_similarity_hides_match(db):
+    submit(db, 1, 2, ESSAY)
+    similarity_score = estimate(minhash(shingles(ESSAY)), minhash(shingles(EDITED)))
+
+    assert submit(db, 2, 3, EDITED, threshold=min(similarity_score + 0.01, 1.0)) == []
+
+
+def test_report_pairs_only_similar_submissions_of_different_students(db):
+    submit(db, 1, 2, ESSAY)
+    submit(db, 2, 3, EDITED)
+    submit(db, 3, 4, OTHER)
+    submit(db, 4, 2, EDITED)
+
+    pairs = similarity_report(1, 0.7)
+
+    assert sorted((a.submission_id, b.submission_id) for a, b in pairs) == [(1, 2), (2, 4)]
+
+
+def test_lsh_bands_catch_pairs_above_threshold():
+    # Вероятность попасть хотя бы в одну общую корзину 1 - (1 - s^r)^b
+    def candidate_probability(s):
+        return 1 - (1 - s ** similarity.ROWS) ** similarity.BANDS
+
+    assert candidate_probability(0.7) > 0.99
+    assert candidate_probability(0.1) < 0.01
@@ -0,0 +1,47 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import User
+
+import handlers.tests as tests
+from states import TestStates
+
+STUDENT = User(id=42, is_bot=False, first_name="Студент")
+KEY = StorageKey(bot_id=1, chat_id=42, user_id=42)
+QUESTIONS = [{'text': "2 + 2?", 'options': ["3", "4"], 'correct': 1}]
+
+
+def test_last_answer_during_expiry_notice_is_submitted_once(monkeypatch):
+    results = MagicMock()
+    monkeypatch.setattr(tests.repository, 'results', results)
+    monkeypatch.setattr(tests, 'notify_teacher', AsyncMock())
+
+    async def scenario():
+        storage = MemoryStorage()
+        state = FSMContext(storage=storage, key=KEY)
+        await state.set_state(TestStates.taking_test)
+        await state.set_data({
+            'test_id': 7, 'questions': QUESTIONS, 'current_question': 1, 'answers': {0: 1},
+            'student': STUDENT.model_dump(exclude_none=True),
+        })
+        bot = MagicMock()
+        sent = []
+
+        async def send_message(chat_id, text, **kwargs):
+            sent.append(text)
+            if text.startswith("⏰"):
+                # Пока уходит уведомление таймера, студент успевает отправить тест сам
+                await tests.submit_test(bot, chat_id, STUDENT, FSMContext(storage=storage, key=KEY))
+
+        bot.send_message = send_message
+        await tests.expire_test_attempt(bot, storage, KEY, 7)
+        return sent
+
+    sent = asyncio.run(scenario())
+
+    results.add.assert_called_once()
+    assert not any(text.startswith("❌") for text in sent)
+    assert sum(text.startswith("📊") for text in sent) == 1
@@ -0,0 +1,69 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from aiohttp import ClientConnectorError
+from aiohttp.client_reqrep import ConnectionKey
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.exceptions import TelegramNetworkError, TelegramServerError
+from aiogram.methods import AnswerCallbackQuery, CopyMessage, SendMessage
+
+from transport import TunedSession
+
+
+def timeout_error(method):
+    try:
+        raise asyncio.TimeoutError()
+    except asyncio.TimeoutError:
+        raise TelegramNetworkError(method=method, message="Request timeout error")
+
+
+def connect_error(method):
+    key = ConnectionKey('api.telegram.org', 443, True, None, None, None, None)
+    try:
+        raise ClientConnectorError(key, OSError(111, "Connection refused"))
+    except ClientConnectorError as e:
+        raise TelegramNetworkError(method=method, message=f"{type(e).__name__}: {e}")
+
+
+def server_error(method):
+    raise TelegramServerError(method=method, message="Bad Gateway")
+
+
+def run_with_failures(monkeypatch, method, fail, failures=1):
+    calls = []
+
+    async def fake_request(self, bot, method, timeout=None):
+        calls.append(method)
+        if len(calls) <= failures:
+            fail(method)
+        return True
+
+    monkeypatch.setattr(AiohttpSession, 'make_request', fake_request)
+    session = TunedSession(retries=3, backoff=0)
+    try:
+        result = asyncio.run(session.make_request(SimpleNamespace(), method))
+    finally:
+        asyncio.run(session.close())
+    return result, len(calls)
+
+
+SEND = SendMessage(chat_id=1, text="Оценка выставлена")
+COPY = CopyMessage(chat_id=1, from_chat_id=2, message_id=3)
+ANSWER = AnswerCallbackQuery(callback_query_id='1')
+
+
+@pytest.mark.parametrize('method', [SEND, COPY])
+@pytest.mark.parametrize('fail', [timeout_error, server_error])
+def test_send_is_not_retried_when_it_may_have_been_delivered(monkeypatch, method, fail):
+    with pytest.raises((TelegramNetworkError, TelegramServerError)):
+        run_with_failures(monkeypatch, method, fail)
+
+
+def test_send_is_retried_when_connection_failed(monkeypatch):
+    assert run_with_failures(monkeypatch, SEND, connect_error) == (True, 2)
+
+
+@pytest.mark.parametrize('fail', [timeout_error, server_error, connect_error])
+def test_idempotent_method_is_retried(monkeypatch, fail):
+    assert run_with_failures(monkeypatch, ANSWER, fail, failures=2) == (True, 3)
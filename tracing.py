@@ -0,0 +1,187 @@
+import json
+import logging
+import logging.handlers
+import os
+import random
+import secrets
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.types import TelegramObject, Update
+
+from config import Config
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Ограничение на число дочерних спанов одного апдейта, чтобы цикл запросов не раздул память
+MAX_CHILD_SPANS = 200
+
+
+class Span:
+    """Спан обработки одного апдейта с дочерними спанами запросов к БД и Bot API"""
+
+    __slots__ = ('trace_id', 'started', 'started_at', 'attrs', 'children', 'dropped', 'error')
+
+    def __init__(self, **attrs):
+        self.trace_id = secrets.token_hex(8)
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self.attrs: Dict[str, Any] = attrs
+        self.children: List[dict] = []
+        self.dropped = 0
+        self.error: Optional[str] = None
+
+    def child(self, kind: str, name: str, started: float, duration: float, error: Optional[str] = None):
+        if len(self.children) >= MAX_CHILD_SPANS:
+            self.dropped += 1
+            return
+        span = {
+            'kind': kind,
+            'name': name,
+            'offset_ms': round((started - self.started) * 1000, 3),
+            'duration_ms': round(duration * 1000, 3),
+        }
+        if error:
+            span['error'] = error
+        self.children.append(span)
+
+    def to_dict(self, duration: float) -> dict:
+        record = {
+            'trace_id': self.trace_id,
+            'ts': round(self.started_at, 3),
+            'duration_ms': round(duration * 1000, 3),
+            'status': 'error' if self.error else 'ok',
+            **self.attrs,
+            'spans': self.children,
+        }
+        if self.error:
+            record['error'] = self.error
+        if self.dropped:
+            record['dropped_spans'] = self.dropped
+        return record
+
+
+current_span: ContextVar[Optional[Span]] = ContextVar('current_span', default=None)
+
+
+def record_child(kind: str, name: str, started: float, duration: float, error: Optional[str] = None):
+    """Добавляет дочерний спан к апдейту, в контексте которого выполняется код"""
+    span = current_span.get()
+    if span is not None:
+        span.child(kind, name, started, duration, error)
+
+
+class SpanErrorHandler(logging.Handler):
+    """Помечает апдейт сбойным, если его обработчик записал ошибку в лог"""
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+
+    def emit(self, record: logging.LogRecord):
+        span = current_span.get()
+        if span is not None and span.error is None:
+            span.error = record.getMessage()[:500]
+
+
+class Tracer(BaseMiddleware):
+    """Внешний middleware апдейтов: открывает спан и пишет его в JSONL с выборкой"""
+
+    def __init__(self, path: str, sample_rate: float = 0.05, slow_threshold: float = 1.0,
+                 max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._writer = logging.getLogger('traces')
+        self._writer.propagate = False
+        self._writer.setLevel(logging.INFO)
+
+    def setup(self, wrap: Callable[[logging.Handler], logging.Handler] = lambda handler: handler):
+        """Открывает файл трасс с ротацией и подключает учет ошибок из логов;
+        wrap позволяет писать файл из фонового потока"""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(
+            self.path, maxBytes=self.max_bytes, backupCount=self.backup_count, encoding='utf-8'
+        )
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        self._writer.addHandler(wrap(handler))
+        logging.getLogger().addHandler(SpanErrorHandler())
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        span = Span(
+            update_id=event.update_id,
+            update_type=event.event_type,
+            user_id=user.id if user else None,
+            state=data.get("raw_state"),
+        )
+        token = current_span.set(span)
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            span.error = f"{type(e).__name__}: {e}"[:500]
+            raise
+        finally:
+            current_span.reset(token)
+            self.finish(span, time.perf_counter() - span.started)
+
+    def finish(self, span: Span, duration: float):
+        slow = duration >= self.slow_threshold
+        # Медленные и сбойные апдейты пишутся всегда, остальные — выборочно
+        if span.error or slow or random.random() < self.sample_rate:
+            metrics.inc('traces.written')
+            self._writer.info(json.dumps(span.to_dict(duration), ensure_ascii=False, default=str))
+        if span.error:
+            metrics.inc('traces.failed')
+        if slow:
+            metrics.inc('traces.slow')
+
+
+class HandlerSpanMiddleware(BaseMiddleware):
+    """Внутренний middleware: дописывает в спан выбранный обработчик и состояние FSM"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        span = current_span.get()
+        if span is not None:
+            handler_object = data.get("handler")
+            if handler_object is not None:
+                callback = handler_object.callback
+                span.attrs['handler'] = f"{callback.__module__}.{callback.__qualname__}"
+            span.attrs['state'] = data.get("raw_state")
+        return await handler(event, data)
+
+
+class ApiSpanMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: каждый вызов Bot API становится дочерним спаном"""
+
+    async def __call__(self, make_request, bot, method):
+        started = time.perf_counter()
+        error = None
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"[:300]
+            raise
+        finally:
+            record_child('api', type(method).__name__, started, time.perf_counter() - started, error)
+
+
+tracer = Tracer(
+    Config.TRACE_FILE, Config.TRACE_SAMPLE_RATE, Config.TRACE_SLOW_MS / 1000,
+    Config.TRACE_MAX_BYTES, Config.TRACE_BACKUPS
+)
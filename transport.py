@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import random
+from typing import Optional
+
+from aiohttp import ClientConnectorError
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.exceptions import (
+    TelegramEntityTooLarge, TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+)
+from aiogram.methods import GetUpdates, TelegramMethod
+
+from config import Config
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Методы, которые загружают файлы: им нужен таймаут длиннее обычного
+UPLOAD_METHODS = frozenset({
+    'SendDocument', 'SendPhoto', 'SendVideo', 'SendAudio', 'SendVoice', 'SendAnimation', 'SendMediaGroup',
+})
+
+# Повтор этих методов после таймаута или ошибки сервера может прислать сообщение дважды
+NON_IDEMPOTENT_PREFIXES = ('send', 'copy', 'forward')
+
+
+def is_idempotent(method: TelegramMethod) -> bool:
+    return not method.__api_method__.startswith(NON_IDEMPOTENT_PREFIXES)
+
+
+def never_sent(error: TelegramNetworkError) -> bool:
+    """Соединение не установлено, значит запрос точно не ушел в Telegram"""
+    # aiogram оборачивает ошибку aiohttp, исходная остается в __context__
+    return isinstance(error.__context__, ClientConnectorError)
+
+
+class TunedSession(AiohttpSession):
+    """Сессия Bot API с настраиваемым пулом соединений, таймаутами по классам методов
+    и повтором запросов при сетевых сбоях и RetryAfter.
+
+    Отправку и копирование сообщений повторяем, только если запрос не ушел
+    (нет соединения) или Telegram ответил RetryAfter; остальные сбои остаются
+    постоянной очереди уведомлений, чтобы студент не получил сообщение дважды.
+    """
+
+    def __init__(self, limit: int = 100, keepalive: float = 60, dns_ttl: int = 600,
+                 timeout: float = 15, upload_timeout: float = 120, retries: int = 3,
+                 backoff: float = 0.5, max_retry_after: float = 30, **kwargs):
+        super().__init__(limit=limit, timeout=timeout, **kwargs)
+        self._connector_init.update(keepalive_timeout=keepalive, ttl_dns_cache=dns_ttl, use_dns_cache=True)
+        self.upload_timeout = upload_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_retry_after = max_retry_after
+
+    def method_timeout(self, method: TelegramMethod) -> float:
+        return self.upload_timeout if type(method).__name__ in UPLOAD_METHODS else self.timeout
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: Optional[int] = None):
+        # getUpdates повторяет сам диспетчер, со своей паузой и своим таймаутом
+        if isinstance(method, GetUpdates):
+            return await super().make_request(bot, method, timeout)
+        if timeout is None:
+            timeout = self.method_timeout(method)
+
+        attempt = 0
+        while True:
+            try:
+                return await super().make_request(bot, method, timeout)
+            except TelegramRetryAfter as e:
+                # Долгую паузу не ждем в обработчике: пусть вызывающий решит, что делать
+                if attempt >= self.retries or e.retry_after > self.max_retry_after:
+                    raise
+                delay = e.retry_after
+                metrics.inc('api.retry_after')
+            except TelegramEntityTooLarge:
+                raise
+            except (TelegramNetworkError, TelegramServerError) as e:
+                if attempt >= self.retries:
+                    raise
+                if not is_idempotent(method) and not (isinstance(e, TelegramNetworkError) and never_sent(e)):
+                    raise
+                # Экспоненциальная пауза со случайной долей, чтобы повторы не шли залпом
+                delay = self.backoff * 2 ** attempt * random.uniform(0.5, 1.0)
+                logger.warning(f"{type(method).__name__} failed ({e}), retry in {delay:.1f}s")
+            attempt += 1
+            metrics.inc('api.retries')
+            await asyncio.sleep(delay)
+
+
+def create_session() -> TunedSession:
+    return TunedSession(
+        limit=Config.API_POOL_LIMIT,
+        keepalive=Config.API_KEEPALIVE,
+        dns_ttl=Config.API_DNS_TTL,
+        timeout=Config.API_TIMEOUT,
+        upload_timeout=Config.API_UPLOAD_TIMEOUT,
+        retries=Config.API_RETRIES,
+        backoff=Config.API_RETRY_BACKOFF,
+        max_retry_after=Config.API_MAX_RETRY_AFTER,
+    )